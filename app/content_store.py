@@ -0,0 +1,287 @@
+import mmap
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # zstandard - необязательная зависимость
+    zstandard = None
+
+# Тексты короче этого размера (в байтах UTF-8) хранятся как есть
+CONTENT_COMPRESSION_THRESHOLD = int(os.getenv("CONTENT_COMPRESSION_THRESHOLD", "1024"))
+CONTENT_ZLIB_LEVEL = int(os.getenv("CONTENT_ZLIB_LEVEL", "6"))
+CONTENT_ZSTD_LEVEL = int(os.getenv("CONTENT_ZSTD_LEVEL", "3"))
+# Посты, не изменявшиеся дольше этого срока, выгружаются в файл на диске
+CONTENT_COLD_AFTER_SECONDS = float(os.getenv("CONTENT_COLD_AFTER_SECONDS", str(30 * 86400)))
+# Каталог файла холодных текстов (по умолчанию - системный временный).
+# У каждого процесса свой безымянный файл, удаляемый при закрытии:
+# источник истины - data.json, а воркеры не затирают файлы друг друга
+CONTENT_BLOB_DIR = os.getenv("CONTENT_BLOB_DIR") or None
+# Объем LRU-кэша распакованных текстов в байтах
+CONTENT_CACHE_BYTES = int(os.getenv("CONTENT_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+# Первый байт упакованного текста - способ сжатия
+_RAW = b"r"
+_ZLIB = b"z"
+_ZSTD = b"s"
+
+
+class ColdRef:
+    """Ссылка на упакованный текст в файле холодных текстов"""
+
+    __slots__ = ("offset", "length")
+
+    def __init__(self, offset: int, length: int):
+        self.offset = offset
+        self.length = length
+
+
+# Текст в памяти: короткая строка, сжатые байты или ссылка в файл
+Body = Union[str, bytes, ColdRef]
+
+
+def pack(text: str) -> Union[str, bytes]:
+    """Сжать текст, если он длиннее порога и сжатие дает выигрыш"""
+    raw = text.encode("utf-8")
+    if len(raw) < CONTENT_COMPRESSION_THRESHOLD:
+        return text
+    if zstandard is not None:
+        packed = _ZSTD + zstandard.ZstdCompressor(level=CONTENT_ZSTD_LEVEL).compress(raw)
+    else:
+        packed = _ZLIB + zlib.compress(raw, CONTENT_ZLIB_LEVEL)
+    return packed if len(packed) < len(raw) else text
+
+
+def unpack(packed: bytes) -> str:
+    marker, data = packed[:1], packed[1:]
+    if marker == _RAW:
+        return data.decode("utf-8")
+    if marker == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this content")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+
+class BlobFile:
+    """
+    Файл только на дозапись с доступом на чтение через mmap.
+
+    Чтение не требует системного вызова: страницы файла подгружает ОС,
+    и она же вытесняет их из памяти, когда холодные тексты не читаются.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._file = tempfile.TemporaryFile(prefix="content-", suffix=".blob", dir=directory)
+        self._mmap: Optional[mmap.mmap] = None
+        self.size = 0
+
+    def append(self, data: bytes) -> ColdRef:
+        with self._lock:
+            offset = self.size
+            self._file.seek(offset)
+            self._file.write(data)
+            self._file.flush()
+            self.size += len(data)
+            return ColdRef(offset, len(data))
+
+    def read(self, ref: ColdRef) -> bytes:
+        with self._lock:
+            if self._mmap is None or len(self._mmap) < ref.offset + ref.length:
+                # Файл вырос - отображаем заново
+                if self._mmap is not None:
+                    self._mmap.close()
+                self._mmap = mmap.mmap(self._file.fileno(), self.size, access=mmap.ACCESS_READ)
+            return self._mmap[ref.offset:ref.offset + ref.length]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+
+
+class ContentStore:
+    """
+    Хранилище текстов постов: сжатие больших текстов в памяти и выгрузка
+    старых в файл с подгрузкой по требованию через LRU-кэш.
+
+    Занятая память зависит от объема горячих данных, а не от размера
+    всего корпуса: холодный текст в памяти - это только ColdRef.
+    """
+
+    def __init__(self, blob_dir: Optional[str] = CONTENT_BLOB_DIR, cache_bytes: int = CONTENT_CACHE_BYTES):
+        self.blob_dir = blob_dir
+        self.cache_bytes = cache_bytes
+        self._blob: Optional[BlobFile] = None
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._cache_size = 0
+        # Место в файле, занятое перезаписанными и удаленными текстами
+        self.garbage_bytes = 0
+        self.cold_count = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def blob(self) -> BlobFile:
+        if self._blob is None:
+            self._blob = BlobFile(self.blob_dir)
+        return self._blob
+
+    def read(self, key: int, body: Body, cache: bool = True) -> str:
+        """Распаковать текст; key - ключ кэша (id поста)"""
+        if isinstance(body, str):
+            return body
+        if not cache:
+            # Без обращения к LRU - можно вызывать из потока записи снимка
+            return unpack(self.blob.read(body) if isinstance(body, ColdRef) else body)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        packed = self.blob.read(body) if isinstance(body, ColdRef) else body
+        text = unpack(packed)
+        if cache:
+            self._remember(key, text)
+        return text
+
+    def _remember(self, key: int, text: str) -> None:
+        size = len(text)
+        if size > self.cache_bytes:
+            return
+        self._cache[key] = text
+        self._cache_size += size
+        while self._cache_size > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_size -= len(evicted)
+
+    def discard(self, key: int, body: Optional[Body]) -> None:
+        """Забыть текст: пост изменен или удален"""
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cache_size -= len(cached)
+        self.release(body)
+
+    def release(self, body: Optional[Body]) -> None:
+        """
+        Освободить место текста в файле, не трогая кэш - для текстов,
+        которые читаются без кэширования (HTML поста)
+        """
+        if isinstance(body, ColdRef):
+            self.garbage_bytes += body.length
+            self.cold_count -= 1
+
+    def freeze(self, body: Body) -> ColdRef:
+        """Выгрузить текст в файл; короткие тексты пишутся как есть"""
+        if isinstance(body, ColdRef):
+            return body
+        data = _RAW + body.encode("utf-8") if isinstance(body, str) else body
+        self.cold_count += 1
+        return self.blob.append(data)
+
+    def evict_cold(self, posts: Iterable, older_than: float = CONTENT_COLD_AFTER_SECONDS) -> int:
+        """
+        Выгрузить в файл тексты и HTML постов, не изменявшихся дольше
+        older_than секунд. Возвращает число выгруженных текстов.
+        """
+        cutoff = time.time() - older_than
+        evicted = 0
+        for post in posts:
+            if post.updatedAt.timestamp() > cutoff:
+                continue
+            if not isinstance(post.body, ColdRef):
+                post.body = self.freeze(post.body)
+                evicted += 1
+            if post.html is not None and not isinstance(post.html, ColdRef):
+                post.html = self.freeze(post.html)
+                evicted += 1
+        return evicted
+
+    def close(self) -> None:
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "cold_posts": self.cold_count,
+            "blob_bytes": self._blob.size if self._blob is not None else 0,
+            "garbage_bytes": self.garbage_bytes,
+            "cache_entries": len(self._cache),
+            "cache_bytes": self._cache_size,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
+
+
+# Глобальное хранилище текстов постов
+content_store = ContentStore()
+
+
+if __name__ == "__main__":
+    # python -m app.content_store - память под тексты и задержка холодного чтения
+    import random
+    import tempfile
+    import tracemalloc
+    from datetime import datetime, timedelta
+    from app import content_store as module
+    from app.models import Post
+
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+
+    def make_texts():
+        rng.seed(1)
+        return [" ".join(rng.choice(words) for _ in range(800)) for _ in range(2000)]
+
+    tracemalloc.start()
+    texts = make_texts()
+    plain = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"corpus: {len(texts)} posts, plain str {plain / 1e6:.1f} MB")
+    del texts
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = module.content_store
+        store.blob_dir = tmp
+        store.cache_bytes = 4 * 1024 * 1024
+
+        texts = make_texts()
+        tracemalloc.start()
+        posts = [Post(id=i, authorId=1, title=f"Post {i}", content=text) for i, text in enumerate(texts)]
+        del texts
+        print(f"compressed in memory: {tracemalloc.get_traced_memory()[0] / 1e6:.1f} MB")
+        # 90% постов давно не менялись
+        for post in posts[:1800]:
+            post.updatedAt = datetime.now() - timedelta(days=365)
+        store.evict_cold(posts)
+        print(
+            f"90% cold: {tracemalloc.get_traced_memory()[0] / 1e6:.1f} MB in memory, "
+            f"blob file {store.blob.size / 1e6:.1f} MB"
+        )
+        tracemalloc.stop()
+
+        latencies = []
+        for post in rng.sample(posts[:1800], 500):
+            started = time.perf_counter()
+            post.content
+            latencies.append((time.perf_counter() - started) * 1e6)
+        latencies.sort()
+        print(f"cold read (LRU miss): p50 {latencies[250]:.0f} us, p99 {latencies[495]:.0f} us")
+        started = time.perf_counter()
+        for _ in range(1000):
+            posts[0].content
+        print(f"cold read (LRU hit): {(time.perf_counter() - started) * 1000:.2f} us")
+        store.blob.close()
@@ -0,0 +1,145 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+# Алгоритм и параметры стоимости; при их изменении старые хэши
+# прозрачно пересчитываются при следующем входе пользователя
+PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+
+# thread - пул потоков (hashlib отпускает GIL), process - пул процессов
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Сколько операций хэширования может ждать пул одновременно
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=128 * n * r * p + 1024 * 1024, dklen=KEY_BYTES
+    )
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, KEY_BYTES)
+
+
+def hash_password(password: str) -> str:
+    """
+    Хэширует пароль текущим алгоритмом.
+
+    Формат: scrypt$n$r$p$salt$hash или pbkdf2_sha256$iterations$salt$hash.
+    """
+    salt = secrets.token_bytes(SALT_BYTES)
+    if PASSWORD_HASH_ALGORITHM == "pbkdf2_sha256":
+        key = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64encode(salt)}${_b64encode(key)}"
+
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """
+    Проверяет пароль по хэшу за постоянное время.
+
+    Строка без известного префикса считается паролем, сохраненным
+    до появления хэширования.
+    """
+    parts = hashed.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            key = _scrypt(password, _b64decode(parts[4]), n, r, p)
+            return hmac.compare_digest(key, _b64decode(parts[5]))
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            key = _pbkdf2(password, _b64decode(parts[2]), int(parts[1]))
+            return hmac.compare_digest(key, _b64decode(parts[3]))
+    except ValueError:
+        return False
+
+    # Старый формат: пароль в открытом виде
+    return hmac.compare_digest(password.encode(), hashed.encode())
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Проверяет, посчитан ли хэш текущим алгоритмом с текущей стоимостью"""
+    parts = hashed.split("$")
+    if PASSWORD_HASH_ALGORITHM == "pbkdf2_sha256":
+        return parts[:2] != ["pbkdf2_sha256", str(PBKDF2_ITERATIONS)]
+    return parts[:4] != ["scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def _run(func, *args):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+    # Ограничиваем очередь к пулу, чтобы всплеск входов не копил задачи
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    """Хэширует пароль в пуле, не блокируя цикл событий"""
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Проверяет пароль в пуле, не блокируя цикл событий"""
+    return await _run(verify_password, password, hashed)
+
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль и, если хэш устарел, возвращает новый хэш
+    для сохранения: (верен ли пароль, новый хэш или None).
+    """
+    if not await verify_password_async(password, hashed):
+        return False, None
+    if needs_rehash(hashed):
+        return True, await hash_password_async(password)
+    return True, None
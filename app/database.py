@@ -1,8 +1,30 @@
 import json
-from typing import Dict, List
+import os
+import time
+from typing import Dict, List, Optional
 from app.models import User, Post
+from app.content_store import content_store, pack
 from datetime import datetime
 
+class Snapshot:
+    """
+    Неизменяемый снимок хранилища на момент времени.
+    
+    Пользователи копируются целиком (они маленькие), посты - кортежами
+    ссылок на неизменяемые значения: упакованный текст не распаковывается
+    и не копируется, поэтому снимок дешев даже для большого корпуса.
+    """
+    __slots__ = ('users', 'posts', 'next_user_id', 'next_post_id', 'generation', 'taken_at')
+    
+    def __init__(self, users: List[dict], posts: List[tuple],
+                 next_user_id: int, next_post_id: int, generation: int):
+        self.users = users
+        self.posts = posts
+        self.next_user_id = next_user_id
+        self.next_post_id = next_post_id
+        self.generation = generation
+        self.taken_at = time.time()
+
 class Database:
     def __init__(self):
         self.users: Dict[int, User] = {}
@@ -10,12 +32,33 @@ class Database:
         self.next_user_id = 1
         self.next_post_id = 1
         self.data_file = "data.json"
+        # Версии коллекций - дешевые ETag для списков; эпоха отличает запуски процесса
+        self.epoch = int(time.time())
+        self.versions: Dict[str, int] = {'users': 0, 'posts': 0}
+        self.modified_at: Dict[str, float] = {'users': time.time(), 'posts': time.time()}
+        # Номер поколения данных - растет при каждом изменении, попадает в снимки
+        self.generation = 0
         self.load_data()
     
+    def bump_version(self, collection: str):
+        """Отмечает изменение коллекции (для ETag и Last-Modified списков)"""
+        self.versions[collection] += 1
+        self.modified_at[collection] = time.time()
+        self.generation += 1
+    
     def save_data(self):
         """Сохраняет данные в JSON файл"""
-        data = {
-            'users': [
+        self.write_data(self.dump_data())
+    
+    def dump_data(self) -> Snapshot:
+        """
+        Снимает снимок данных для сохранения.
+        
+        Вызывается в цикле событий и не уступает управление, поэтому снимок
+        согласован; сериализация и запись - в write_data (можно в потоке).
+        """
+        return Snapshot(
+            users=[
                 {
                     'id': user.id,
                     'email': user.email,
@@ -26,23 +69,55 @@ class Database:
                 }
                 for user in self.users.values()
             ],
-            'posts': [
-                {
-                    'id': post.id,
-                    'authorId': post.authorId,
-                    'title': post.title,
-                    'content': post.content,
-                    'createdAt': post.createdAt.isoformat(),
-                    'updatedAt': post.updatedAt.isoformat()
-                }
+            posts=[
+                (post.id, post.authorId, post.title, post.body, post.createdAt, post.updatedAt,
+                 post.html, post.excerpt, post.wordCount, post.readingTime, post.renderVersion)
                 for post in self.posts.values()
             ],
-            'next_user_id': self.next_user_id,
-            'next_post_id': self.next_post_id
-        }
+            next_user_id=self.next_user_id,
+            next_post_id=self.next_post_id,
+            generation=self.generation
+        )
+    
+    def write_data(self, snapshot: Snapshot, path: Optional[str] = None):
+        """
+        Записывает снимок в файл (можно вызывать из потока).
         
-        with open(self.data_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        Запись идет во временный файл построчно, без сборки всего документа
+        в памяти, и заменяет целевой файл атомарно: читатель видит либо
+        старую, либо новую версию целиком.
+        """
+        path = path or self.data_file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write('{\n  "users": [')
+            for i, user in enumerate(snapshot.users):
+                f.write((',\n    ' if i else '\n    ') + json.dumps(user))
+            f.write('\n  ],\n  "posts": [')
+            for i, (post_id, author_id, title, body, created_at, updated_at,
+                    html, excerpt, word_count, reading_time, render_version) in enumerate(snapshot.posts):
+                record = {
+                    'id': post_id,
+                    'authorId': author_id,
+                    'title': title,
+                    # Без кэширования: сохранение не должно вытеснять горячие тексты
+                    'content': content_store.read(post_id, body, cache=False),
+                    'contentHtml': content_store.read(post_id, html, cache=False) if html is not None else None,
+                    'excerpt': excerpt,
+                    'wordCount': word_count,
+                    'readingTime': reading_time,
+                    'renderVersion': render_version,
+                    'createdAt': created_at.isoformat(),
+                    'updatedAt': updated_at.isoformat()
+                }
+                f.write((',\n    ' if i else '\n    ') + json.dumps(record))
+            f.write('\n  ],\n')
+            f.write(f'  "next_user_id": {snapshot.next_user_id},\n')
+            f.write(f'  "next_post_id": {snapshot.next_post_id},\n')
+            f.write(f'  "generation": {snapshot.generation}\n}}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
     
     def load_data(self):
         """Загружает данные из JSON файла"""
@@ -72,10 +147,22 @@ class Database:
                 )
                 post.createdAt = datetime.fromisoformat(post_data['createdAt'])
                 post.updatedAt = datetime.fromisoformat(post_data['updatedAt'])
+                # Производные поля; посты без них или со старой версией
+                # конвейера пересчитывает задача render_posts
+                if post_data.get('contentHtml') is not None:
+                    post.html = pack(post_data['contentHtml'])
+                    post.excerpt = post_data.get('excerpt', '')
+                    post.wordCount = post_data.get('wordCount', 0)
+                    post.readingTime = post_data.get('readingTime', 0)
+                    post.renderVersion = post_data.get('renderVersion')
                 self.posts[post.id] = post
             
             self.next_user_id = data.get('next_user_id', 1)
             self.next_post_id = data.get('next_post_id', 1)
+            self.generation = data.get('generation', 0)
+            
+            # Давно не менявшиеся тексты сразу уходят в файл холодных текстов
+            content_store.evict_cold(self.posts.values())
             
         except FileNotFoundError:
             # Файл не существует, начинаем с пустой базы
@@ -1,12 +1,55 @@
-from fastapi import FastAPI
-from app.routes import users, posts
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.routes import users, posts, events, admin
 from app.database import db
+from app.jobs import job_queue, JobQueueFull
+from app.compression import CompressionMiddleware, compression_cache
+from app.content_store import content_store
+from app.credentials import shutdown_executor
+from app.events import hub
+from app.profiling import ProfilingMiddleware
+from app.ratelimit import RateLimitMiddleware
+from app.rendering import render_cache, shutdown_render_executor
+from app.snapshots import snapshots
+from app.tasks import persist_trace
+from app.templating import CachedStaticFiles, STATIC_DIR, STATIC_URL, environment, precompile_templates
 
-app = FastAPI(title="Blog System", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precompile_templates(environment)
+    await job_queue.start()
+    # Пересчет производных полей постов, если сменилась версия конвейера
+    await job_queue.enqueue("render_posts", key="render_posts")
+    yield
+    # Дожидаемся фоновых задач (в том числе сохранения данных)
+    await job_queue.drain(timeout=30)
+    await snapshots.wait()
+    db.save_data()
+    content_store.close()
+    shutdown_executor()
+    shutdown_render_executor()
+
+app = FastAPI(title="Blog System", version="1.0.0", lifespan=lifespan)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Внешний слой: профиль охватывает сжатие и ограничение частоты
+app.add_middleware(ProfilingMiddleware)
 
 # Подключаем роутеры
 app.include_router(users.router)
 app.include_router(posts.router)
+app.include_router(events.router)
+app.include_router(admin.router)
+app.mount(STATIC_URL, CachedStaticFiles(directory=STATIC_DIR), name="static")
+
+@app.exception_handler(JobQueueFull)
+async def job_queue_full_handler(request: Request, exc: JobQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": "1"}
+    )
 
 @app.get("/")
 async def root():
@@ -16,6 +59,30 @@ async def root():
         "posts_count": len(db.posts)
     }
 
+@app.get("/metrics/jobs")
+async def jobs_metrics():
+    return job_queue.metrics()
+
+@app.get("/metrics/events")
+async def events_metrics():
+    return hub.metrics()
+
+@app.get("/metrics/compression")
+async def compression_metrics():
+    return compression_cache.metrics()
+
+@app.get("/metrics/rendering")
+async def rendering_metrics():
+    return render_cache.metrics()
+
+@app.get("/metrics/content")
+async def content_metrics():
+    return content_store.metrics()
+
+@app.get("/metrics/persist")
+async def persist_metrics():
+    return persist_trace.summary()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,12 +1,14 @@
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
+from app.content_store import Body, content_store, pack
+from app.rendering import Rendered
 
 class User:
     def __init__(self, id: int, email: str, login: str, password: str):
         self.id = id
         self.email = email
         self.login = login
-        self.password = password
+        self.password = password  # хэш пароля, см. app/credentials.py
         self.createdAt = datetime.now()
         self.updatedAt = datetime.now()
 
@@ -15,6 +17,42 @@ class Post:
         self.id = id
         self.authorId = authorId
         self.title = title
+        self.body: Body = None  # упакованный текст, см. app/content_store.py
         self.content = content
+        # Производные поля - считаются при записи, см. app/rendering.py
+        self.html: Optional[Body] = None
+        self.excerpt = ""
+        self.wordCount = 0
+        self.readingTime = 0
+        self.renderVersion: Optional[str] = None
         self.createdAt = datetime.now()
-        self.updatedAt = datetime.now()
\ No newline at end of file
+        self.updatedAt = datetime.now()
+    
+    @property
+    def content(self) -> str:
+        return content_store.read(self.id, self.body)
+    
+    @content.setter
+    def content(self, value: str):
+        content_store.discard(self.id, self.body)
+        self.body = pack(value)
+    
+    @property
+    def contentHtml(self) -> Optional[str]:
+        if self.html is None:
+            return None
+        return content_store.read(self.id, self.html, cache=False)
+    
+    def discard(self):
+        """Освободить текст и HTML удаленного поста в хранилище"""
+        content_store.discard(self.id, self.body)
+        content_store.release(self.html)
+    
+    def apply_render(self, rendered: Rendered):
+        # Прежний HTML мог быть выгружен в файл - его место становится мусором
+        content_store.release(self.html)
+        self.html = pack(rendered.html)
+        self.excerpt = rendered.excerpt
+        self.wordCount = rendered.word_count
+        self.readingTime = rendered.reading_time
+        self.renderVersion = rendered.version
\ No newline at end of file
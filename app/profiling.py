@@ -0,0 +1,267 @@
+import cProfile
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Секрет подписи заголовка профилирования; пусто - профилирование запросов отключено
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_HEADER = b"x-debug-profile"
+# Период выборки стеков сэмплирующим профилировщиком
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Сколько профилей запросов хранится для просмотра
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+# Сколько строк статистики cProfile попадает в отчет
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "60"))
+
+
+class Trace:
+    """Суммарное время по фазам (span) одного запроса"""
+
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans: Dict[str, List[float]] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        total = self.spans.get(name)
+        if total is None:
+            self.spans[name] = [duration, 1]
+        else:
+            total[0] += duration
+            total[1] += 1
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f'{name};dur={duration * 1000:.1f};desc="{int(count)}x"'
+            for name, (duration, count) in self.spans.items()
+        )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {"totalMs": round(duration * 1000, 2), "count": int(count)}
+            for name, (duration, count) in self.spans.items()
+        }
+
+
+# Трасса текущего запроса; None - трассировка выключена
+_trace: ContextVar[Optional[Trace]] = ContextVar("profiling_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def tracing(trace: Trace) -> Iterator[Trace]:
+    """
+    Собирать фазы (span) блока в trace - для работы вне запроса,
+    например фоновых задач.
+    """
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+class span:
+    """
+    Фаза обработки запроса:
+
+        with span("render"):
+            ...
+
+    Без активной трассы стоит одного чтения ContextVar.
+    """
+
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _trace.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class SamplerBusy(Exception):
+    """Сэмплирование уже выполняется."""
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик: поток раз в interval снимает стеки
+    всех потоков процесса (sys._current_frames). Результат - свернутые
+    стеки ("поток;файл:функция;... число"), вход для flamegraph.pl
+    и speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def collapse(frame, thread_name: str) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+    def sample(self, seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL) -> Tuple[Counter, int]:
+        """
+        Блокирующий сбор выборок (вызывать в отдельном потоке).
+        Возвращает счетчик стеков и число выборок.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise SamplerBusy()
+        try:
+            own = threading.get_ident()
+            stacks: Counter = Counter()
+            samples = 0
+            deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident != own:
+                        stacks[self.collapse(frame, names.get(ident, str(ident)))] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def format(stacks: Counter) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# Глобальный сэмплирующий профилировщик
+sampler = SamplingProfiler()
+
+
+def sign_profile_token(ttl: float, secret: str = PROFILE_SECRET) -> str:
+    """Значение заголовка профилирования, действующее ttl секунд"""
+    expires = str(int(time.time() + ttl))
+    signature = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_profile_token(token: str, secret: str = PROFILE_SECRET) -> bool:
+    if not secret:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+class ProfileStore:
+    """Последние профили запросов (кольцевой буфер)"""
+
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = keep
+        self._data: "OrderedDict[str, dict]" = OrderedDict()
+
+    def add(self, profile_id: str, profile: dict) -> None:
+        self._data[profile_id] = profile
+        while len(self._data) > self.keep:
+            self._data.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._data.get(profile_id)
+
+    def list(self) -> List[dict]:
+        return [
+            {"id": profile_id, **{k: v for k, v in profile.items() if k != "stats"}}
+            for profile_id, profile in reversed(self._data.items())
+        ]
+
+
+# Глобальное хранилище профилей запросов
+profiles = ProfileStore()
+
+# cProfile может быть включен в потоке только один
+_profiling = False
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware: запрос с подписанным заголовком X-Debug-Profile
+    выполняется под cProfile, время фаз (span) отдается в Server-Timing,
+    а профиль - по id из заголовка X-Profile-Id.
+
+    cProfile видит весь поток цикла событий: в профиль попадают и
+    конкурентные запросы. Без заголовка - одна проверка на запрос.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _profiling
+        if scope["type"] != "http" or not PROFILE_SECRET or _profiling:
+            await self.app(scope, receive, send)
+            return
+        token = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                token = value.decode("latin-1")
+                break
+        if token is None or not verify_profile_token(token):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = secrets.token_hex(8)
+        trace = Trace()
+        trace_token = _trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                if trace.spans:
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        _profiling = True
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            _profiling = False
+            _trace.reset(trace_token)
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            profiles.add(profile_id, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "durationMs": round((time.perf_counter() - started) * 1000, 2),
+                "spans": {name: round(duration * 1000, 2) for name, (duration, _) in trace.spans.items()},
+                "createdAt": time.time(),
+                "stats": output.getvalue(),
+            })
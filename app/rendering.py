@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import html
+import math
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+from app.profiling import span
+
+try:
+    import markdown
+except ImportError:  # markdown - необязательная зависимость
+    markdown = None
+
+try:
+    import nh3
+except ImportError:  # nh3 - необязательная зависимость (очистка HTML от markdown)
+    nh3 = None
+
+# Длина автоматической выдержки в символах
+RENDER_EXCERPT_LENGTH = int(os.getenv("RENDER_EXCERPT_LENGTH", "200"))
+RENDER_WORDS_PER_MINUTE = int(os.getenv("RENDER_WORDS_PER_MINUTE", "200"))
+# Тексты длиннее этого размера рендерятся в пуле, короткие - сразу
+RENDER_INLINE_MAX = int(os.getenv("RENDER_INLINE_MAX", "4096"))
+# process - пул процессов (рендеринг на чистом Python держит GIL), thread - пул потоков
+RENDER_EXECUTOR = os.getenv("RENDER_EXECUTOR", "process")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+RENDER_MAX_PENDING = int(os.getenv("RENDER_MAX_PENDING", "64"))
+# Сколько результатов рендеринга держать в кэше по хэшу текста
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "1024"))
+
+# Увеличивается при любом изменении логики рендеринга
+RENDERER_REVISION = 2
+# markdown без очистки HTML небезопасен - тогда используется встроенный рендерер
+RENDER_BACKEND = "markdown" if markdown is not None and nh3 is not None else "builtin"
+# Версия конвейера: меняется вместе с настройками - посты со старой версией пересчитываются
+PIPELINE_VERSION = hashlib.sha1(
+    f"{RENDERER_REVISION}:{RENDER_BACKEND}:{RENDER_EXCERPT_LENGTH}:{RENDER_WORDS_PER_MINUTE}".encode()
+).hexdigest()[:12]
+
+
+class Rendered(NamedTuple):
+    """Производные поля текста поста"""
+    html: str
+    excerpt: str
+    word_count: int
+    reading_time: int  # минуты
+    content_hash: str
+    version: str
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Встроенный рендерер: подмножество markdown. Текст экранируется до разметки,
+# поэтому пользовательский HTML в результат не попадает.
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_BULLET = re.compile(r"^\s*[-*+]\s+(.*)$")
+_ORDERED = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+_QUOTE = re.compile(r"^>\s?(.*)$")
+_FENCE = re.compile(r"^\s*```")
+_CODE_SPAN = re.compile(r"`([^`]+)`")
+_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_STRONG = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_EM = re.compile(r"\*(.+?)\*|(?<!\w)_(.+?)_(?!\w)")
+_SAFE_URL = re.compile(r"^(https?://|mailto:|/|#)", re.IGNORECASE)
+_STASH = re.compile("\x00(\\d+)\x00")
+
+
+def _emphasis(text: str) -> str:
+    text = _STRONG.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    return _EM.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+
+
+def _inline(text: str) -> str:
+    # Готовые фрагменты (код, ссылки) заменяются метками, чтобы разметка
+    # не применялась к их содержимому - например, к * и _ в href
+    stashed: List[str] = []
+
+    def stash(fragment: str) -> str:
+        stashed.append(fragment)
+        return f"\x00{len(stashed) - 1}\x00"
+
+    def unstash(text: str) -> str:
+        return _STASH.sub(lambda m: stashed[int(m.group(1))], text)
+
+    def link(match) -> str:
+        label, url = match.group(1), match.group(2)
+        if not _SAFE_URL.match(url):
+            return label
+        # Разметка подписи применяется внутри <a>, а не поверх ссылки
+        return stash(f'<a href="{url}" rel="nofollow">{unstash(_emphasis(label))}</a>')
+
+    text = _CODE_SPAN.sub(lambda m: stash(f"<code>{m.group(1)}</code>"), html.escape(text))
+    text = _LINK.sub(link, text)
+    return unstash(_emphasis(text))
+
+
+def _builtin_html(text: str) -> str:
+    out: List[str] = []
+    paragraph: List[str] = []
+    quote: List[str] = []
+    items: List[str] = []
+    list_tag: Optional[str] = None
+
+    def flush():
+        nonlocal list_tag
+        if paragraph:
+            out.append("<p>" + "<br>\n".join(_inline(line) for line in paragraph) + "</p>")
+            paragraph.clear()
+        if quote:
+            out.append("<blockquote><p>" + "<br>\n".join(_inline(line) for line in quote) + "</p></blockquote>")
+            quote.clear()
+        if items:
+            out.append(f"<{list_tag}>" + "".join(f"<li>{_inline(item)}</li>" for item in items) + f"</{list_tag}>")
+            items.clear()
+            list_tag = None
+
+    lines = text.replace("\x00", "").replace("\r\n", "\n").split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if _FENCE.match(line):
+            flush()
+            code: List[str] = []
+            while i < len(lines) and not _FENCE.match(lines[i]):
+                code.append(lines[i])
+                i += 1
+            i += 1  # закрывающий ```
+            out.append("<pre><code>" + html.escape("\n".join(code)) + "</code></pre>")
+            continue
+        if not line.strip():
+            flush()
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+            continue
+        bullet, ordered = _BULLET.match(line), _ORDERED.match(line)
+        if bullet or ordered:
+            tag = "ul" if bullet else "ol"
+            if list_tag != tag:
+                flush()
+                list_tag = tag
+            items.append((bullet or ordered).group(1))
+            continue
+        if items and line[:1].isspace():
+            items[-1] += " " + line.strip()
+            continue
+        quoted = _QUOTE.match(line)
+        if quoted:
+            if paragraph or items:
+                flush()
+            quote.append(quoted.group(1))
+            continue
+        if quote or items:
+            flush()
+        paragraph.append(line)
+    flush()
+    return "\n".join(out)
+
+
+def markdown_to_html(text: str) -> str:
+    """Markdown -> безопасный HTML"""
+    if RENDER_BACKEND == "markdown":
+        return nh3.clean(markdown.markdown(text, extensions=["fenced_code"]))
+    return _builtin_html(text)
+
+
+_MARKUP = re.compile(r"(^|\n)\s*(#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+|```\w*)|[*`]|(?<!\w)_|_(?!\w)")
+
+
+def plain_text(text: str) -> str:
+    """Текст без разметки markdown - для выдержки и подсчета слов"""
+    text = _LINK.sub(lambda m: m.group(1), text)
+    return " ".join(_MARKUP.sub(lambda m: m.group(1) or "", text).split())
+
+
+def make_excerpt(plain: str, length: int = RENDER_EXCERPT_LENGTH) -> str:
+    if len(plain) <= length:
+        return plain
+    cut = plain[:length].rsplit(" ", 1)[0] or plain[:length]
+    return cut.rstrip(",.;:-") + "…"
+
+
+def render(text: str, digest: Optional[str] = None) -> Rendered:
+    """
+    Прогнать текст через конвейер: HTML, выдержка, число слов, время чтения.
+    Чистая функция - выполняется и в пуле процессов.
+    """
+    plain = plain_text(text)
+    words = len(re.findall(r"\w+", plain))
+    return Rendered(
+        html=markdown_to_html(text),
+        excerpt=make_excerpt(plain),
+        word_count=words,
+        reading_time=math.ceil(words / RENDER_WORDS_PER_MINUTE) if words else 0,
+        content_hash=digest or content_hash(text),
+        version=PIPELINE_VERSION,
+    )
+
+
+class RenderCache:
+    """LRU-кэш результатов рендеринга по хэшу текста"""
+
+    def __init__(self, max_entries: int = RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Rendered]" = OrderedDict()
+
+    def get(self, digest: str) -> Optional[Rendered]:
+        value = self._data.get(digest)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(digest)
+        self.hits += 1
+        return value
+
+    def set(self, digest: str, value: Rendered) -> None:
+        if self.max_entries <= 0:
+            return
+        self._data[digest] = value
+        self._data.move_to_end(digest)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def metrics(self):
+        return {
+            "version": PIPELINE_VERSION,
+            "backend": RENDER_BACKEND,
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Глобальный кэш рендеринга
+render_cache = RenderCache()
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_render_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if RENDER_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+    return _executor
+
+
+def shutdown_render_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def render_async(text: str) -> Rendered:
+    """
+    Рендеринг при записи: из кэша по хэшу текста, короткие тексты -
+    сразу, длинные - в пуле, не блокируя цикл событий.
+    """
+    global _semaphore
+    with span("render"):
+        digest = content_hash(text)
+        cached = render_cache.get(digest)
+        if cached is not None:
+            return cached
+
+        if len(text) <= RENDER_INLINE_MAX:
+            rendered = render(text, digest)
+        else:
+            if _semaphore is None:
+                _semaphore = asyncio.Semaphore(RENDER_MAX_PENDING)
+            async with _semaphore:
+                loop = asyncio.get_running_loop()
+                rendered = await loop.run_in_executor(get_render_executor(), render, text, digest)
+
+        render_cache.set(digest, rendered)
+        return rendered
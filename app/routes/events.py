@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from app.events import EventFilter, TooManySubscribers, hub, long_poll, sse_stream
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+def _event_filter(types: Optional[str], post_id: Optional[int], author_id: Optional[int]) -> EventFilter:
+    return EventFilter(
+        types=set(types.split(",")) if types else None,
+        post_id=post_id,
+        author_id=author_id
+    )
+
+@router.get("/stream")
+async def stream_events(types: Optional[str] = None, post_id: Optional[int] = None, author_id: Optional[int] = None, last_event_id: Optional[int] = Header(None)):
+    # Server-Sent Events: события создания, изменения и удаления постов
+    try:
+        subscription = hub.subscribe(_event_filter(types, post_id, author_id))
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        sse_stream(subscription, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/poll")
+async def poll_events(since: int = 0, types: Optional[str] = None, post_id: Optional[int] = None, author_id: Optional[int] = None):
+    # Long-poll для клиентов без поддержки SSE
+    try:
+        body = await long_poll(hub, _event_filter(types, post_id, author_id), since)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "5"})
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
\ No newline at end of file
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from datetime import datetime
+from typing import Optional, Union
 from app.database import db
-from app.schemas import PostCreate, PostResponse
+from app.batch import parse_ids, pick_by_ids, set_missing_ids
+from app.conditional import make_etag, is_not_modified, not_modified, set_validators
+from app.events import hub
+from app.rendering import render_async
+from app.tasks import schedule_persist
+from app.templating import templates
+from app.schemas import PostCreate, PostResponse, PostSummary
 from app.models import Post
 
 router = APIRouter(prefix="/posts", tags=["posts"])
-templates = Jinja2Templates(directory="templates")
+
+def _publish(event_type: str, post: Post):
+    hub.publish(event_type, PostResponse.model_validate(post).model_dump(), post_id=post.id, author_id=post.authorId)
 
 @router.post("/", response_model=PostResponse)
 async def create_post(post: PostCreate):
@@ -20,28 +28,52 @@ async def create_post(post: PostCreate):
     if not post.content.strip():
         raise HTTPException(status_code=400, detail="Content cannot be empty")
     
+    # Рендеринг до выделения id: пока он идет, могут выполняться другие запросы
+    rendered = await render_async(post.content)
     new_post = Post(
         id=db.next_post_id,
         authorId=post.authorId,
         title=post.title,
         content=post.content
     )
+    new_post.apply_render(rendered)
     
     db.posts[new_post.id] = new_post
     db.next_post_id += 1
-    db.save_data()
+    db.bump_version('posts')
+    await schedule_persist()
+    _publish("post.created", new_post)
     
     return new_post
 
-@router.get("/", response_model=list[PostResponse])
-async def get_posts():
-    return list(db.posts.values())
+@router.get("/", response_model=Union[list[PostResponse], list[PostSummary]])
+async def get_posts(request: Request, response: Response, ids: Optional[str] = None):
+    # Список - заголовки и анонсы (PostSummary), тела постов не распаковываются.
+    # ?ids=3,1,2 - полные посты, как GET /posts/{id}, в порядке запроса;
+    # отсутствующие - в X-Missing-Ids
+    wanted = parse_ids(ids) if ids is not None else None
+    etag = make_etag('posts', db.epoch, db.versions['posts'], wanted)
+    last_modified = db.modified_at['posts']
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    if wanted is None:
+        return [PostSummary.model_validate(post) for post in db.posts.values()]
+    items, missing = pick_by_ids(wanted, db.posts)
+    set_missing_ids(response, missing)
+    return [PostResponse.model_validate(post) for post in items]
 
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post(post_id: int):
+async def get_post(post_id: int, request: Request, response: Response):
     if post_id not in db.posts:
         raise HTTPException(status_code=404, detail="Post not found")
-    return db.posts[post_id]
+    post = db.posts[post_id]
+    etag = make_etag('post', post.id, post.updatedAt.isoformat(), post.renderVersion)
+    last_modified = post.updatedAt.timestamp()
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    return post
 
 @router.put("/{post_id}", response_model=PostResponse)
 async def update_post(post_id: int, post: PostCreate):
@@ -57,11 +89,18 @@ async def update_post(post_id: int, post: PostCreate):
     if not post.content.strip():
         raise HTTPException(status_code=400, detail="Content cannot be empty")
     
+    rendered = await render_async(post.content)
+    if post_id not in db.posts:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
     db.posts[post_id].authorId = post.authorId
     db.posts[post_id].title = post.title
     db.posts[post_id].content = post.content
+    db.posts[post_id].apply_render(rendered)
     db.posts[post_id].updatedAt = datetime.now()
-    db.save_data()
+    db.bump_version('posts')
+    await schedule_persist()
+    _publish("post.updated", db.posts[post_id])
     
     return db.posts[post_id]
 
@@ -70,8 +109,11 @@ async def delete_post(post_id: int):
     if post_id not in db.posts:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    del db.posts[post_id]
-    db.save_data()
+    deleted = db.posts.pop(post_id)
+    deleted.discard()
+    db.bump_version('posts')
+    await schedule_persist()
+    hub.publish("post.deleted", {"id": post_id}, post_id=post_id, author_id=deleted.authorId)
     
     return {"message": "Post deleted successfully"}
 
@@ -90,8 +132,9 @@ async def get_posts_html(request: Request):
         })
     
     return templates.TemplateResponse(
+        request,
         "index.html",
-        {"request": request, "posts": posts_with_authors}
+        {"posts": posts_with_authors}
     )
 
 @router.get("/html/{post_id}", response_class=HTMLResponse)
@@ -104,15 +147,17 @@ async def get_post_html(request: Request, post_id: int):
     author_name = author.login if author else "Unknown"
     
     return templates.TemplateResponse(
+        request,
         "post.html",
-        {"request": request, "post": post, "author_name": author_name}
+        {"post": post, "author_name": author_name}
     )
 
 @router.get("/html/create/new", response_class=HTMLResponse)
 async def create_post_form(request: Request):
     return templates.TemplateResponse(
+        request,
         "create_post.html",
-        {"request": request, "users": list(db.users.values())}
+        {"users": list(db.users.values())}
     )
 
 @router.get("/html/edit/{post_id}", response_class=HTMLResponse)
@@ -122,6 +167,7 @@ async def edit_post_form(request: Request, post_id: int):
     
     post = db.posts[post_id]
     return templates.TemplateResponse(
+        request,
         "edit_post.html",
-        {"request": request, "post": post, "users": list(db.users.values())}
+        {"post": post, "users": list(db.users.values())}
     )
\ No newline at end of file
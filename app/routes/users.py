@@ -1,62 +1,114 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from datetime import datetime
+from typing import Optional
 from app.database import db
-from app.schemas import UserCreate, UserResponse
+from app.events import hub
+from app.batch import parse_ids, pick_by_ids, set_missing_ids
+from app.conditional import make_etag, is_not_modified, not_modified, set_validators
+from app.credentials import hash_password_async, verify_and_update
+from app.tasks import schedule_persist
+from app.schemas import UserCreate, UserLogin, UserResponse
 from app.models import User
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.post("/", response_model=UserResponse)
-async def create_user(user: UserCreate):
+def _check_unique(email: str, login: str, exclude_id: Optional[int] = None):
     # Проверяем, существует ли пользователь с таким email или логином
     for existing_user in db.users.values():
-        if existing_user.email == user.email:
+        if existing_user.id == exclude_id:
+            continue
+        if existing_user.email == email:
             raise HTTPException(status_code=400, detail="Email already registered")
-        if existing_user.login == user.login:
+        if existing_user.login == login:
             raise HTTPException(status_code=400, detail="Login already taken")
+
+@router.post("/", response_model=UserResponse)
+async def create_user(user: UserCreate):
+    # Ранняя проверка - чтобы не хэшировать пароль зря
+    _check_unique(user.email, user.login)
+    password = await hash_password_async(user.password)
     
+    # Пока считался хэш, могли зарегистрироваться другие: проверка,
+    # выделение id и вставка - без await между ними
+    _check_unique(user.email, user.login)
     new_user = User(
         id=db.next_user_id,
         email=user.email,
         login=user.login,
-        password=user.password
+        password=password
     )
-    
     db.users[new_user.id] = new_user
     db.next_user_id += 1
-    db.save_data()
+    db.bump_version('users')
+    await schedule_persist()
     
     return new_user
 
+@router.post("/login", response_model=UserResponse)
+async def login_user(credentials: UserLogin):
+    user = next((u for u in db.users.values() if u.login == credentials.login), None)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid login or password")
+    
+    valid, new_hash = await verify_and_update(credentials.password, user.password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid login or password")
+    
+    # Хэш посчитан со старыми параметрами - сохраняем пересчитанный
+    if new_hash is not None:
+        user.password = new_hash
+        await schedule_persist()
+    
+    return user
+
 @router.get("/", response_model=list[UserResponse])
-async def get_users():
-    return list(db.users.values())
+async def get_users(request: Request, response: Response, ids: Optional[str] = None):
+    # ?ids=3,1,2 - выборка по id в порядке запроса, отсутствующие - в X-Missing-Ids
+    wanted = parse_ids(ids) if ids is not None else None
+    etag = make_etag('users', db.epoch, db.versions['users'], wanted)
+    last_modified = db.modified_at['users']
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    if wanted is None:
+        return list(db.users.values())
+    items, missing = pick_by_ids(wanted, db.users)
+    set_missing_ids(response, missing)
+    return items
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int):
+async def get_user(user_id: int, request: Request, response: Response):
     if user_id not in db.users:
         raise HTTPException(status_code=404, detail="User not found")
-    return db.users[user_id]
+    user = db.users[user_id]
+    etag = make_etag('user', user.id, user.updatedAt.isoformat())
+    last_modified = user.updatedAt.timestamp()
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    return user
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(user_id: int, user: UserCreate):
     if user_id not in db.users:
         raise HTTPException(status_code=404, detail="User not found")
+    _check_unique(user.email, user.login, exclude_id=user_id)
+    password = await hash_password_async(user.password)
     
-    # Проверяем уникальность email и логина
-    for existing_user in db.users.values():
-        if existing_user.id != user_id:
-            if existing_user.email == user.email:
-                raise HTTPException(status_code=400, detail="Email already registered")
-            if existing_user.login == user.login:
-                raise HTTPException(status_code=400, detail="Login already taken")
-    
-    db.users[user_id].email = user.email
-    db.users[user_id].login = user.login
-    db.users[user_id].password = user.password
-    db.users[user_id].updatedAt = datetime.now()
-    db.save_data()
+    # Пока считался хэш, пользователя могли удалить, а email или логин -
+    # занять: проверяем заново и меняем все поля без await
+    db_user = db.users.get(user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    _check_unique(user.email, user.login, exclude_id=user_id)
+    db_user.email = user.email
+    db_user.login = user.login
+    db_user.password = password
+    db_user.updatedAt = datetime.now()
+    db.bump_version('users')
+    await schedule_persist()
     
-    return db.users[user_id]
+    return db_user
 
 @router.delete("/{user_id}")
 async def delete_user(user_id: int):
@@ -65,10 +117,17 @@ async def delete_user(user_id: int):
     
     # Удаляем также все посты пользователя
     posts_to_delete = [post_id for post_id, post in db.posts.items() if post.authorId == user_id]
-    for post_id in posts_to_delete:
-        del db.posts[post_id]
+    deleted_posts = [db.posts.pop(post_id) for post_id in posts_to_delete]
+    for post in deleted_posts:
+        post.discard()
     
     del db.users[user_id]
-    db.save_data()
+    db.bump_version('users')
+    if posts_to_delete:
+        db.bump_version('posts')
+    await schedule_persist()
+    # Подписчики потока узнают об удалении постов так же, как при DELETE /posts/{id}
+    for post in deleted_posts:
+        hub.publish("post.deleted", {"id": post.id}, post_id=post.id, author_id=user_id)
     
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -21,6 +21,10 @@ class UserCreate(UserBase):
             raise ValueError('Invalid email format')
         return v
 
+class UserLogin(BaseModel):
+    login: str
+    password: str
+
 class UserResponse(UserBase):
     id: int
     createdAt: datetime
@@ -36,9 +40,28 @@ class PostBase(BaseModel):
 class PostCreate(PostBase):
     authorId: int
 
+class PostSummary(BaseModel):
+    # Элемент списка постов: без текста и HTML, чтобы список не
+    # распаковывал тела постов
+    id: int
+    authorId: int
+    title: str
+    excerpt: str = ""
+    wordCount: int = 0
+    readingTime: int = 0
+    createdAt: datetime
+    updatedAt: datetime
+    
+    class Config:
+        from_attributes = True
+
 class PostResponse(PostBase):
     id: int
     authorId: int
+    contentHtml: Optional[str] = None
+    excerpt: str = ""
+    wordCount: int = 0
+    readingTime: int = 0
     createdAt: datetime
     updatedAt: datetime
     
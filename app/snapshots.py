@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from app.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+# Каталог снимков и сколько последних снимков хранить
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "5"))
+
+_PREFIX = "snapshot-"
+_SUFFIX = ".json"
+
+
+class SnapshotInProgress(Exception):
+    """Предыдущий снимок еще записывается."""
+
+
+class SnapshotManager:
+    """
+    Онлайн-снимки хранилища.
+
+    Снимок снимается в цикле событий за один проход по ссылкам (без
+    сериализации), а пишется на диск в потоке: запись не останавливает
+    обработку запросов, сколько бы ни занимал файл. Файл появляется
+    атомарно, хранятся SNAPSHOT_KEEP последних снимков. Формат совпадает
+    с data.json - для восстановления снимок достаточно скопировать.
+    """
+
+    def __init__(self, database: Database, directory: str = SNAPSHOT_DIR, keep: int = SNAPSHOT_KEEP):
+        self.database = database
+        self.directory = directory
+        self.keep = keep
+        self.current: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> Dict[str, Any]:
+        """
+        Снять снимок и запустить его запись в фоне.
+        Возвращает описание снимка; файл появится после записи.
+        """
+        if self._task is not None and not self._task.done():
+            raise SnapshotInProgress()
+
+        snapshot = self.database.dump_data()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(snapshot.taken_at))
+        micros = int(snapshot.taken_at % 1 * 1_000_000)
+        name = f"{_PREFIX}{stamp}.{micros:06d}Z-g{snapshot.generation}{_SUFFIX}"
+        self.current = {
+            "name": name,
+            "generation": snapshot.generation,
+            "users": len(snapshot.users),
+            "posts": len(snapshot.posts),
+            "takenAt": snapshot.taken_at,
+        }
+        self._task = asyncio.create_task(self._write(snapshot, name))
+        return self.current
+
+    async def _write(self, snapshot, name: str) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write_sync, snapshot, name)
+            self.last_error = None
+            logger.info("Snapshot %s written in %.2fs", name, time.perf_counter() - started)
+        except Exception as e:
+            self.last_error = f"{name}: {e}"
+            logger.exception("Snapshot %s failed", name)
+        finally:
+            self.current = None
+
+    def _write_sync(self, snapshot, name: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.database.write_data(snapshot, os.path.join(self.directory, name))
+        self._rotate()
+
+    def _names(self) -> List[str]:
+        try:
+            entries = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        # Имена начинаются с времени снимка - сортировка по имени хронологическая
+        return sorted(n for n in entries if n.startswith(_PREFIX) and n.endswith(_SUFFIX))
+
+    def _rotate(self) -> None:
+        names = self._names()
+        for name in names[:max(0, len(names) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Готовые снимки, новые первыми"""
+        snapshots = []
+        for name in reversed(self._names()):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            snapshots.append({"name": name, "size": stat.st_size, "modifiedAt": stat.st_mtime})
+        return snapshots
+
+    async def wait(self) -> None:
+        """Дождаться записи текущего снимка"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+
+# Глобальный менеджер снимков
+snapshots = SnapshotManager(db)
@@ -0,0 +1,53 @@
+import asyncio
+from app.content_store import content_store
+from app.database import db
+from app.jobs import job_queue
+from app.profiling import Trace, span, tracing
+from app.rendering import PIPELINE_VERSION, render_async
+
+_persist_lock = asyncio.Lock()
+# Время фаз сохранения: оно идет в воркере очереди, а не в запросе,
+# поэтому копится отдельно (GET /metrics/persist)
+persist_trace = Trace()
+
+
+@job_queue.job("persist")
+async def persist():
+    """Сохраняет данные в файл вне обработчика запроса"""
+    async with _persist_lock:
+        with tracing(persist_trace):
+            # Снимок собирается в цикле событий, запись на диск - в потоке
+            with span("persist_snapshot"):
+                data = db.dump_data()
+            with span("persist_write"):
+                await asyncio.to_thread(db.write_data, data)
+            with span("persist_evict"):
+                content_store.evict_cold(db.posts.values())
+
+
+async def schedule_persist():
+    """Ставит сохранение в очередь; несколько записей подряд схлопываются"""
+    # В запросе - только постановка в очередь, само сохранение - в persist_trace
+    with span("persist_enqueue"):
+        await job_queue.enqueue("persist", key="persist")
+
+
+@job_queue.job("render_posts")
+async def render_posts():
+    """
+    Пересчитывает производные поля постов, отрендеренных другой
+    версией конвейера (например, после смены настроек).
+    """
+    rendered_count = 0
+    for post in list(db.posts.values()):
+        if post.renderVersion == PIPELINE_VERSION:
+            continue
+        body = post.body
+        rendered = await render_async(post.content)
+        # Пока шел рендеринг, пост могли изменить или удалить
+        if post.body is body and db.posts.get(post.id) is post:
+            post.apply_render(rendered)
+            rendered_count += 1
+    if rendered_count:
+        db.bump_version('posts')
+        await schedule_persist()
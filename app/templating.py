@@ -0,0 +1,82 @@
+import hashlib
+import os
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app.profiling import span
+
+TEMPLATES_DIR = os.getenv("TEMPLATES_DIR", "templates")
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+STATIC_URL = "/static"
+# Каталог байткод-кэша Jinja2; переживает перезапуски и общий для воркеров
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", ".jinja_cache")
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+
+# Версионированные статические файлы кэшируются браузером на год
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_static_hashes = {}
+
+
+def static_url(path: str) -> str:
+    """Возвращает URL статического файла с хэшем содержимого"""
+    digest = _static_hashes.get(path)
+    if digest is None:
+        with open(os.path.join(STATIC_DIR, path), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        _static_hashes[path] = digest
+    return f"{STATIC_URL}/{path}?v={digest}"
+
+
+class CachedStaticFiles(StaticFiles):
+    """Раздача статики с долгим кэшированием для URL с хэшем (?v=...)"""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200 and b"v=" in scope.get("query_string", b""):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def create_environment(directory=TEMPLATES_DIR, cache_dir=TEMPLATE_CACHE_DIR):
+    """Создает окружение Jinja2 с байткод-кэшем на диске"""
+    bytecode_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    environment = Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=TEMPLATES_AUTO_RELOAD,
+        cache_size=-1
+    )
+    environment.globals["static_url"] = static_url
+    return environment
+
+
+def precompile_templates(environment):
+    """Компилирует все шаблоны заранее, возвращает их количество"""
+    names = environment.list_templates()
+    for name in names:
+        environment.get_template(name)
+    return len(names)
+
+
+class TracedTemplates(Jinja2Templates):
+    """Шаблоны с замером времени рендеринга (фаза "template" в профиле запроса)"""
+
+    def TemplateResponse(self, *args, **kwargs):
+        with span("template"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+# Общие для всех роутеров шаблоны
+environment = create_environment()
+templates = TracedTemplates(env=environment)
+
+if __name__ == "__main__":
+    # python -m app.templating - заполнить байткод-кэш до запуска сервера
+    count = precompile_templates(environment)
+    print(f"Precompiled {count} templates into {TEMPLATE_CACHE_DIR}")
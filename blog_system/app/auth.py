@@ -0,0 +1,199 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.database import get_db
+
+logger = logging.getLogger(__name__)
+
+SECRET_KEY = os.getenv("SECRET_KEY", "")
+if not SECRET_KEY:
+    # Без ключа токены действуют только до перезапуска процесса
+    logger.warning("SECRET_KEY is not set, using a random per-process key")
+    SECRET_KEY = secrets.token_urlsafe(32)
+
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", "3600"))
+# Сколько живет закэшированный пользователь; ограничивает задержку отзыва
+# доступа, если изменение сделано в другом процессе
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+
+class InvalidToken(Exception):
+    """Токен поврежден, подделан или истек."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def create_access_token(user_id: int, ttl: int = ACCESS_TOKEN_TTL_SECONDS) -> str:
+    """
+    Выпустить подписанный (HMAC-SHA256) токен доступа.
+    """
+    now = int(time.time())
+    claims = {"sub": user_id, "iat": now, "exp": now + ttl}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_access_token(token: str) -> int:
+    """
+    Проверить подпись и срок действия токена, вернуть id пользователя.
+    """
+    try:
+        payload, signature = token.split(".")
+    except ValueError:
+        raise InvalidToken("Malformed token")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidToken("Invalid signature")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+        user_id = int(claims["sub"])
+        expires_at = int(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidToken("Malformed token")
+
+    if expires_at < time.time():
+        raise InvalidToken("Token expired")
+
+    return user_id
+
+
+class Principal:
+    """
+    Аутентифицированный пользователь: снимок полей, которые нужны
+    обработчикам, не привязанный к сессии БД.
+    """
+
+    __slots__ = ("id", "username", "email", "is_active")
+
+    def __init__(self, id: int, username: str, email: str, is_active: bool):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.username, user.email, bool(user.is_active))
+
+
+class PrincipalCache:
+    """
+    Кэш пользователей по id с коротким TTL.
+
+    Запись удаляется явно при деактивации или удалении пользователя.
+    """
+
+    def __init__(
+        self,
+        ttl: float = PRINCIPAL_CACHE_TTL_SECONDS,
+        maxsize: int = PRINCIPAL_CACHE_SIZE,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[int, Tuple[float, Principal]] = {}
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        entry = self._data.get(user_id)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            self._data.pop(user_id, None)
+            return None
+        return principal
+
+    def set(self, principal: Principal) -> None:
+        if len(self._data) >= self.maxsize:
+            # Сначала выбрасываем просроченные, затем самые старые записи
+            now = time.monotonic()
+            for user_id in [k for k, (exp, _) in self._data.items() if exp < now]:
+                del self._data[user_id]
+            while len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+        self._data[principal.id] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate(self, user_id: int) -> None:
+        self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# Глобальный кэш пользователей
+principal_cache = PrincipalCache()
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
+    """
+    Dependency для получения текущего пользователя по Bearer-токену.
+
+    В типичном случае пользователь берется из кэша без запросов к БД.
+    """
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+
+    try:
+        user_id = decode_access_token(credentials.credentials)
+    except InvalidToken as e:
+        raise _unauthorized(str(e))
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await db.get(models.User, user_id)
+        if user is None:
+            raise _unauthorized("User not found")
+        principal = Principal.from_user(user)
+        principal_cache.set(principal)
+
+    if not principal.is_active:
+        raise _unauthorized("Inactive user")
+
+    return principal
+
+
+async def get_current_user_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> Optional[Principal]:
+    """
+    То же, что get_current_user, но для анонимного запроса возвращает None.
+    """
+    if credentials is None:
+        return None
+    return await get_current_user(credentials, db)
@@ -0,0 +1,51 @@
+import os
+from typing import Dict, List, Sequence, Tuple, TypeVar
+from fastapi import HTTPException, Response, status
+
+# Сколько id можно запросить за один раз (?ids=...)
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+# Заголовок со списком id, которых нет
+MISSING_IDS_HEADER = "X-Missing-Ids"
+
+T = TypeVar("T")
+
+
+def parse_ids(ids: str, max_ids: int = BATCH_MAX_IDS) -> List[int]:
+    """
+    Разобрать "3,1,2" в [3, 1, 2]: порядок сохраняется, повторы убираются.
+    """
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers",
+        )
+    parsed = list(dict.fromkeys(parsed))
+    if len(parsed) > max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many ids, at most {max_ids} per request",
+        )
+    return parsed
+
+
+def pick_by_ids(ids: Sequence[int], items: Dict[int, T]) -> Tuple[List[T], List[int]]:
+    """
+    Одним проходом разложить найденные объекты в порядке запроса;
+    вернуть их и список id, которых нет.
+    """
+    found = []
+    missing = []
+    for item_id in ids:
+        item = items.get(item_id)
+        if item is None:
+            missing.append(item_id)
+        else:
+            found.append(item)
+    return found, missing
+
+
+def set_missing_ids(response: Response, missing: Sequence[int]) -> None:
+    if missing:
+        response.headers[MISSING_IDS_HEADER] = ",".join(map(str, missing))
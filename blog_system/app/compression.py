@@ -0,0 +1,301 @@
+import asyncio
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard - необязательная зависимость
+    zstandard = None
+
+# Ответы меньше этого размера не сжимаются
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Тела больше этого размера сжимаются в пуле потоков, а не в цикле событий
+COMPRESSION_THREAD_THRESHOLD = int(os.getenv("COMPRESSION_THREAD_THRESHOLD", "65536"))
+COMPRESSION_WORKERS = int(os.getenv("COMPRESSION_WORKERS", "2"))
+# Объем кэша уже сжатых тел в байтах; 0 - без кэша
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/xml",
+    "text/javascript",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "image/svg+xml",
+)
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 - одинаковый вход дает одинаковый результат
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _build_compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    # Порядок - предпочтение сервера при равном q у клиента
+    compressors: Dict[str, Callable[[bytes], bytes]] = {}
+    if brotli is not None:
+        compressors["br"] = lambda data: brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        compressors["zstd"] = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress
+    compressors["gzip"] = _gzip
+    return compressors
+
+
+COMPRESSORS = _build_compressors()
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Выбирает кодировку по Accept-Encoding клиента"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in COMPRESSORS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedBodyCache:
+    """
+    LRU-кэш сжатых тел по содержимому: (кодировка, хэш тела) -> сжатое тело.
+
+    Горячие ответы (одна и та же страница или список) сжимаются один раз;
+    хэширование на порядок дешевле сжатия.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    @staticmethod
+    def key(encoding: str, body: bytes) -> Tuple[str, bytes]:
+        return encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Tuple[str, bytes], value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._data[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Глобальный кэш сжатых тел
+compression_cache = CompressedBodyCache()
+
+_executor = ThreadPoolExecutor(max_workers=COMPRESSION_WORKERS, thread_name_prefix="compress")
+
+
+async def compress(body: bytes, encoding: str, cache: Optional[CompressedBodyCache] = compression_cache) -> bytes:
+    """
+    Сжать тело ответа: из кэша, в цикле событий (малые тела)
+    или в пуле потоков (большие).
+    """
+    key = None
+    if cache is not None and cache.max_bytes:
+        key = cache.key(encoding, body)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    compressor = COMPRESSORS[encoding]
+    if len(body) >= COMPRESSION_THREAD_THRESHOLD:
+        loop = asyncio.get_running_loop()
+        compressed = await loop.run_in_executor(_executor, compressor, body)
+    else:
+        compressed = compressor(body)
+
+    if key is not None:
+        cache.set(key, compressed)
+    return compressed
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов (br, zstd - если установлены, gzip).
+
+    Сжимаются только ответы, отданные одним куском (JSON, HTML-страницы);
+    потоковые ответы (SSE, файлы) передаются как есть.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache: Optional[CompressedBodyCache] = compression_cache):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding) if accept_encoding else None
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = list(start_message["headers"])
+            content_type = ""
+            already_encoded = False
+            for name, value in headers:
+                if name == b"content-type":
+                    content_type = value.decode("latin-1")
+                elif name == b"content-encoding":
+                    already_encoded = True
+
+            body = message.get("body", b"")
+            compressible = _is_compressible(content_type) and not already_encoded
+            if compressible:
+                headers = _add_vary(headers)
+
+            if (
+                encoding is None
+                or not compressible
+                or message.get("more_body", False)
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send({**start_message, "headers": headers})
+                await send(message)
+                return
+
+            compressed = await compress(body, encoding, self.cache)
+            if len(compressed) >= len(body):
+                passthrough = True
+                await send({**start_message, "headers": headers})
+                await send(message)
+                return
+
+            headers = [(name, value) for name, value in headers if name != b"content-length"]
+            headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"content-length", str(len(compressed)).encode()))
+            passthrough = True
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _add_vary(headers):
+    for i, (name, value) in enumerate(headers):
+        if name == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+if __name__ == "__main__":
+    # python -m app.compression - размер на проводе и CPU на запрос для типичного списка постов
+    import json
+    import random
+    import time
+
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+        for _ in range(2000)
+    ]
+    posts = [
+        {
+            "id": i,
+            "authorId": i % 17,
+            "title": f"Post number {i}",
+            "content": " ".join(rng.choice(words) for _ in range(300)),
+            "createdAt": "2026-01-01T12:00:00",
+            "updatedAt": "2026-01-01T12:00:00",
+        }
+        for i in range(100)
+    ]
+    payload = json.dumps(posts).encode()
+    rounds = 200
+    print(f"identity: {len(payload)} bytes")
+    for name, compressor in COMPRESSORS.items():
+        started = time.process_time()
+        for _ in range(rounds):
+            compressed = compressor(payload)
+        cpu_ms = (time.process_time() - started) / rounds * 1000
+        print(f"{name}: {len(compressed)} bytes ({len(compressed) / len(payload):.1%}), {cpu_ms:.2f} ms CPU per request")
+    cache = CompressedBodyCache()
+    started = time.process_time()
+    for _ in range(rounds):
+        key = cache.key("gzip", payload)
+        if cache.get(key) is None:
+            cache.set(key, _gzip(payload))
+    cpu_ms = (time.process_time() - started) / rounds * 1000
+    print(f"gzip cached: {cpu_ms:.3f} ms CPU per request")
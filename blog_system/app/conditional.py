@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Слабый ETag из частей: id, времени изменения, версии коллекции и т.п.
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def utc_timestamp(value: datetime) -> float:
+    """Время из БД в секундах; даты без часового пояса считаются UTC (SQLite)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def http_date(timestamp: float) -> str:
+    return format_datetime(datetime.fromtimestamp(int(timestamp), timezone.utc), usegmt=True)
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """
+    Проверка If-None-Match / If-Modified-Since (RFC 7232).
+
+    If-None-Match сравнивается слабо и имеет приоритет: при его наличии
+    If-Modified-Since игнорируется.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        expected = _strip_weak(etag)
+        return any(_strip_weak(tag) == expected for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return int(last_modified) <= since.timestamp()
+
+
+def validator_headers(etag: str, last_modified: Optional[float] = None, vary: Optional[str] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if vary is not None:
+        headers["Vary"] = vary
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[float] = None, vary: Optional[str] = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified, vary))
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[float] = None,
+    vary: Optional[str] = None,
+) -> None:
+    response.headers.update(validator_headers(etag, last_modified, vary))
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app import models
+from app.rendering import PIPELINE_VERSION, Rendered, render_async
+
+logger = logging.getLogger(__name__)
+
+# Сколько постов пересчитывается в одной транзакции
+CONTENT_REPROCESS_BATCH_SIZE = int(os.getenv("CONTENT_REPROCESS_BATCH_SIZE", "100"))
+
+
+def apply_render(post: models.Post, rendered: Rendered, excerpt: Optional[str] = None) -> None:
+    """
+    Записать производные поля в пост.
+
+    excerpt - выдержка, заданная автором; без нее выдержка генерируется,
+    если автор свою не задавал.
+    """
+    post.content_html = rendered.html
+    post.word_count = rendered.word_count
+    post.reading_time = rendered.reading_time
+    post.content_hash = rendered.content_hash
+    post.render_version = rendered.version
+    if excerpt is not None:
+        post.excerpt = excerpt
+        post.excerpt_generated = False
+    elif post.excerpt_generated or post.excerpt is None:
+        post.excerpt = rendered.excerpt
+        post.excerpt_generated = True
+
+
+async def reprocess_posts(
+    session_factory: async_sessionmaker,
+    batch_size: int = CONTENT_REPROCESS_BATCH_SIZE,
+) -> int:
+    """
+    Пересчитать производные поля постов со старой версией конвейера
+    (после смены настроек рендеринга). Посты обходятся по id пачками,
+    каждая пачка - отдельная транзакция.
+
+    Пост, изменившийся во время пересчета, не перезаписывается: обновление
+    применяется, только если content_hash в строке не сменился.
+    Возвращает число пересчитанных постов.
+    """
+    last_id = 0
+    total = 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(
+                    models.Post.id,
+                    models.Post.content,
+                    models.Post.content_hash,
+                    models.Post.excerpt,
+                    models.Post.excerpt_generated,
+                )
+                .where(
+                    models.Post.id > last_id,
+                    or_(
+                        models.Post.render_version.is_(None),
+                        models.Post.render_version != PIPELINE_VERSION,
+                    ),
+                )
+                .order_by(models.Post.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+
+            for row in rows:
+                rendered = await render_async(row.content)
+                values = dict(
+                    content_html=rendered.html,
+                    word_count=rendered.word_count,
+                    reading_time=rendered.reading_time,
+                    content_hash=rendered.content_hash,
+                    render_version=rendered.version,
+                    # Пересчет - не правка автора: updated_at сохраняем
+                    updated_at=models.Post.updated_at,
+                )
+                if row.excerpt_generated or row.excerpt is None:
+                    values.update(excerpt=rendered.excerpt, excerpt_generated=True)
+                result = await db.execute(
+                    update(models.Post)
+                    .where(
+                        models.Post.id == row.id,
+                        or_(
+                            models.Post.content_hash == rendered.content_hash,
+                            models.Post.content_hash.is_(None),
+                        ),
+                    )
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                total += result.rowcount
+            await db.commit()
+            last_id = rows[-1].id
+
+    return total
+
+
+async def run_content_reprocessor(session_factory: async_sessionmaker) -> None:
+    """
+    Фоновый пересчет при старте приложения.
+    """
+    try:
+        reprocessed = await reprocess_posts(session_factory)
+        if reprocessed:
+            logger.info("Re-rendered %d posts for pipeline %s", reprocessed, PIPELINE_VERSION)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Content reprocessing failed")
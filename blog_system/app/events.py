@@ -0,0 +1,267 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set
+
+# Сколько событий хранится для догоняющих клиентов (Last-Event-ID, long-poll)
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+# Размер буфера одного подписчика; медленный клиент при переполнении отключается
+EVENTS_CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "100"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+# Интервал пустых комментариев SSE, чтобы прокси не закрывали соединение
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_LONG_POLL_TIMEOUT = float(os.getenv("EVENTS_LONG_POLL_TIMEOUT", "25"))
+
+
+class TooManySubscribers(Exception):
+    """Достигнут предел одновременно подключенных подписчиков."""
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class Event:
+    """
+    Событие изменения контента.
+
+    Полезная нагрузка сериализуется один раз при публикации и
+    переиспользуется для всех подписчиков.
+    """
+
+    __slots__ = ("id", "type", "post_id", "author_id", "category_ids", "created_at", "json")
+
+    def __init__(
+        self,
+        id: int,
+        type: str,
+        data: Dict[str, Any],
+        post_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        category_ids: Iterable[int] = (),
+    ):
+        self.id = id
+        self.type = type
+        self.post_id = post_id
+        self.author_id = author_id
+        self.category_ids = frozenset(category_ids)
+        self.created_at = time.time()
+        self.json = json.dumps(
+            {"id": id, "type": type, "data": data}, default=_json_default, ensure_ascii=False
+        )
+
+    def sse(self) -> bytes:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.json}\n\n".encode()
+
+
+class EventFilter:
+    """Фильтр подписчика; пустое поле - без ограничения"""
+
+    def __init__(
+        self,
+        types: Optional[Set[str]] = None,
+        post_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        category_id: Optional[int] = None,
+    ):
+        self.types = types
+        self.post_id = post_id
+        self.author_id = author_id
+        self.category_id = category_id
+
+    def matches(self, event: Event) -> bool:
+        if self.types and event.type.split(".")[0] not in self.types and event.type not in self.types:
+            return False
+        if self.post_id is not None and event.post_id != self.post_id:
+            return False
+        if self.author_id is not None and event.author_id != self.author_id:
+            return False
+        if self.category_id is not None and self.category_id not in event.category_ids:
+            return False
+        return True
+
+
+class Subscription:
+    def __init__(self, hub: "BroadcastHub", event_filter: EventFilter, buffer: int):
+        self.hub = hub
+        self.filter = event_filter
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=buffer)
+        # Буфер переполнялся - клиент пропустил события и должен переподключиться
+        self.overflowed = False
+
+    def offer(self, event: Event) -> None:
+        if self.overflowed or not self.filter.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.hub.dropped += 1
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    """
+    Рассылка событий изменения подписчикам внутри процесса.
+
+    Публикация не блокируется: событие раскладывается по ограниченным
+    очередям подписчиков, медленный подписчик помечается переполненным
+    и отключается, не задерживая остальных.
+    """
+
+    def __init__(
+        self,
+        history: int = EVENTS_HISTORY,
+        buffer: int = EVENTS_CLIENT_BUFFER,
+        max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+    ):
+        self.buffer = buffer
+        self.max_subscribers = max_subscribers
+        self._ids = itertools.count(1)
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._history[-1].id if self._history else 0
+
+    def publish(
+        self,
+        type: str,
+        data: Dict[str, Any],
+        post_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        category_ids: Iterable[int] = (),
+    ) -> Event:
+        event = Event(next(self._ids), type, data, post_id, author_id, category_ids)
+        self._history.append(event)
+        self.published += 1
+        for subscription in self._subscribers:
+            subscription.offer(event)
+        return event
+
+    def subscribe(self, event_filter: EventFilter) -> Subscription:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise TooManySubscribers()
+        subscription = Subscription(self, event_filter, self.buffer)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def since(self, last_id: int, event_filter: EventFilter) -> Optional[List[Event]]:
+        """
+        События после last_id из истории; None, если часть из них
+        уже вытеснена и клиенту нужно перечитать данные целиком.
+        """
+        # После перезапуска процесса нумерация событий начинается заново
+        if last_id > self.last_id:
+            return None
+        if self._history and last_id < self._history[0].id - 1:
+            return None
+        return [e for e in self._history if e.id > last_id and event_filter.matches(e)]
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "last_id": self.last_id,
+        }
+
+
+# Глобальный хаб событий
+hub = BroadcastHub()
+
+
+async def sse_stream(
+    subscription: Subscription,
+    last_event_id: Optional[int] = None,
+    heartbeat: float = EVENTS_HEARTBEAT,
+) -> AsyncIterator[bytes]:
+    """
+    Поток Server-Sent Events для подписчика.
+
+    Сначала досылаются пропущенные события (по Last-Event-ID), затем
+    новые. При переполнении буфера отправляется событие reset и поток
+    закрывается.
+    """
+    # Событие могло попасть и в историю, и в очередь подписчика
+    seen = 0
+    try:
+        yield b"retry: 3000\n\n"
+
+        if last_event_id is not None:
+            missed = subscription.hub.since(last_event_id, subscription.filter)
+            if missed is None:
+                yield b"event: reset\ndata: {}\n\n"
+                return
+            for event in missed:
+                seen = event.id
+                yield event.sse()
+
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                yield b"event: reset\ndata: {}\n\n"
+                return
+            event = await subscription.get(heartbeat)
+            if event is None:
+                yield b": ping\n\n"
+                continue
+            if event.id <= seen:
+                continue
+            yield event.sse()
+    finally:
+        subscription.close()
+
+
+async def long_poll(
+    hub: BroadcastHub,
+    event_filter: EventFilter,
+    since: int,
+    timeout: float = EVENTS_LONG_POLL_TIMEOUT,
+) -> str:
+    """
+    Long-poll: вернуть события после since, при их отсутствии - ждать
+    первого подходящего события не дольше timeout.
+
+    Возвращает готовый JSON, собранный из уже сериализованных событий.
+    """
+    events = hub.since(since, event_filter)
+    if events is None:
+        return '{"reset": true, "last_id": %d, "events": []}' % hub.last_id
+
+    if not events:
+        subscription = hub.subscribe(event_filter)
+        try:
+            # Событие могло появиться между since() и subscribe()
+            events = hub.since(since, event_filter) or []
+            if not events:
+                event = await subscription.get(timeout)
+                if event is not None:
+                    events = [event]
+        finally:
+            subscription.close()
+
+    last_id = events[-1].id if events else max(since, hub.last_id)
+    return '{"reset": false, "last_id": %d, "events": [%s]}' % (
+        last_id,
+        ", ".join(e.json for e in events),
+    )
@@ -0,0 +1,159 @@
+import os
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+
+FAVORITES_CACHE_USERS = int(os.getenv("FAVORITES_CACHE_USERS", "10000"))
+# Сколько живет множество в кэше; ограничивает рассинхронизацию, если
+# избранное изменено в другом процессе
+FAVORITES_CACHE_TTL_SECONDS = float(os.getenv("FAVORITES_CACHE_TTL_SECONDS", "60"))
+# Множества больше этого размера не кэшируются, для них - запрос IN (...)
+FAVORITES_CACHE_MAX_PER_USER = int(os.getenv("FAVORITES_CACHE_MAX_PER_USER", "5000"))
+
+# Отметка пользователя со слишком большим множеством избранного
+_TOO_LARGE = array("i")
+
+
+class FavoriteSetCache:
+    """
+    LRU-кэш избранного по пользователям.
+
+    Множество хранится как отсортированный array('i') - 4 байта на пост,
+    проверка принадлежности - двоичный поиск.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = FAVORITES_CACHE_USERS,
+        max_per_user: int = FAVORITES_CACHE_MAX_PER_USER,
+        ttl: float = FAVORITES_CACHE_TTL_SECONDS,
+    ):
+        self.maxsize = maxsize
+        self.max_per_user = max_per_user
+        self.ttl = ttl
+        self._data: "OrderedDict[int, Tuple[float, array]]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[array]:
+        entry = self._data.get(user_id)
+        if entry is None:
+            return None
+        expires_at, post_ids = entry
+        if expires_at < time.monotonic():
+            del self._data[user_id]
+            return None
+        self._data.move_to_end(user_id)
+        return post_ids
+
+    def set(self, user_id: int, post_ids: Iterable[int]) -> None:
+        self._put(user_id, array("i", sorted(post_ids)))
+
+    def mark_too_large(self, user_id: int) -> None:
+        self._put(user_id, _TOO_LARGE)
+
+    def _put(self, user_id: int, post_ids: array) -> None:
+        self._data[user_id] = (time.monotonic() + self.ttl, post_ids)
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def is_too_large(self, post_ids: array) -> bool:
+        return post_ids is _TOO_LARGE
+
+    def _cached(self, user_id: int) -> Optional[array]:
+        entry = self._data.get(user_id)
+        if entry is None or entry[1] is _TOO_LARGE:
+            return None
+        return entry[1]
+
+    def add(self, user_id: int, post_id: int) -> None:
+        post_ids = self._cached(user_id)
+        if post_ids is None:
+            return
+        i = bisect_left(post_ids, post_id)
+        if i < len(post_ids) and post_ids[i] == post_id:
+            return
+        if len(post_ids) >= self.max_per_user:
+            self.mark_too_large(user_id)
+            return
+        insort(post_ids, post_id)
+
+    def remove(self, user_id: int, post_id: int) -> None:
+        post_ids = self._cached(user_id)
+        if post_ids is None:
+            return
+        i = bisect_left(post_ids, post_id)
+        if i < len(post_ids) and post_ids[i] == post_id:
+            del post_ids[i]
+
+    def discard_post(self, post_id: int) -> None:
+        """
+        Пост удален (избранное удалено каскадом) - убрать его из всех
+        множеств, иначе новый пост с тем же id окажется в избранном.
+        """
+        for user_id in list(self._data):
+            self.remove(user_id, post_id)
+
+    def invalidate(self, user_id: int) -> None:
+        self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# Глобальный кэш избранного
+favorite_cache = FavoriteSetCache()
+
+
+def _contains(post_ids: array, post_id: int) -> bool:
+    i = bisect_left(post_ids, post_id)
+    return i < len(post_ids) and post_ids[i] == post_id
+
+
+async def favorited_post_ids(
+    db: AsyncSession,
+    user_id: int,
+    post_ids: Iterable[int],
+) -> Set[int]:
+    """
+    Какие из постов пользователь добавил в избранное.
+
+    Из кэша - без запросов; при промахе загружается все множество
+    пользователя (один запрос), для очень больших множеств выполняется
+    запрос WHERE user_id = :u AND post_id IN (...).
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return set()
+
+    cached = favorite_cache.get(user_id)
+
+    if cached is None:
+        result = await db.execute(
+            select(models.Favorite.post_id)
+            .where(models.Favorite.user_id == user_id)
+            .order_by(models.Favorite.post_id)
+            .limit(favorite_cache.max_per_user + 1)
+        )
+        all_ids = result.scalars().all()
+        if len(all_ids) <= favorite_cache.max_per_user:
+            favorite_cache.set(user_id, all_ids)
+            cached = favorite_cache.get(user_id)
+        else:
+            favorite_cache.mark_too_large(user_id)
+            cached = _TOO_LARGE
+
+    if not favorite_cache.is_too_large(cached):
+        return {post_id for post_id in post_ids if _contains(cached, post_id)}
+
+    result = await db.execute(
+        select(models.Favorite.post_id).where(
+            models.Favorite.user_id == user_id,
+            models.Favorite.post_id.in_(post_ids),
+        )
+    )
+    return set(result.scalars().all())
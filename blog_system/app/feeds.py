@@ -0,0 +1,445 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape, quoteattr
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.conditional import make_etag, utc_timestamp
+from app.database import ReadOnlySessionLocal, replicas
+
+# Сколько последних постов попадает в ленту
+FEED_SIZE = int(os.getenv("FEED_SIZE", "50"))
+# Страховка от рассинхронизации между воркерами: документ живет не дольше TTL
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "300"))
+# Сколько отрендеренных записей лент (пост, формат) держать в LRU-кэше
+FEED_ENTRY_CACHE_SIZE = int(os.getenv("FEED_ENTRY_CACHE_SIZE", "5000"))
+# Диапазон id постов в одном файле sitemap (протокол допускает до 50000 URL)
+SITEMAP_SHARD_SIZE = int(os.getenv("SITEMAP_SHARD_SIZE", "10000"))
+SITE_URL = os.getenv("SITE_URL", "http://localhost:8000").rstrip("/")
+SITE_TITLE = os.getenv("SITE_TITLE", "Blog System")
+
+FEED_FORMATS = {
+    "xml": "application/rss+xml",
+    "atom": "application/atom+xml",
+}
+SITEMAP_MEDIA_TYPE = "application/xml"
+
+PUBLISHED = models.Post.status == "published"
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite возвращает даты без часового пояса
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _iso(value: datetime) -> str:
+    return _aware(value).isoformat()
+
+
+def post_url(username: str, slug: str) -> str:
+    return f"{SITE_URL}/posts/by-slug/{username}/{slug}"
+
+
+class FeedDocument:
+    """Готовый XML-документ с валидаторами и списком постов в нем"""
+
+    __slots__ = ("body", "etag", "last_modified", "post_ids", "oldest", "full", "created_at")
+
+    def __init__(
+        self,
+        body: bytes,
+        etag: str,
+        last_modified: Optional[float],
+        post_ids: FrozenSet[int] = frozenset(),
+        oldest: Optional[Tuple[datetime, int]] = None,
+        full: bool = False,
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.post_ids = post_ids
+        # Самая старая запись ленты и заполнена ли лента до FEED_SIZE
+        self.oldest = oldest
+        self.full = full
+        self.created_at = time.monotonic()
+
+    def covers(self, published_at: datetime, post_id: int) -> bool:
+        """Попадет ли пост с такой датой публикации в эту ленту"""
+        if not self.full or self.oldest is None:
+            return True
+        return (_aware(published_at), post_id) >= (_aware(self.oldest[0]), self.oldest[1])
+
+
+class FeedCache:
+    """
+    Кэш лент и sitemap с точечной инвалидацией.
+
+    Изменение поста сбрасывает только документы, где он есть или куда он
+    попадет, и один файл sitemap по диапазону id. Записи лент кэшируются
+    отдельно и общие для всех лент: при пересборке заново рендерятся
+    только изменившиеся посты.
+    """
+
+    def __init__(self, ttl: float = FEED_CACHE_TTL, max_entries: int = FEED_ENTRY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._docs: Dict[tuple, FeedDocument] = {}
+        self._by_post: Dict[int, Set[tuple]] = {}
+        # (post_id, формат) -> (версия записи, XML записи), LRU
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[tuple, str]]" = OrderedDict()
+        # Номер файла sitemap -> время последнего изменения; None - не загружено
+        self.sitemap_lastmod: Optional[Dict[int, float]] = None
+        # Счетчик инвалидаций: документ, собранный во время изменения, не кэшируется
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.rendered_entries = 0
+
+    def get(self, key: tuple) -> Optional[FeedDocument]:
+        doc = self._docs.get(key)
+        if doc is not None and time.monotonic() - doc.created_at > self.ttl:
+            self._drop(key)
+            doc = None
+        if doc is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return doc
+
+    def set(self, key: tuple, doc: FeedDocument, generation: int) -> bool:
+        if generation != self.generation:
+            return False
+        self._drop(key)
+        self._docs[key] = doc
+        for post_id in doc.post_ids:
+            self._by_post.setdefault(post_id, set()).add(key)
+        return True
+
+    def _drop(self, key: tuple) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for post_id in doc.post_ids:
+            keys = self._by_post.get(post_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_post[post_id]
+
+    def entry(self, post_id: int, fmt: str, version: tuple) -> Optional[str]:
+        cached = self._entries.get((post_id, fmt))
+        if cached is not None and cached[0] == version:
+            self._entries.move_to_end((post_id, fmt))
+            return cached[1]
+        return None
+
+    def set_entry(self, post_id: int, fmt: str, version: tuple, xml: str) -> None:
+        self._entries[(post_id, fmt)] = (version, xml)
+        self._entries.move_to_end((post_id, fmt))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.rendered_entries += 1
+
+    def post_changed(
+        self,
+        post_id: int,
+        author_id: int,
+        category_ids: Iterable[int],
+        published_at: Optional[datetime],
+        updated_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        Публичный пост создан, изменен или снят с публикации
+        (published_at=None - пост больше не публичный).
+        """
+        self.generation += 1
+        for key in list(self._by_post.get(post_id, ())):
+            self._drop(key)
+        for fmt in FEED_FORMATS:
+            self._entries.pop((post_id, fmt), None)
+
+        if published_at is not None:
+            scopes = [("all", None), ("author", author_id)]
+            scopes += [("category", category_id) for category_id in category_ids]
+            for kind, scope_id in scopes:
+                for fmt in FEED_FORMATS:
+                    key = ("feed", kind, scope_id, fmt)
+                    doc = self._docs.get(key)
+                    if doc is not None and doc.covers(published_at, post_id):
+                        self._drop(key)
+
+        shard = post_id // SITEMAP_SHARD_SIZE
+        self._drop(("sitemap", shard))
+        if self.sitemap_lastmod is not None:
+            changed = utc_timestamp(updated_at) if updated_at is not None else time.time()
+            self.sitemap_lastmod[shard] = max(self.sitemap_lastmod.get(shard, 0.0), changed)
+            self._drop(("sitemap-index",))
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._docs.clear()
+        self._by_post.clear()
+        self._entries.clear()
+        self.sitemap_lastmod = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "documents": len(self._docs),
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rendered_entries": self.rendered_entries,
+        }
+
+
+# Глобальный кэш лент и sitemap
+feed_cache = FeedCache()
+
+
+def _read_session():
+    # Ленты и sitemap читают краулеры - нагрузку берут реплики, если они есть
+    return replicas.session() if replicas else ReadOnlySessionLocal()
+
+
+def _entry_xml(fmt: str, row) -> str:
+    url = post_url(row.username, row.slug)
+    summary = escape(row.excerpt or "")
+    content = escape(row.content_html or "")
+    if fmt == "atom":
+        return (
+            "<entry>"
+            f"<title>{escape(row.title)}</title>"
+            f"<link href={quoteattr(url)}/>"
+            f"<id>{SITE_URL}/posts/{row.id}</id>"
+            f"<published>{_iso(row.published_at)}</published>"
+            f"<updated>{_iso(row.updated_at)}</updated>"
+            f"<author><name>{escape(row.username)}</name></author>"
+            f"<summary>{summary}</summary>"
+            f'<content type="html">{content}</content>'
+            "</entry>\n"
+        )
+    return (
+        "<item>"
+        f"<title>{escape(row.title)}</title>"
+        f"<link>{escape(url)}</link>"
+        f'<guid isPermaLink="false">{SITE_URL}/posts/{row.id}</guid>'
+        f"<pubDate>{format_datetime(_aware(row.published_at))}</pubDate>"
+        f"<dc:creator>{escape(row.username)}</dc:creator>"
+        f"<description>{summary}</description>"
+        f"<content:encoded>{content}</content:encoded>"
+        "</item>\n"
+    )
+
+
+async def build_feed(
+    db: AsyncSession,
+    kind: str,
+    scope_id: Optional[int],
+    fmt: str,
+    title: str,
+    path: str,
+) -> FeedDocument:
+    """
+    Собрать ленту (RSS 2.0 или Atom) из последних FEED_SIZE постов.
+
+    Сначала читаются только версии записей; полные строки (с HTML)
+    загружаются лишь для постов, которых нет в кэше записей.
+    """
+    generation = feed_cache.generation
+    query = (
+        select(
+            models.Post.id,
+            models.Post.published_at,
+            models.Post.updated_at,
+            models.Post.render_version,
+            models.User.username,
+        )
+        .join(models.User, models.User.id == models.Post.user_id)
+        .where(PUBLISHED)
+    )
+    if kind == "author":
+        query = query.where(models.Post.user_id == scope_id)
+    elif kind == "category":
+        query = query.join(
+            models.post_categories, models.post_categories.c.post_id == models.Post.id
+        ).where(models.post_categories.c.category_id == scope_id)
+    query = query.order_by(models.Post.published_at.desc(), models.Post.id.desc()).limit(FEED_SIZE)
+    rows = (await db.execute(query)).all()
+
+    versions = {row.id: (row.updated_at, row.render_version, row.username) for row in rows}
+    missing = [row.id for row in rows if feed_cache.entry(row.id, fmt, versions[row.id]) is None]
+    if missing:
+        full_rows = (await db.execute(
+            select(
+                models.Post.id,
+                models.Post.title,
+                models.Post.slug,
+                models.Post.excerpt,
+                models.Post.content_html,
+                models.Post.published_at,
+                models.Post.updated_at,
+                models.User.username,
+            )
+            .join(models.User, models.User.id == models.Post.user_id)
+            .where(models.Post.id.in_(missing))
+        )).all()
+        for row in full_rows:
+            if row.id in versions:
+                feed_cache.set_entry(row.id, fmt, versions[row.id], _entry_xml(fmt, row))
+
+    entries = [feed_cache.entry(row.id, fmt, versions[row.id]) or "" for row in rows]
+    last_modified = max((utc_timestamp(row.updated_at) for row in rows), default=None)
+    updated = (
+        datetime.fromtimestamp(last_modified, timezone.utc) if last_modified is not None
+        else datetime.now(timezone.utc)
+    )
+    self_url = f"{SITE_URL}{path}"
+
+    if fmt == "atom":
+        head = (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            f"<title>{escape(title)}</title>"
+            f'<link rel="self" href={quoteattr(self_url)}/>'
+            f"<link href={quoteattr(SITE_URL + '/')}/>"
+            f"<id>{escape(self_url)}</id>"
+            f"<updated>{updated.isoformat()}</updated>\n"
+        )
+        tail = "</feed>\n"
+    else:
+        head = (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+            'xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+            'xmlns:atom="http://www.w3.org/2005/Atom">\n<channel>'
+            f"<title>{escape(title)}</title>"
+            f"<link>{escape(SITE_URL + '/')}</link>"
+            f"<description>{escape(title)}</description>"
+            f'<atom:link href={quoteattr(self_url)} rel="self" type="application/rss+xml"/>'
+            f"<lastBuildDate>{format_datetime(updated)}</lastBuildDate>\n"
+        )
+        tail = "</channel>\n</rss>\n"
+
+    body = (head + "".join(entries) + tail).encode("utf-8")
+    doc = FeedDocument(
+        body=body,
+        # updated_at хранится с точностью до секунды - ETag строится по содержимому
+        etag=make_etag("feed", kind, scope_id, fmt, hashlib.sha1(body).hexdigest()),
+        last_modified=last_modified,
+        post_ids=frozenset(versions),
+        oldest=(rows[-1].published_at, rows[-1].id) if rows else None,
+        full=len(rows) >= FEED_SIZE,
+    )
+    feed_cache.set(("feed", kind, scope_id, fmt), doc, generation)
+    return doc
+
+
+async def sitemap_shards(db: AsyncSession) -> Dict[int, float]:
+    """
+    Номера файлов sitemap и время их изменения. Загружаются одним
+    запросом при первом обращении, дальше поддерживаются инвалидацией.
+    """
+    if feed_cache.sitemap_lastmod is not None:
+        return feed_cache.sitemap_lastmod
+    generation = feed_cache.generation
+    shard = models.Post.id // SITEMAP_SHARD_SIZE
+    rows = (await db.execute(
+        select(shard.label("shard"), func.max(models.Post.updated_at).label("lastmod"))
+        .where(PUBLISHED)
+        .group_by(shard)
+    )).all()
+    lastmod = {int(row.shard): utc_timestamp(row.lastmod) for row in rows}
+    # Пока шел запрос, посты менялись - результат не кэшируется
+    if generation == feed_cache.generation:
+        feed_cache.sitemap_lastmod = lastmod
+    return lastmod
+
+
+async def build_sitemap_index(db: AsyncSession) -> FeedDocument:
+    """
+    Индекс sitemap: по файлу на каждый диапазон id с публичными постами.
+    """
+    generation = feed_cache.generation
+    doc = _sitemap_index_document(await sitemap_shards(db))
+    feed_cache.set(("sitemap-index",), doc, generation)
+    return doc
+
+
+def _sitemap_index_document(lastmod: Dict[int, float]) -> FeedDocument:
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    ]
+    for shard in sorted(lastmod):
+        modified = datetime.fromtimestamp(lastmod[shard], timezone.utc).isoformat()
+        parts.append(
+            f"<sitemap><loc>{SITE_URL}/sitemap-{shard}.xml</loc><lastmod>{modified}</lastmod></sitemap>\n"
+        )
+    parts.append("</sitemapindex>\n")
+    return FeedDocument(
+        body="".join(parts).encode("utf-8"),
+        etag=make_etag("sitemap-index", *sorted(lastmod.items())),
+        last_modified=max(lastmod.values(), default=None),
+    )
+
+
+async def stream_sitemap_shard(shard: int, chunk_rows: int = 1000) -> AsyncIterator[bytes]:
+    """
+    Отдать файл sitemap по мере чтения строк из БД (курсор на стороне
+    сервера), а собранный документ положить в кэш.
+    """
+    generation = feed_cache.generation
+    chunks: List[bytes] = []
+    last_modified: Optional[float] = None
+
+    head = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    ).encode()
+    chunks.append(head)
+    yield head
+
+    async with _read_session() as db:
+        result = await db.stream(
+            select(models.Post.id, models.Post.slug, models.Post.updated_at, models.User.username)
+            .join(models.User, models.User.id == models.Post.user_id)
+            .where(
+                PUBLISHED,
+                models.Post.id >= shard * SITEMAP_SHARD_SIZE,
+                models.Post.id < (shard + 1) * SITEMAP_SHARD_SIZE,
+            )
+            .order_by(models.Post.id)
+            .execution_options(yield_per=chunk_rows)
+        )
+        async for rows in result.partitions(chunk_rows):
+            lines = []
+            for row in rows:
+                modified = utc_timestamp(row.updated_at)
+                last_modified = modified if last_modified is None else max(last_modified, modified)
+                lines.append(
+                    f"<url><loc>{escape(post_url(row.username, row.slug))}</loc>"
+                    f"<lastmod>{_iso(row.updated_at)}</lastmod></url>\n"
+                )
+            chunk = "".join(lines).encode("utf-8")
+            chunks.append(chunk)
+            yield chunk
+
+    tail = b"</urlset>\n"
+    chunks.append(tail)
+    yield tail
+
+    if last_modified is None:
+        # Пустой файл (посты диапазона сняты с публикации) не кэшируется
+        return
+    body = b"".join(chunks)
+    doc = FeedDocument(
+        body=body,
+        etag=make_etag("sitemap", shard, hashlib.sha1(body).hexdigest()),
+        last_modified=last_modified,
+    )
+    feed_cache.set(("sitemap", shard), doc, generation)
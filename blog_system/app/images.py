@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi.staticfiles import StaticFiles
+
+try:
+    from PIL import Image, ImageOps, ImageSequence
+except ImportError:  # Pillow нужен только для загрузки изображений
+    Image = ImageOps = ImageSequence = None
+
+# Каталог загруженных файлов и URL, по которому он раздается
+MEDIA_DIR = os.getenv("MEDIA_DIR", "media")
+MEDIA_URL = os.getenv("MEDIA_URL", "/media")
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Ширины уменьшенных копий; копии не шире оригинала
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280").split(",") if w.strip()]
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp")
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+# Качество пересохранения оригиналов JPEG и WebP
+IMAGE_ORIGINAL_QUALITY = int(os.getenv("IMAGE_ORIGINAL_QUALITY", "95"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+# Сколько изображений может ждать пул одновременно
+IMAGE_MAX_PENDING = int(os.getenv("IMAGE_MAX_PENDING", "32"))
+# Ограничение на число пикселей - защита от "бомб" декомпрессии
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+
+# URL файлов содержат хэш содержимого - их можно кэшировать навсегда
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Сигнатуры поддерживаемых форматов: (префикс, смещение, расширение)
+_SIGNATURES: List[Tuple[bytes, int, str]] = [
+    (b"\xff\xd8\xff", 0, "jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, "png"),
+    (b"GIF87a", 0, "gif"),
+    (b"GIF89a", 0, "gif"),
+    (b"WEBP", 8, "webp"),
+]
+
+_MANIFEST = "manifest.json"
+# Версия обработки: файлы с манифестом другой версии обрабатываются заново
+# (версия 2 - оригинал без метаданных)
+_MANIFEST_VERSION = 2
+# Форматы Pillow для пересохранения оригинала
+_SAVE_FORMATS = {"jpg": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP"}
+
+
+class InvalidImage(Exception):
+    """Файл не является изображением поддерживаемого формата."""
+
+
+class ImageProcessingUnavailable(Exception):
+    """Pillow не установлен."""
+
+
+def sniff_extension(data: bytes) -> Optional[str]:
+    """Формат по сигнатуре файла, а не по имени или Content-Type клиента"""
+    for prefix, offset, extension in _SIGNATURES:
+        if data[offset:offset + len(prefix)] == prefix:
+            if extension == "webp" and data[:4] != b"RIFF":
+                continue
+            return extension
+    return None
+
+
+def _directory(digest: str) -> str:
+    return os.path.join(MEDIA_DIR, "images", digest[:2], digest)
+
+
+def _url(digest: str, filename: str) -> str:
+    return f"{MEDIA_URL}/images/{digest[:2]}/{digest}/{filename}"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _without_metadata(image):
+    # Копия пикселей без image.info: EXIF (с GPS), XMP, комментарии
+    clean = image.copy()
+    clean.info = {}
+    return clean
+
+
+def encode_original(source, image, extension: str, quality: int) -> bytes:
+    """
+    Оригинал для публикации: пересохраняется в исходном формате и размере
+    без метаданных - координаты съемки и данные камеры наружу не попадают.
+    Сохраняются только цветовой профиль и анимация GIF/WebP.
+    """
+    import io
+
+    image_format = _SAVE_FORMATS[extension]
+    params: Dict[str, Any] = {}
+    icc_profile = source.info.get("icc_profile")
+    if icc_profile:
+        params["icc_profile"] = icc_profile
+    if image_format in ("JPEG", "WEBP"):
+        params["quality"] = quality
+    if image_format in ("JPEG", "PNG"):
+        params["optimize"] = True
+
+    frames = [image]
+    if getattr(source, "n_frames", 1) > 1 and image_format in ("GIF", "WEBP"):
+        frames = [frame.convert("RGBA") for frame in ImageSequence.Iterator(source)]
+        params.update(
+            save_all=True,
+            append_images=[_without_metadata(frame) for frame in frames[1:]],
+            duration=[frame.info.get("duration", 100) for frame in ImageSequence.Iterator(source)],
+            loop=source.info.get("loop", 0),
+        )
+    first = frames[0]
+    if image_format == "JPEG" and first.mode == "RGBA":
+        first = first.convert("RGB")
+
+    buffer = io.BytesIO()
+    _without_metadata(first).save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+def process_image(
+    data: bytes,
+    directory: str,
+    digest: str,
+    extension: str,
+    widths: List[int],
+    variant_format: str,
+    quality: int,
+    original_quality: int = IMAGE_ORIGINAL_QUALITY,
+) -> Dict[str, Any]:
+    """
+    Сохранить оригинал и уменьшенные копии, записать манифест.
+    Выполняется в пуле процессов: декодирование и сжатие держат CPU.
+
+    Загруженные байты не публикуются: оригинал пересохраняется без
+    метаданных (см. encode_original).
+    """
+    import io
+
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except Exception as e:
+        raise InvalidImage(str(e))
+
+    # Ориентация из EXIF применяется к пикселям - копии без EXIF
+    image = ImageOps.exif_transpose(source)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    os.makedirs(directory, exist_ok=True)
+    original = f"original.{extension}"
+    _write_atomic(os.path.join(directory, original), encode_original(source, image, extension, original_quality))
+
+    variants = []
+    for width in sorted(set(widths)):
+        if width >= image.width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        if variant_format in ("jpeg", "jpg") and resized.mode == "RGBA":
+            resized = resized.convert("RGB")
+        buffer = io.BytesIO()
+        resized.save(buffer, format=variant_format.upper(), quality=quality, optimize=True)
+        filename = f"w{width}.{'jpg' if variant_format == 'jpeg' else variant_format}"
+        _write_atomic(os.path.join(directory, filename), buffer.getvalue())
+        variants.append({"width": width, "height": height, "file": filename})
+
+    manifest = {
+        "version": _MANIFEST_VERSION,
+        "hash": digest,
+        "width": image.width,
+        "height": image.height,
+        "original": original,
+        "variants": variants,
+    }
+    # Манифест пишется последним: его наличие означает, что все файлы готовы
+    _write_atomic(os.path.join(directory, _MANIFEST), json.dumps(manifest).encode())
+    return manifest
+
+
+def _load_manifest(digest: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(_directory(digest), _MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return manifest if manifest.get("version") == _MANIFEST_VERSION else None
+
+
+def describe(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Описание изображения для клиента: URL оригинала, копий и srcset"""
+    digest = manifest["hash"]
+    variants = [
+        {"width": v["width"], "height": v["height"], "url": _url(digest, v["file"])}
+        for v in manifest["variants"]
+    ]
+    original_url = _url(digest, manifest["original"])
+    srcset = [f"{v['url']} {v['width']}w" for v in variants]
+    srcset.append(f"{original_url} {manifest['width']}w")
+    return {
+        "hash": digest,
+        "url": original_url,
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "variants": variants,
+        "srcset": ", ".join(srcset),
+    }
+
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+# Одинаковые файлы, загружаемые одновременно, обрабатываются один раз
+_in_flight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+def get_image_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_image_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def store_image(data: bytes) -> Dict[str, Any]:
+    """
+    Сохранить загруженное изображение с уменьшенными копиями.
+
+    Файлы адресуются хэшем содержимого: повторная загрузка того же
+    файла не обрабатывается заново.
+    """
+    global _semaphore
+    if Image is None:
+        raise ImageProcessingUnavailable()
+    extension = sniff_extension(data)
+    if extension is None:
+        raise InvalidImage("Unsupported image format")
+
+    digest = hashlib.sha256(data).hexdigest()
+    manifest = await asyncio.to_thread(_load_manifest, digest)
+    if manifest is not None:
+        return describe(manifest)
+
+    pending = _in_flight.get(digest)
+    if pending is not None:
+        return describe(await asyncio.shield(pending))
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _in_flight[digest] = future
+    try:
+        if _semaphore is None:
+            _semaphore = asyncio.Semaphore(IMAGE_MAX_PENDING)
+        async with _semaphore:
+            manifest = await loop.run_in_executor(
+                get_image_executor(),
+                process_image,
+                data,
+                _directory(digest),
+                digest,
+                extension,
+                IMAGE_VARIANT_WIDTHS,
+                IMAGE_VARIANT_FORMAT,
+                IMAGE_VARIANT_QUALITY,
+                IMAGE_ORIGINAL_QUALITY,
+            )
+        future.set_result(manifest)
+    except BaseException as e:
+        future.set_exception(e)
+        # Исключение уже передается вызывающему; ожидающих может не быть
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(digest, None)
+    return describe(manifest)
+
+
+class MediaFiles(StaticFiles):
+    """Раздача загруженных файлов: URL неизменяемы, кэшируются навсегда"""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+if __name__ == "__main__":
+    # python -m app.images - пропускная способность параллельных загрузок
+    import io
+    import random
+    import tempfile
+    import time
+    from app import images
+
+    def make_jpeg(seed: int) -> bytes:
+        rng = random.Random(seed)
+        image = Image.new("RGB", (2400, 1600), tuple(rng.randrange(256) for _ in range(3)))
+        noise = Image.effect_noise((2400, 1600), 40).convert("RGB")
+        image = Image.blend(image, noise, 0.5)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+
+    uploads = [make_jpeg(seed) for seed in range(24)]
+    print(f"{len(uploads)} uploads of 2400x1600 JPEG, widths {IMAGE_VARIANT_WIDTHS}, {IMAGE_VARIANT_FORMAT}")
+
+    async def run(workers: int) -> float:
+        with tempfile.TemporaryDirectory() as tmp:
+            images.MEDIA_DIR = tmp
+            images._executor = ProcessPoolExecutor(max_workers=workers)
+            images._semaphore = None
+            started = time.perf_counter()
+            await asyncio.gather(*(images.store_image(data) for data in uploads))
+            elapsed = time.perf_counter() - started
+            # Повторная загрузка - только хэш и чтение манифеста
+            started = time.perf_counter()
+            await asyncio.gather(*(images.store_image(data) for data in uploads))
+            dedup = time.perf_counter() - started
+            images.shutdown_image_executor()
+        print(f"workers={workers}: {len(uploads) / elapsed:.1f} images/s, dedup hits {len(uploads) / dedup:.0f} images/s")
+        return elapsed
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        asyncio.run(run(workers))
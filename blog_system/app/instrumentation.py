@@ -0,0 +1,192 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.profiling import current_trace
+
+logger = logging.getLogger(__name__)
+
+# Сколько одинаковых по форме запросов за один HTTP-запрос считается N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# Запросы дольше этого порога пишутся в лог
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+
+# Списки параметров разной длины: IN (?, ?, ?), IN ($1, $2), IN (%s, %s)
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|\$\d+|%s|:\w+)\s*,)+\s*(?:\?|\$\d+|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: без различий в числе параметров IN (...) и пробелах"""
+    return _WHITESPACE.sub(" ", _PARAM_LIST.sub("(...)", statement)).strip()
+
+
+class QueryStats:
+    """Статистика SQL-запросов одного HTTP-запроса (или блока кода)"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.transactions = 0
+        self.statements: List[str] = []
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements.append(statement)
+        self.shapes[statement_shape(statement)] += 1
+
+    def record_transaction(self) -> None:
+        self.transactions += 1
+
+    def repeated_shapes(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.items() if n >= threshold]
+
+
+# Статистика текущего HTTP-запроса
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Активные assert_max_queries - видят запросы из любых потоков и задач
+_captures: List[QueryStats] = []
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for capture in _captures:
+        capture.record(statement, duration)
+    # Запрос с профилированием: время SQL - отдельная фаза
+    trace = current_trace()
+    if trace is not None:
+        trace.add("sql", duration)
+
+    if duration * 1000 >= SQL_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", duration * 1000, statement_shape(statement))
+
+
+def _begin(conn):
+    # В режиме AUTOCOMMIT драйвер не открывает транзакцию - не считаем
+    if conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.record_transaction()
+    for capture in _captures:
+        capture.record_transaction()
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Подключить счетчики запросов к движку (для AsyncEngine - engine.sync_engine).
+
+    В отличие от echo=True, запросы не пишутся в лог синхронно: считаются
+    только число и время, а в лог попадают медленные запросы и N+1.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    event.listen(engine, "begin", _begin)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware: считает SQL-запросы каждого HTTP-запроса, добавляет
+    заголовок Server-Timing и предупреждает о подозрении на N+1.
+    """
+
+    def __init__(self, app, n_plus_one_threshold: int = SQL_N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries, {stats.transactions} transactions"'
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"server-timing", timing.encode())],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            for shape, n in stats.repeated_shapes(self.n_plus_one_threshold):
+                logger.warning(
+                    "Possible N+1 in %s %s: %d x %s",
+                    scope["method"], scope["path"], n, shape,
+                )
+
+
+@contextmanager
+def _capture() -> Iterator[QueryStats]:
+    # Учитываются запросы из любых потоков и задач процесса,
+    # поэтому проверки работают и с TestClient
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(n: int) -> Iterator[QueryStats]:
+    """
+    Проверка для тестов: блок выполняет не больше n SQL-запросов.
+
+        with assert_max_queries(3):
+            client.get("/comments/post/1")
+    """
+    with _capture() as stats:
+        yield stats
+    if stats.count > n:
+        listing = "\n".join(f"  {i}. {s}" for i, s in enumerate(stats.statements, 1))
+        raise AssertionError(f"Expected at most {n} queries, got {stats.count}:\n{listing}")
+
+
+@contextmanager
+def assert_max_transactions(n: int) -> Iterator[QueryStats]:
+    """
+    Проверка для тестов: блок открывает не больше n транзакций.
+
+        with assert_max_transactions(0):
+            client.get("/categories/")
+
+    Чтения в режиме AUTOCOMMIT транзакций не открывают.
+    """
+    with _capture() as stats:
+        yield stats
+    if stats.transactions > n:
+        raise AssertionError(f"Expected at most {n} transactions, got {stats.transactions}")
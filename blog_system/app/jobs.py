@@ -0,0 +1,341 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_MAXSIZE = int(os.getenv("JOB_QUEUE_MAXSIZE", "1000"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "3"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "0.5"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "30"))
+JOB_ENQUEUE_TIMEOUT = float(os.getenv("JOB_ENQUEUE_TIMEOUT", "1.0"))
+# Путь к SQLite-файлу для устойчивой очереди; пусто - очередь только в памяти
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "")
+
+Handler = Callable[..., Any]
+
+
+class JobQueueFull(Exception):
+    """Очередь переполнена и не освободилась за отведенное время."""
+
+
+class Job:
+    def __init__(self, name: str, payload: Dict[str, Any], key: Optional[str] = None):
+        self.name = name
+        self.payload = payload
+        self.key = key
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+        self.row_id: Optional[int] = None
+
+
+class SQLiteJobStore:
+    """
+    Устойчивое хранилище задач: задача пишется в SQLite при постановке
+    в очередь и удаляется после успешного выполнения, поэтому
+    незавершенные задачи переживают перезапуск процесса.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " name TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " job_key TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    def add(self, job: Job) -> None:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (name, payload, job_key, attempts) VALUES (?, ?, ?, ?)",
+                (job.name, json.dumps(job.payload), job.key, job.attempts),
+            )
+        job.row_id = cursor.lastrowid
+
+    def update_attempts(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET attempts = ? WHERE id = ?", (job.attempts, job.row_id)
+            )
+
+    def remove(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.row_id,))
+
+    def pending(self) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, payload, job_key, attempts FROM jobs ORDER BY id"
+            ).fetchall()
+        jobs = []
+        for row_id, name, payload, key, attempts in rows:
+            job = Job(name, json.loads(payload), key)
+            job.row_id = row_id
+            job.attempts = attempts
+            jobs.append(job)
+        return jobs
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Внутрипроцессная асинхронная очередь фоновых задач.
+
+    Ограниченная емкость (при переполнении enqueue ждет, затем бросает
+    JobQueueFull), N воркеров, повторы с экспоненциальной задержкой,
+    опциональное хранение в SQLite и дренаж при остановке приложения.
+    Задачи с одинаковым key, еще не взятые воркером, схлопываются.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = JOB_QUEUE_MAXSIZE,
+        workers: int = JOB_WORKERS,
+        max_retries: int = JOB_MAX_RETRIES,
+        backoff_base: float = JOB_BACKOFF_BASE,
+        backoff_max: float = JOB_BACKOFF_MAX,
+        enqueue_timeout: float = JOB_ENQUEUE_TIMEOUT,
+        durable_path: str = JOB_QUEUE_DB,
+    ):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.enqueue_timeout = enqueue_timeout
+        self.durable_path = durable_path
+
+        self._handlers: Dict[str, Handler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._store: Optional[SQLiteJobStore] = None
+        self._workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+        self._queued_keys: Set[str] = set()
+        self._running = False
+
+        # Метрики
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    def job(self, name: str) -> Callable[[Handler], Handler]:
+        """
+        Декоратор регистрации обработчика задачи.
+
+        Обработчик может быть корутиной или обычной функцией (тогда он
+        выполняется в пуле потоков). Аргументы передаются как kwargs и
+        должны сериализоваться в JSON, если включено SQLite-хранилище.
+        """
+
+        def decorator(func: Handler) -> Handler:
+            self._handlers[name] = func
+            return func
+
+        return decorator
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        pending: List[Job] = []
+        if self.durable_path:
+            self._store = SQLiteJobStore(self.durable_path)
+            # Восстанавливаем задачи, не выполненные до перезапуска
+            pending = self._store.pending()
+
+        self._queue = asyncio.Queue(maxsize=max(self.maxsize, len(pending)))
+        self._running = True
+        for job in pending:
+            self._queue.put_nowait(job)
+            if job.key:
+                self._queued_keys.add(job.key)
+
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def enqueue(self, name: str, key: Optional[str] = None, **payload: Any) -> bool:
+        """
+        Поставить задачу в очередь.
+
+        Возвращает False, если задача с таким key уже ждет выполнения.
+        Если очередь полна дольше enqueue_timeout, бросает JobQueueFull.
+        """
+        if name not in self._handlers:
+            raise KeyError(f"Unknown job: {name}")
+
+        if not self._running:
+            # Очередь не запущена (например, в скриптах) - выполняем сразу
+            await self._call(name, payload)
+            return True
+
+        if key is not None and key in self._queued_keys:
+            return False
+
+        job = Job(name, payload, key)
+        if self._store is not None:
+            self._store.add(job)
+        if key is not None:
+            self._queued_keys.add(key)
+
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Backpressure: ждем освобождения места, но не дольше таймаута
+            try:
+                await asyncio.wait_for(self._queue.put(job), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                if key is not None:
+                    self._queued_keys.discard(key)
+                if self._store is not None:
+                    self._store.remove(job)
+                raise JobQueueFull(f"Job queue is full ({self.maxsize} jobs)")
+
+        self.enqueued += 1
+        return True
+
+    async def _call(self, name: str, payload: Dict[str, Any]) -> None:
+        handler = self._handlers[name]
+        if asyncio.iscoroutinefunction(handler):
+            await handler(**payload)
+        else:
+            await asyncio.to_thread(handler, **payload)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job.key is not None:
+                self._queued_keys.discard(job.key)
+            self.in_flight += 1
+            try:
+                await self._call(job.name, job.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._on_failure(job)
+            else:
+                self.processed += 1
+                self._latencies.append(time.monotonic() - job.enqueued_at)
+                if self._store is not None:
+                    self._store.remove(job)
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    def _on_failure(self, job: Job) -> None:
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self.failed += 1
+            logger.exception("Job %s failed after %d attempts", job.name, job.attempts)
+            if self._store is not None:
+                self._store.remove(job)
+            return
+
+        self.retried += 1
+        logger.warning("Job %s failed (attempt %d), retrying", job.name, job.attempts)
+        if self._store is not None:
+            self._store.update_attempts(job)
+
+        delay = min(self.backoff_base * 2 ** (job.attempts - 1), self.backoff_max)
+        delay *= random.uniform(0.5, 1.0)
+        task = asyncio.create_task(self._retry_later(job, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry_later(self, job: Job, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if job.key is not None:
+            if job.key in self._queued_keys:
+                # Пока шла пауза, задачу с тем же ключом поставили заново -
+                # она сделает ту же работу, повтор не нужен
+                if self._store is not None:
+                    self._store.remove(job)
+                return
+            self._queued_keys.add(job.key)
+        # Повторная попытка не ограничивается таймаутом: задача уже принята
+        await self._queue.put(job)
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Дождаться выполнения всех поставленных задач и остановить воркеры.
+        """
+        if not self._running:
+            return
+
+        async def wait_all() -> None:
+            while True:
+                await self._queue.join()
+                if not self._retries:
+                    break
+                await asyncio.gather(*self._retries, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(wait_all(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Job queue drain timed out, %d jobs left", self._queue.qsize()
+            )
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._retries.clear()
+        self._queued_keys.clear()
+        self._running = False
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        if latencies:
+            latency = {
+                "avg": sum(latencies) / len(latencies),
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max": latencies[-1],
+            }
+        else:
+            latency = {"avg": 0.0, "p95": 0.0, "max": 0.0}
+
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "latency_seconds": latency,
+        }
+
+
+# Глобальная очередь задач
+job_queue = JobQueue()
@@ -1,21 +1,148 @@
-from fastapi import FastAPI
-from app.routes import users, posts
-from app.database import db
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.routes import admin, users, posts, categories, comments, events, favorites, feeds, images, subscriptions
+from app.database import AsyncSessionLocal, engine, get_read_db, init_db, close_db, replicas
+from app.compression import CompressionMiddleware, compression_cache
+from app.content_pipeline import run_content_reprocessor
+from app.credentials import shutdown_executor
+from app.events import hub
+from app.feeds import feed_cache
+from app.images import MEDIA_DIR, MEDIA_URL, MediaFiles, shutdown_image_executor
+from app.instrumentation import QueryStatsMiddleware
+from app.jobs import job_queue, JobQueueFull
+from app.profiling import ProfilingMiddleware
+from app.publishing import run_scheduled_publisher
+from app.purging import run_comment_purger
+from app.ratelimit import RateLimitMiddleware
+from app.rendering import render_cache, shutdown_render_executor
+from app.templating import environment, precompile_templates
+from app.trending import load_snapshot, run_snapshot_worker, save_snapshot
+from app.warmup import StartupProfile, preload_hot_data, warm_pool, warmup_requests
+from app import tasks  # noqa: F401 - регистрирует обработчики фоновых задач
 
-app = FastAPI(title="Blog System", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    profile = StartupProfile()
+
+    with profile.phase("init_db"):
+        await init_db()
+    with profile.phase("pool"):
+        await warm_pool(engine)
+        for replica_engine in replicas.engines:
+            await warm_pool(replica_engine)
+    with profile.phase("templates"):
+        await asyncio.to_thread(precompile_templates, environment)
+    with profile.phase("hot_data"):
+        await preload_hot_data(AsyncSessionLocal)
+    with profile.phase("trending"):
+        async with AsyncSessionLocal() as session:
+            await load_snapshot(session)
+    with profile.phase("jobs"):
+        await job_queue.start()
+
+    # Фоновый воркер отложенной публикации постов
+    publisher = asyncio.create_task(run_scheduled_publisher(AsyncSessionLocal))
+    # Периодическое сохранение трендов
+    trending_snapshots = asyncio.create_task(run_snapshot_worker(AsyncSessionLocal))
+    # Фоновая очистка удаленных комментариев
+    comment_purger = asyncio.create_task(run_comment_purger(AsyncSessionLocal))
+    # Пересчет производных полей постов, если сменилась версия конвейера
+    content_reprocessor = asyncio.create_task(run_content_reprocessor(AsyncSessionLocal))
+
+    with profile.phase("self_requests"):
+        await warmup_requests(app)
+    profile.log()
+
+    yield
+
+    for task in (publisher, trending_snapshots, comment_purger, content_reprocessor):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Дожидаемся фоновых задач перед остановкой
+    await job_queue.drain(timeout=30)
+    async with AsyncSessionLocal() as session:
+        await save_snapshot(session)
+    await close_db()
+    shutdown_executor()
+    shutdown_render_executor()
+    shutdown_image_executor()
+
+
+app = FastAPI(title="Blog System", version="1.0.0", lifespan=lifespan)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+# Внешний слой: профиль охватывает весь стек middleware
+app.add_middleware(ProfilingMiddleware)
 
 # Подключаем роутеры
 app.include_router(users.router)
 app.include_router(posts.router)
+app.include_router(categories.router)
+app.include_router(comments.router)
+app.include_router(favorites.router)
+app.include_router(subscriptions.router)
+app.include_router(events.router)
+app.include_router(images.router)
+app.include_router(feeds.router)
+app.include_router(admin.router)
+
+os.makedirs(MEDIA_DIR, exist_ok=True)
+app.mount(MEDIA_URL, MediaFiles(directory=MEDIA_DIR), name="media")
+
+
+@app.exception_handler(JobQueueFull)
+async def job_queue_full_handler(request: Request, exc: JobQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.get("/metrics/jobs")
+async def jobs_metrics():
+    return job_queue.metrics()
+
+
+@app.get("/metrics/events")
+async def events_metrics():
+    return hub.metrics()
+
+
+@app.get("/metrics/compression")
+async def compression_metrics():
+    return compression_cache.metrics()
+
+
+@app.get("/metrics/feeds")
+async def feeds_metrics():
+    return feed_cache.metrics()
+
+
+@app.get("/metrics/rendering")
+async def rendering_metrics():
+    return render_cache.metrics()
+
 
 @app.get("/")
-async def root():
+async def root(db: AsyncSession = Depends(get_read_db)):
+    users_count = await db.scalar(select(func.count()).select_from(models.User))
+    posts_count = await db.scalar(select(func.count()).select_from(models.Post))
     return {
         "message": "Blog System API",
-        "users_count": len(db.users),
-        "posts_count": len(db.posts)
+        "users_count": users_count,
+        "posts_count": posts_count,
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -7,9 +7,12 @@ from sqlalchemy import (
     Text,
     Boolean,
     DateTime,
+    Float,
     ForeignKey,
+    Index,
     Table,
     CheckConstraint,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import relationship
@@ -39,6 +42,9 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
+    # Денормализованные счетчики подписок
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Связи
     posts = relationship("Post", back_populates="author", cascade="all, delete-orphan")
@@ -85,9 +91,16 @@ class Post(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(200), nullable=False)
-    slug = Column(String(200), nullable=False)
+    slug = Column(String(200), nullable=False, index=True)
     content = Column(Text, nullable=False)
     excerpt = Column(Text)
+    # Производные поля - считаются при записи, см. app/rendering.py
+    excerpt_generated = Column(Boolean, default=False, nullable=False)
+    content_html = Column(Text)
+    word_count = Column(Integer, default=0)
+    reading_time = Column(Integer, default=0)
+    content_hash = Column(String(64))
+    render_version = Column(String(16))
     status = Column(String(20), default="draft")  # draft, published, archived
     featured_image = Column(String(255))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -98,6 +111,21 @@ class Post(Base):
     # Ограничение уникальности
     __table_args__ = (
         CheckConstraint("status IN ('draft', 'published', 'archived')", name="check_post_status"),
+        UniqueConstraint("user_id", "slug", name="uq_posts_user_slug"),
+        # Частичные индексы: публичная лента и очередь отложенной публикации
+        Index(
+            "idx_posts_published_feed",
+            published_at.desc(),
+            id.desc(),
+            postgresql_where=(status == "published"),
+            sqlite_where=(status == "published"),
+        ),
+        Index(
+            "idx_posts_scheduled",
+            published_at,
+            postgresql_where=(status == "draft") & published_at.is_not(None),
+            sqlite_where=(status == "draft") & published_at.is_not(None),
+        ),
     )
     
     # Связи
@@ -120,6 +148,25 @@ class Comment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_deleted = Column(Boolean, default=False)
+    deleted_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        # Частичные индексы: чтение веток без удаленных и очередь очистки
+        Index(
+            "idx_comments_post_live",
+            post_id,
+            created_at,
+            id,
+            postgresql_where=(is_deleted == False),  # noqa: E712
+            sqlite_where=(is_deleted == False),  # noqa: E712
+        ),
+        Index(
+            "idx_comments_tombstones",
+            deleted_at,
+            postgresql_where=(is_deleted == True),  # noqa: E712
+            sqlite_where=(is_deleted == True),  # noqa: E712
+        ),
+    )
     
     # Связи
     post = relationship("Post", back_populates="comments")
@@ -161,6 +208,9 @@ class Subscription(Base):
     # Ограничение: нельзя подписаться на себя
     __table_args__ = (
         CheckConstraint("subscriber_id != subscribed_to_id", name="check_no_self_subscription"),
+        # Индексы для постраничных списков подписчиков и подписок
+        Index("idx_subscriptions_subscribed_to_created", "subscribed_to_id", "created_at"),
+        Index("idx_subscriptions_subscriber_created", "subscriber_id", "created_at"),
     )
     
     # Связи
@@ -173,4 +223,15 @@ class Subscription(Base):
         "User",
         foreign_keys=[subscribed_to_id],
         back_populates="subscribers",
-    )
\ No newline at end of file
+    )
+
+
+class TrendingScore(Base):
+    """Снимок трендовых постов: счет поста в окне тренда."""
+    
+    __tablename__ = "trending_scores"
+    
+    window = Column(String(10), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
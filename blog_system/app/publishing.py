@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import selectinload
+from app import models, schemas
+from app.events import hub
+from app.feeds import feed_cache
+
+logger = logging.getLogger(__name__)
+
+POST_STATUSES = ("draft", "published", "archived")
+
+PUBLISH_BATCH_SIZE = int(os.getenv("PUBLISH_BATCH_SIZE", "100"))
+PUBLISH_INTERVAL_SECONDS = float(os.getenv("PUBLISH_INTERVAL_SECONDS", "30"))
+
+
+class InvalidStatusTransition(ValueError):
+    """Недопустимый статус поста или дата публикации."""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_aware(value: datetime) -> datetime:
+    # SQLite возвращает даты без часового пояса
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def apply_status_transition(
+    post: models.Post,
+    new_status: str,
+    published_at: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+) -> None:
+    """
+    Применить к посту смену статуса.
+
+    - published с датой в будущем: пост остается черновиком и будет
+      опубликован фоновым воркером (отложенная публикация);
+    - published без даты: публикуется сейчас, published_at сохраняется,
+      если пост уже публиковался;
+    - draft: снимает с публикации, published_at задает (или сбрасывает)
+      время отложенной публикации;
+    - archived: published_at не меняется.
+    """
+    if new_status not in POST_STATUSES:
+        raise InvalidStatusTransition(f"Unknown post status: {new_status}")
+
+    now = now or utcnow()
+    if published_at is not None:
+        published_at = _as_aware(published_at)
+
+    if new_status == "published":
+        if published_at is not None and published_at > now:
+            post.status = "draft"
+            post.published_at = published_at
+        else:
+            post.status = "published"
+            post.published_at = published_at or post.published_at or now
+    elif new_status == "draft":
+        post.status = "draft"
+        post.published_at = published_at
+    else:
+        if published_at is not None:
+            raise InvalidStatusTransition("Archived posts cannot be scheduled")
+        post.status = "archived"
+
+
+def published_posts_query():
+    """
+    Запрос публичной ленты.
+
+    Условие и сортировка совпадают с частичным индексом
+    idx_posts_published_feed, поэтому черновики не сканируются.
+    """
+    return (
+        select(models.Post)
+        .where(models.Post.status == "published")
+        .order_by(models.Post.published_at.desc(), models.Post.id.desc())
+    )
+
+
+def publish_post_event(
+    post: models.Post,
+    category_ids: Iterable[int],
+    was_published: bool = False,
+    deleted: bool = False,
+) -> None:
+    """
+    Отправить подписчикам потока изменений событие по посту.
+
+    В поток попадают только публичные посты: снятие с публикации
+    выглядит для подписчиков как удаление.
+    """
+    public = not deleted and post.status == "published"
+    if public or was_published:
+        feed_cache.post_changed(
+            post.id,
+            post.user_id,
+            category_ids,
+            post.published_at if public else None,
+            post.updated_at,
+        )
+
+    if not public:
+        if was_published:
+            hub.publish(
+                "post.deleted",
+                {"id": post.id},
+                post_id=post.id,
+                author_id=post.user_id,
+                category_ids=category_ids,
+            )
+        return
+
+    hub.publish(
+        "post.updated" if was_published else "post.created",
+        schemas.PostSummary.model_validate(post).model_dump(),
+        post_id=post.id,
+        author_id=post.user_id,
+        category_ids=category_ids,
+    )
+
+
+async def publish_due_posts(
+    db: AsyncSession,
+    batch_size: int = PUBLISH_BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Опубликовать черновики, у которых наступило время публикации.
+
+    Работает пачками по batch_size, каждая пачка - отдельная короткая
+    транзакция. Возвращает число опубликованных постов.
+    """
+    now = now or utcnow()
+    total = 0
+
+    while True:
+        due_ids = (
+            select(models.Post.id)
+            .where(
+                models.Post.status == "draft",
+                models.Post.published_at.is_not(None),
+                models.Post.published_at <= now,
+            )
+            .order_by(models.Post.published_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(due_ids)
+        ids = result.scalars().all()
+
+        if not ids:
+            break
+
+        await db.execute(
+            update(models.Post)
+            .where(models.Post.id.in_(ids), models.Post.status == "draft")
+            .values(status="published")
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += len(ids)
+
+        result = await db.execute(
+            select(models.Post)
+            .options(selectinload(models.Post.categories))
+            .where(models.Post.id.in_(ids), models.Post.status == "published")
+            .execution_options(populate_existing=True)
+        )
+        for post in result.scalars().all():
+            publish_post_event(post, [c.id for c in post.categories])
+
+        if len(ids) < batch_size:
+            break
+
+    return total
+
+
+async def run_scheduled_publisher(
+    session_factory: async_sessionmaker,
+    interval: float = PUBLISH_INTERVAL_SECONDS,
+    batch_size: int = PUBLISH_BATCH_SIZE,
+) -> None:
+    """
+    Фоновый воркер отложенной публикации.
+    """
+    while True:
+        try:
+            async with session_factory() as session:
+                published = await publish_due_posts(session, batch_size)
+            if published:
+                logger.info("Scheduled publisher: published %d posts", published)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Scheduled publisher failed")
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+from app import models
+from app.publishing import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд после удаления комментарий удаляется физически
+COMMENT_PURGE_AFTER_SECONDS = float(os.getenv("COMMENT_PURGE_AFTER_SECONDS", str(7 * 86400)))
+COMMENT_PURGE_BATCH_SIZE = int(os.getenv("COMMENT_PURGE_BATCH_SIZE", "500"))
+# Сколько пачек обрабатывается за один проход воркера
+COMMENT_PURGE_MAX_BATCHES = int(os.getenv("COMMENT_PURGE_MAX_BATCHES", "20"))
+COMMENT_PURGE_INTERVAL_SECONDS = float(os.getenv("COMMENT_PURGE_INTERVAL_SECONDS", "300"))
+
+
+async def purge_comment_tombstones(
+    db: AsyncSession,
+    batch_size: int = COMMENT_PURGE_BATCH_SIZE,
+    max_batches: int = COMMENT_PURGE_MAX_BATCHES,
+    older_than: float = COMMENT_PURGE_AFTER_SECONDS,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Физически удалить давно помеченные комментарии.
+
+    Каскад ON DELETE по parent_id не используется: ответы удаленных
+    комментариев сначала сами помечаются удаленными (с датой родителя),
+    а удаляются только листья. Большое поддерево разбирается снизу вверх
+    за несколько пачек, каждая - отдельная короткая транзакция.
+    Старые строки с is_deleted без deleted_at получают дату удаления
+    "сейчас" и удаляются, когда истечет срок хранения.
+    Возвращает число удаленных строк.
+    """
+    now = now or utcnow()
+    cutoff = now - timedelta(seconds=older_than)
+    parent = aliased(models.Comment)
+    child = aliased(models.Comment)
+    total = 0
+
+    await db.execute(
+        update(models.Comment)
+        .where(
+            models.Comment.is_deleted == True,  # noqa: E712
+            models.Comment.deleted_at.is_(None),
+        )
+        .values(deleted_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    for _ in range(max_batches):
+        # Ответы, которые еще не удалены или удалены позже родителя
+        pending_children = (
+            select(child.id)
+            .join(parent, parent.id == child.parent_id)
+            .where(
+                parent.is_deleted == True,  # noqa: E712
+                parent.deleted_at <= cutoff,
+                or_(child.is_deleted == False, child.deleted_at > parent.deleted_at),  # noqa: E712
+            )
+            .limit(batch_size)
+        )
+        marked = await db.execute(
+            update(models.Comment)
+            .where(models.Comment.id.in_(pending_children.scalar_subquery()))
+            .values(
+                is_deleted=True,
+                deleted_at=select(parent.deleted_at)
+                .where(parent.id == models.Comment.parent_id)
+                .scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        # Удаляем только листья - строки, у которых не осталось ответов
+        leaves = (
+            select(models.Comment.id)
+            .where(
+                models.Comment.is_deleted == True,  # noqa: E712
+                models.Comment.deleted_at <= cutoff,
+                ~exists().where(child.parent_id == models.Comment.id),
+            )
+            .order_by(models.Comment.deleted_at)
+            .limit(batch_size)
+        )
+        ids = (await db.execute(leaves)).scalars().all()
+        deleted_count = 0
+        if ids:
+            deleted = await db.execute(
+                delete(models.Comment)
+                .where(models.Comment.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            deleted_count = deleted.rowcount
+        await db.commit()
+
+        total += deleted_count
+        if deleted_count == 0 and marked.rowcount == 0:
+            break
+
+    return total
+
+
+async def run_comment_purger(
+    session_factory: async_sessionmaker,
+    interval: float = COMMENT_PURGE_INTERVAL_SECONDS,
+) -> None:
+    """
+    Фоновый воркер очистки удаленных комментариев.
+    """
+    while True:
+        try:
+            async with session_factory() as session:
+                purged = await purge_comment_tombstones(session)
+            if purged:
+                logger.info("Purged %d deleted comments", purged)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Comment purge failed")
+        await asyncio.sleep(interval)
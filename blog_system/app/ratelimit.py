@@ -0,0 +1,227 @@
+import asyncio
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+# Лимиты по классам маршрутов: (емкость корзины, период пополнения в секундах).
+# Переопределяются переменными окружения RATE_LIMIT_<КЛАСС>="емкость/период",
+# например RATE_LIMIT_WRITE="60/60".
+RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "auth": (10, 60),
+    "signup": (5, 60),
+    "comment": (20, 60),
+    "write": (60, 60),
+    "read": (600, 60),
+}
+
+# Правила сопоставления запроса с классом лимита - первое совпадение.
+# (методы, префикс пути, класс); класс None - без ограничения.
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+ROUTE_RULES = [
+    ({"POST"}, "/users/login", "auth"),
+    ({"POST"}, "/users/", "signup"),
+    (WRITE_METHODS, "/comments", "comment"),
+    (WRITE_METHODS, "/", "write"),
+    ({"GET", "HEAD"}, "/static", None),
+    ({"GET", "HEAD"}, "/", "read"),
+]
+
+# Допустимое число одновременно выполняющихся пишущих запросов
+MAX_INFLIGHT_WRITES = int(os.getenv("MAX_INFLIGHT_WRITES", "32"))
+# Сколько запрос может ждать свободного слота, прежде чем получить 503
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "0.2"))
+# Брать адрес клиента из X-Forwarded-For (только за доверенным прокси)
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+# Общий бэкенд для нескольких процессов, например redis://localhost:6379/0
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+
+for _name in list(RATE_LIMITS):
+    _value = os.getenv(f"RATE_LIMIT_{_name.upper()}")
+    if _value:
+        _capacity, _period = _value.split("/")
+        RATE_LIMITS[_name] = (int(_capacity), float(_period))
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Возвращает класс лимита для запроса"""
+    for methods, prefix, limit_class in ROUTE_RULES:
+        if method in methods and path.startswith(prefix):
+            return limit_class
+    return None
+
+
+class MemoryBucketStore:
+    """Корзины токенов в памяти процесса"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # Ключ -> (токены, время последнего обращения, когда корзина наполнится).
+        # Порядок словаря - порядок последнего обращения.
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._next_evict = 0.0
+
+    async def take(self, key: str, capacity: int, period: float) -> Tuple[bool, float]:
+        """Забирает токен; возвращает (разрешено, через сколько секунд повторить)"""
+        rate = capacity / period
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.pop(key, (capacity, now, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        if len(self._buckets) > self.max_keys and now >= self._next_evict:
+            self._evict(now)
+
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / rate
+
+    def _evict(self, now: float) -> None:
+        # Удаляем только корзины, которые уже наполнились: их сброс ничего
+        # не меняет. Опустошенные корзины не трогаем - иначе клиент,
+        # перебирающий ключи, вытеснял бы свои ограничения.
+        target = len(self._buckets) // 10 or 1
+        removed = 0
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                del self._buckets[key]
+                removed += 1
+                if removed >= target:
+                    return
+        # Все корзины активны - повторим не раньше чем через секунду
+        self._next_evict = now + 1.0
+
+
+class RedisBucketStore:
+    """Корзины токенов в Redis - общие для всех процессов и серверов"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local allowed = 0
+    local retry = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry)}
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL requires the 'redis' package") from e
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, capacity: int, period: float) -> Tuple[bool, float]:
+        allowed, retry = await self._script(
+            keys=[f"ratelimit:{key}"], args=[capacity, capacity / period, time.time()]
+        )
+        return bool(allowed), float(retry)
+
+
+def create_store():
+    if RATE_LIMIT_REDIS_URL:
+        return RedisBucketStore(RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore()
+
+
+class AdmissionController:
+    """Ограничивает число одновременно выполняющихся пишущих запросов"""
+
+    def __init__(self, limit: int = MAX_INFLIGHT_WRITES, timeout: float = ADMISSION_TIMEOUT):
+        self.limit = limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware: лимит запросов по клиенту и классу маршрута
+    (429 + Retry-After) и контроль допуска пишущих запросов (503 + Retry-After).
+    """
+
+    def __init__(self, app, store=None, admission: Optional[AdmissionController] = None):
+        self.app = app
+        self.store = store or create_store()
+        self.admission = admission or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        limit_class = classify(method, scope["path"])
+
+        if limit_class is not None:
+            capacity, period = RATE_LIMITS[limit_class]
+            key = f"{limit_class}:{self._client_id(scope)}"
+            allowed, retry_after = await self.store.take(key, capacity, period)
+            if not allowed:
+                await self._reject(send, 429, "Too many requests", retry_after)
+                return
+
+        if method not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.admission.acquire():
+            await self._reject(send, 503, "Server is busy, try again later", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release()
+
+    @staticmethod
+    def _client_id(scope) -> str:
+        if TRUST_FORWARDED_FOR:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str, retry_after: float) -> None:
+        body = ('{"detail": "%s"}' % detail).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
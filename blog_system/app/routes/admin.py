@@ -0,0 +1,93 @@
+import asyncio
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.profiling import (
+    PROFILE_MAX_SECONDS,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_SECRET,
+    SamplerBusy,
+    profiles,
+    sampler,
+    sign_profile_token,
+)
+
+# Токен администратора; пусто - административные маршруты отключены
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not found",
+        )
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required",
+        )
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def sample_profile(
+    seconds: float = Query(5, gt=0, le=PROFILE_MAX_SECONDS),
+    interval: float = Query(PROFILE_SAMPLE_INTERVAL, ge=0.001, le=1),
+):
+    """
+    Снять стеки процесса за seconds секунд.
+
+    Ответ - свернутые стеки (формат flamegraph.pl / speedscope).
+    """
+    try:
+        stacks, samples = await asyncio.to_thread(sampler.sample, seconds, interval)
+    except SamplerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profiling already in progress",
+        )
+    return PlainTextResponse(sampler.format(stacks), headers={"X-Profile-Samples": str(samples)})
+
+
+@router.post("/profile-token")
+async def create_profile_token(ttl: int = Query(300, gt=0, le=3600)):
+    """
+    Получить подписанное значение заголовка X-Debug-Profile.
+    """
+    if not PROFILE_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Request profiling is disabled",
+        )
+    return {"header": "X-Debug-Profile", "value": sign_profile_token(ttl), "expires_in": ttl}
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """
+    Последние профили запросов (без статистики cProfile).
+    """
+    return profiles.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """
+    Статистика cProfile запроса по id из заголовка X-Profile-Id.
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found",
+        )
+    return profile["stats"]
@@ -1,9 +1,12 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app import schemas, models
-from app.database import get_db
+from app.batch import parse_ids, pick_by_ids, set_missing_ids
+from app.conditional import is_not_modified, make_etag, not_modified, set_validators
+from app.database import get_db, get_read_db
+from app.slugs import slugify
 
 router = APIRouter(
     prefix="/categories",
@@ -13,24 +16,51 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.CategoryInDB])
 async def get_categories(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    ids: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить список всех категорий.
+
+    ?ids=3,1,2 - категории с этими id одним запросом, в порядке
+    запроса; отсутствующие id перечисляются в заголовке X-Missing-Ids.
     """
-    result = await db.execute(
-        select(models.Category).offset(skip).limit(limit)
+    missing: List[int] = []
+    if ids is not None:
+        wanted = parse_ids(ids)
+        result = await db.execute(select(models.Category).where(models.Category.id.in_(wanted)))
+        categories, missing = pick_by_ids(wanted, {c.id: c for c in result.scalars().all()})
+    else:
+        result = await db.execute(
+            select(models.Category).offset(skip).limit(limit)
+        )
+        categories = result.scalars().all()
+
+    # skip/limit к ?ids= не применяются и в ETag не входят
+    page = (ids,) if ids is not None else (skip, limit)
+    # У категорий нет updated_at - ETag строится по значимым полям
+    etag = make_etag(
+        "categories", *page,
+        *[(c.id, c.name, c.slug, c.description) for c in categories],
     )
-    categories = result.scalars().all()
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_validators(response, etag)
+    set_missing_ids(response, missing)
+
     return categories
 
 
 @router.get("/{category_id}", response_model=schemas.CategoryInDB)
 async def get_category(
     category_id: int,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить категорию по ID.
@@ -46,6 +76,11 @@ async def get_category(
             detail="Category not found",
         )
     
+    etag = make_etag("category", category.id, category.name, category.slug, category.description)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_validators(response, etag)
+    
     return category
 
 
@@ -58,7 +93,7 @@ async def create_category(
     Создать новую категорию.
     """
     # Генерируем slug из имени
-    slug = category.name.lower().replace(" ", "-")
+    slug = slugify(category.name, max_length=50)
     
     db_category = models.Category(
         name=category.name,
@@ -67,8 +102,9 @@ async def create_category(
     )
     
     db.add(db_category)
-    await db.commit()
+    await db.flush()
     await db.refresh(db_category)
+    await db.commit()
     
     return db_category
 
@@ -95,11 +131,12 @@ async def update_category(
     
     # Обновляем поля
     db_category.name = category_update.name
-    db_category.slug = category_update.name.lower().replace(" ", "-")
+    db_category.slug = slugify(category_update.name, max_length=50)
     db_category.description = category_update.description
     
-    await db.commit()
+    await db.flush()
     await db.refresh(db_category)
+    await db.commit()
     
     return db_category
 
@@ -1,52 +1,108 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from app import schemas, models
-from app.database import get_db
+from app.auth import Principal, get_current_user
+from app.conditional import is_not_modified, make_etag, not_modified, set_validators
+from app.database import get_db, get_read_db
+from app.events import hub
+from app.publishing import utcnow
+from app.trending import trending
 
 router = APIRouter(
     prefix="/comments",
     tags=["comments"],
 )
 
+# Условие совпадает с частичным индексом idx_comments_post_live
+NOT_DELETED = models.Comment.is_deleted == False  # noqa: E712
+
+
+def _publish_comment_event(
+    event_type: str,
+    comment: models.Comment,
+    post_published: bool,
+    payload: Optional[dict] = None,
+) -> None:
+    # Поток изменений публичный: комментарии к черновикам и архиву в него не попадают
+    if not post_published:
+        return
+    hub.publish(
+        event_type,
+        payload if payload is not None else schemas.CommentInDB.model_validate(comment).model_dump(),
+        post_id=comment.post_id,
+        author_id=comment.user_id,
+    )
+
 
 @router.get("/post/{post_id}", response_model=List[schemas.CommentWithAuthor])
 async def get_comments_by_post(
     post_id: int,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Получить комментарии для поста.
+    
+    ETag ветки вычисляется одним агрегатным запросом (он же проверяет
+    существование поста), поэтому 304 отдается без загрузки комментариев.
     """
-    # Проверяем существование поста
     result = await db.execute(
-        select(models.Post).where(models.Post.id == post_id)
+        select(
+            models.Post.id,
+            func.count(models.Comment.id),
+            func.max(models.Comment.id),
+            func.max(models.Comment.updated_at),
+        )
+        .outerjoin(
+            models.Comment,
+            (models.Comment.post_id == models.Post.id) & NOT_DELETED,
+        )
+        .where(models.Post.id == post_id)
+        .group_by(models.Post.id)
     )
-    post = result.scalar_one_or_none()
+    thread_state = result.one_or_none()
     
-    if not post:
+    if thread_state is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found",
         )
     
-    # Получаем корневые комментарии (без родителя)
+    etag = make_etag("comments", *thread_state)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_validators(response, etag)
+    
+    # Загружаем всю ветку одним запросом и собираем дерево в памяти
     result = await db.execute(
         select(models.Comment)
-        .where(models.Comment.post_id == post_id, models.Comment.parent_id.is_(None))
-        .order_by(models.Comment.created_at)
+        .options(joinedload(models.Comment.author))
+        .where(models.Comment.post_id == post_id, NOT_DELETED)
+        .order_by(models.Comment.created_at, models.Comment.id)
     )
     comments = result.scalars().all()
     
-    return comments
+    children = defaultdict(list)
+    for comment in comments:
+        children[comment.parent_id].append(comment)
+    for comment in comments:
+        set_committed_value(comment, "replies", children.get(comment.id, []))
+    
+    # Корневые комментарии (без родителя)
+    return children[None]
 
 
 @router.post("/", response_model=schemas.CommentInDB)
 async def create_comment(
     comment: schemas.CommentCreate,
     post_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -70,6 +126,7 @@ async def create_comment(
             select(models.Comment).where(
                 models.Comment.id == comment.parent_id,
                 models.Comment.post_id == post_id,
+                NOT_DELETED,
             )
         )
         parent_comment = result.scalar_one_or_none()
@@ -88,8 +145,12 @@ async def create_comment(
     )
     
     db.add(db_comment)
-    await db.commit()
+    await db.flush()
     await db.refresh(db_comment)
+    await db.commit()
+    
+    trending.record(post_id, "comment")
+    _publish_comment_event("comment.created", db_comment, post.status == "published")
     
     return db_comment
 
@@ -98,14 +159,16 @@ async def create_comment(
 async def update_comment(
     comment_id: int,
     comment_update: schemas.CommentBase,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Обновить комментарий.
     """
     result = await db.execute(
-        select(models.Comment).where(models.Comment.id == comment_id)
+        select(models.Comment)
+        .options(joinedload(models.Comment.post).load_only(models.Post.status))
+        .where(models.Comment.id == comment_id, NOT_DELETED)
     )
     db_comment = result.scalar_one_or_none()
     
@@ -123,11 +186,59 @@ async def update_comment(
         )
     
     db_comment.content = comment_update.content
+    post_published = db_comment.post.status == "published"
     
-    await db.commit()
+    await db.flush()
     await db.refresh(db_comment)
+    await db.commit()
+    
+    _publish_comment_event("comment.updated", db_comment, post_published)
     
     return db_comment
 
 
-@router.delete("/{comment
\ No newline at end of file
+@router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_comment(
+    comment_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Удалить комментарий.
+    
+    Удаление - только пометка (tombstone): ответы скрываются вместе с ним,
+    а строки удаляются фоновой очисткой пачками (см. app/purging.py).
+    """
+    result = await db.execute(
+        select(models.Comment)
+        .options(joinedload(models.Comment.post).load_only(models.Post.status))
+        .where(models.Comment.id == comment_id, NOT_DELETED)
+    )
+    db_comment = result.scalar_one_or_none()
+    
+    if not db_comment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Comment not found",
+        )
+    
+    # Проверяем, что пользователь является автором комментария
+    if db_comment.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    
+    db_comment.is_deleted = True
+    db_comment.deleted_at = utcnow()
+    post_published = db_comment.post.status == "published"
+    await db.commit()
+    
+    _publish_comment_event(
+        "comment.deleted",
+        db_comment,
+        post_published,
+        {"id": comment_id, "post_id": db_comment.post_id},
+    )
+    
+    return None
@@ -0,0 +1,84 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
+from app.events import EventFilter, TooManySubscribers, hub, long_poll, sse_stream
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+
+
+def _event_filter(
+    types: Optional[str],
+    post_id: Optional[int],
+    author_id: Optional[int],
+    category_id: Optional[int],
+) -> EventFilter:
+    return EventFilter(
+        types=set(types.split(",")) if types else None,
+        post_id=post_id,
+        author_id=author_id,
+        category_id=category_id,
+    )
+
+
+def _too_many_subscribers() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many subscribers",
+        headers={"Retry-After": "5"},
+    )
+
+
+@router.get("/stream")
+async def stream_events(
+    types: Optional[str] = None,
+    post_id: Optional[int] = None,
+    author_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None),
+):
+    """
+    Поток изменений постов и комментариев (Server-Sent Events).
+
+    types - через запятую: post, comment или точные типы вроде
+    post.created. С фильтром по категории приходят только события постов.
+    После разрыва клиент переподключается с Last-Event-ID и получает
+    пропущенные события; событие reset означает, что данные нужно
+    перечитать целиком.
+    """
+    try:
+        subscription = hub.subscribe(_event_filter(types, post_id, author_id, category_id))
+    except TooManySubscribers:
+        raise _too_many_subscribers()
+
+    return StreamingResponse(
+        sse_stream(subscription, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/poll")
+async def poll_events(
+    since: int = 0,
+    types: Optional[str] = None,
+    post_id: Optional[int] = None,
+    author_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+):
+    """
+    Long-poll для клиентов без поддержки SSE: события после since
+    или ожидание первого нового события. Следующий запрос - с since=last_id.
+    """
+    try:
+        body = await long_poll(hub, _event_filter(types, post_id, author_id, category_id), since)
+    except TooManySubscribers:
+        raise _too_many_subscribers()
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Cache-Control": "no-cache"},
+    )
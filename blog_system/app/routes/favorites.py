@@ -0,0 +1,114 @@
+from typing import Dict, List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app import schemas, models
+from app.auth import Principal, get_current_user
+from app.database import get_db, get_read_db
+from app.favorites import favorite_cache, favorited_post_ids
+from app.trending import trending
+
+router = APIRouter(
+    prefix="/favorites",
+    tags=["favorites"],
+)
+
+# Максимальное число постов в одном запросе проверки
+MAX_CHECK_IDS = 200
+
+
+@router.get("/", response_model=List[schemas.FavoriteInDB])
+async def get_favorites(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить избранное текущего пользователя (последние добавленные сверху).
+    """
+    result = await db.execute(
+        select(models.Favorite)
+        .where(models.Favorite.user_id == current_user.id)
+        .order_by(models.Favorite.created_at.desc(), models.Favorite.post_id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    favorites = result.scalars().all()
+    return favorites
+
+
+@router.get("/check", response_model=Dict[int, bool])
+async def check_favorites(
+    post_ids: List[int] = Query(..., max_length=MAX_CHECK_IDS),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Проверить сразу для нескольких постов, добавлены ли они в избранное.
+    """
+    favorited = await favorited_post_ids(db, current_user.id, post_ids)
+    return {post_id: post_id in favorited for post_id in post_ids}
+
+
+@router.post("/", response_model=schemas.FavoriteInDB, status_code=status.HTTP_201_CREATED)
+async def add_favorite(
+    favorite: schemas.FavoriteCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Добавить пост в избранное.
+    """
+    post = await db.get(models.Post, favorite.post_id)
+
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+
+    db_favorite = models.Favorite(user_id=current_user.id, post_id=favorite.post_id)
+
+    db.add(db_favorite)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Post already in favorites",
+        )
+    await db.refresh(db_favorite)
+    await db.commit()
+
+    favorite_cache.add(current_user.id, favorite.post_id)
+    trending.record(favorite.post_id, "favorite")
+
+    return db_favorite
+
+
+@router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_favorite(
+    post_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Удалить пост из избранного.
+    """
+    db_favorite = await db.get(models.Favorite, (current_user.id, post_id))
+
+    if not db_favorite:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Favorite not found",
+        )
+
+    await db.delete(db_favorite)
+    await db.commit()
+
+    favorite_cache.remove(current_user.id, post_id)
+
+    return None
@@ -0,0 +1,148 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app import models
+from app.conditional import is_not_modified, not_modified, validator_headers
+from app.database import get_read_db
+from app.feeds import (
+    FEED_FORMATS,
+    SITE_TITLE,
+    SITEMAP_MEDIA_TYPE,
+    FeedDocument,
+    build_feed,
+    build_sitemap_index,
+    feed_cache,
+    sitemap_shards,
+    stream_sitemap_shard,
+)
+
+router = APIRouter(tags=["feeds"])
+
+
+def _media_type(fmt: str) -> str:
+    media_type = FEED_FORMATS.get(fmt)
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown feed format",
+        )
+    return media_type
+
+
+def _serve(request: Request, doc: FeedDocument, media_type: str) -> Response:
+    if is_not_modified(request, doc.etag, doc.last_modified):
+        return not_modified(doc.etag, doc.last_modified)
+    return Response(
+        content=doc.body,
+        media_type=media_type,
+        headers=validator_headers(doc.etag, doc.last_modified),
+    )
+
+
+async def _feed(
+    request: Request,
+    db: AsyncSession,
+    kind: str,
+    scope_id: Optional[int],
+    fmt: str,
+    title: str,
+) -> Response:
+    media_type = _media_type(fmt)
+    doc = feed_cache.get(("feed", kind, scope_id, fmt))
+    if doc is None:
+        doc = await build_feed(db, kind, scope_id, fmt, title, request.url.path)
+    return _serve(request, doc, media_type)
+
+
+@router.get("/feed.{fmt}")
+async def site_feed(
+    fmt: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Лента последних опубликованных постов (feed.xml - RSS, feed.atom - Atom).
+    """
+    return await _feed(request, db, "all", None, fmt, SITE_TITLE)
+
+
+@router.get("/authors/{username}/feed.{fmt}")
+async def author_feed(
+    username: str,
+    fmt: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Лента постов автора.
+    """
+    _media_type(fmt)
+    user_id = await db.scalar(
+        select(models.User.id).where(models.User.username == username)
+    )
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    return await _feed(request, db, "author", user_id, fmt, f"{SITE_TITLE}: {username}")
+
+
+@router.get("/categories/{slug}/feed.{fmt}")
+async def category_feed(
+    slug: str,
+    fmt: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Лента постов категории.
+    """
+    _media_type(fmt)
+    category = (await db.execute(
+        select(models.Category.id, models.Category.name).where(models.Category.slug == slug)
+    )).one_or_none()
+    if category is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found",
+        )
+    return await _feed(request, db, "category", category.id, fmt, f"{SITE_TITLE}: {category.name}")
+
+
+@router.get("/sitemap.xml")
+async def sitemap_index(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Индекс sitemap: по файлу на каждые SITEMAP_SHARD_SIZE id постов.
+    """
+    doc = feed_cache.get(("sitemap-index",))
+    if doc is None:
+        doc = await build_sitemap_index(db)
+    return _serve(request, doc, SITEMAP_MEDIA_TYPE)
+
+
+@router.get("/sitemap-{shard}.xml")
+async def sitemap_shard(
+    shard: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Файл sitemap. Из кэша - с валидаторами, иначе отдается потоком
+    по мере чтения из БД. Номера файлов, которых нет в индексе, - 404:
+    кэш не растет от запросов к произвольным номерам.
+    """
+    if shard not in await sitemap_shards(db):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sitemap not found",
+        )
+    doc = feed_cache.get(("sitemap", shard))
+    if doc is not None:
+        return _serve(request, doc, SITEMAP_MEDIA_TYPE)
+    return StreamingResponse(stream_sitemap_shard(shard), media_type=SITEMAP_MEDIA_TYPE)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from app import schemas
+from app.auth import Principal, get_current_user
+from app.images import (
+    IMAGE_MAX_UPLOAD_BYTES,
+    ImageProcessingUnavailable,
+    InvalidImage,
+    store_image,
+)
+
+router = APIRouter(
+    prefix="/images",
+    tags=["images"],
+)
+
+
+@router.post("/", response_model=schemas.ImageInDB, status_code=status.HTTP_201_CREATED)
+async def upload_image(
+    file: UploadFile = File(...),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Загрузить изображение (для featured_image поста или profile_picture).
+
+    Возвращает URL оригинала, уменьшенных копий и значение srcset.
+    Повторная загрузка того же файла возвращает уже готовые копии.
+    """
+    data = await file.read(IMAGE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Image is too large",
+        )
+
+    try:
+        return await store_image(data)
+    except InvalidImage:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported or corrupted image",
+        )
+    except ImageProcessingUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image processing is not available",
+        )
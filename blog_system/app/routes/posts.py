@@ -1,127 +1,617 @@
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
 from datetime import datetime
-from app.database import db
-from app.schemas import PostCreate, PostResponse
-from app.models import Post
-
-router = APIRouter(prefix="/posts", tags=["posts"])
-templates = Jinja2Templates(directory="templates")
-
-@router.post("/", response_model=PostResponse)
-async def create_post(post: PostCreate):
-    if post.authorId not in db.users:
-        raise HTTPException(status_code=404, detail="Author not found")
-    
-    if not post.title.strip():
-        raise HTTPException(status_code=400, detail="Title cannot be empty")
-    
-    if not post.content.strip():
-        raise HTTPException(status_code=400, detail="Content cannot be empty")
-    
-    new_post = Post(
-        id=db.next_post_id,
-        authorId=post.authorId,
-        title=post.title,
-        content=post.content
+from typing import Iterable, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import HTMLResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import defer, joinedload, selectinload
+from app import schemas, models
+from app.auth import Principal, get_current_user, get_current_user_optional
+from app.batch import parse_ids, pick_by_ids, set_missing_ids
+from app.conditional import is_not_modified, make_etag, not_modified, set_validators, utc_timestamp
+from app.content_pipeline import apply_render
+from app.database import get_db, get_read_db
+from app.favorites import favorite_cache, favorited_post_ids
+from app.rendering import render_async
+from app.publishing import (
+    InvalidStatusTransition,
+    apply_status_transition,
+    publish_post_event,
+    published_posts_query,
+)
+from app.slugs import slug_cache, slugify, unique_slug
+from app.tasks import record_post_view
+from app.templating import templates
+from app.trending import DEFAULT_WINDOW, TRENDING_WINDOWS, trending
+
+router = APIRouter(
+    prefix="/posts",
+    tags=["posts"],
+)
+
+
+async def generate_post_slug(
+    db: AsyncSession,
+    user_id: int,
+    title: str,
+    exclude_post_id: Optional[int] = None,
+) -> str:
+    """
+    Сгенерировать уникальный в пределах автора slug для поста.
+
+    Занятые варианты выбираются одним запросом по индексу (user_id, slug).
+    """
+    base = slugify(title)
+    query = select(models.Post.slug).where(
+        models.Post.user_id == user_id,
+        or_(models.Post.slug == base, models.Post.slug.like(f"{base}-%")),
+    )
+    if exclude_post_id is not None:
+        query = query.where(models.Post.id != exclude_post_id)
+
+    result = await db.execute(query)
+    return unique_slug(base, result.scalars().all())
+
+
+async def _load_categories(
+    db: AsyncSession,
+    category_ids: List[int],
+) -> List[models.Category]:
+    if not category_ids:
+        return []
+
+    result = await db.execute(
+        select(models.Category).where(models.Category.id.in_(category_ids))
+    )
+    categories = result.scalars().all()
+
+    if len(categories) != len(set(category_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found",
+        )
+
+    return list(categories)
+
+
+async def _flush_post(db: AsyncSession, post: models.Post) -> None:
+    """
+    Записать пост; 409 - только если нарушение целостности вызвано
+    занятым slug (гонка двух записей одного автора), иначе ошибка
+    пробрасывается как есть.
+    """
+    user_id, slug, post_id = post.user_id, post.slug, post.id
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        query = select(models.Post.id).where(
+            models.Post.user_id == user_id,
+            models.Post.slug == slug,
+        )
+        if post_id is not None:
+            query = query.where(models.Post.id != post_id)
+        if (await db.execute(query.limit(1))).first() is None:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Post with this slug already exists",
+        )
+
+
+def _transition(
+    post: models.Post,
+    new_status: str,
+    published_at: Optional[datetime] = None,
+) -> None:
+    try:
+        apply_status_transition(post, new_status, published_at)
+    except InvalidStatusTransition as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+def _check_author(post: models.Post, current_user: Principal) -> None:
+    # Проверяем, что пользователь является автором поста
+    if post.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+
+
+def _post_validators(
+    post_id: int,
+    updated_at: datetime,
+    render_version: Optional[str],
+    author_updated_at: datetime,
+    categories: Iterable[Tuple],
+):
+    """
+    Валидаторы поста с автором и категориями: ответ меняется и при
+    правке профиля автора или категории, хотя строка posts та же.
+
+    categories - кортежи (id, name, slug, description). Версия рендеринга
+    входит в ETag: пересчет HTML не меняет updated_at.
+    """
+    last_modified = max(utc_timestamp(updated_at), utc_timestamp(author_updated_at))
+    etag = make_etag("post", post_id, updated_at, render_version, author_updated_at, *sorted(categories))
+    return etag, last_modified
+
+
+def _loaded_post_validators(post: models.Post):
+    return _post_validators(
+        post.id,
+        post.updated_at,
+        post.render_version,
+        post.author.updated_at,
+        [(c.id, c.name, c.slug, c.description) for c in post.categories],
+    )
+
+
+async def _stored_post_validators(db: AsyncSession, post_id: int):
+    """
+    Валидаторы поста одним запросом по нужным колонкам, без загрузки
+    поста; None - поста нет.
+    """
+    rows = (await db.execute(
+        select(
+            models.Post.updated_at,
+            models.Post.render_version,
+            models.User.updated_at.label("author_updated_at"),
+            models.Category.id,
+            models.Category.name,
+            models.Category.slug,
+            models.Category.description,
+        )
+        .join(models.Post.author)
+        .outerjoin(models.Post.categories)
+        .where(models.Post.id == post_id)
+    )).all()
+    if not rows:
+        return None
+    row = rows[0]
+    categories = [tuple(r[3:]) for r in rows if r.id is not None]
+    return _post_validators(post_id, row.updated_at, row.render_version, row.author_updated_at, categories)
+
+
+# Спискам тело поста не нужно: текст и HTML не читаются из БД
+_WITHOUT_BODY = (defer(models.Post.content), defer(models.Post.content_html))
+
+
+def _post_with_author_query():
+    return select(models.Post).options(
+        joinedload(models.Post.author),
+        selectinload(models.Post.categories),
+    )
+
+
+@router.get("/", response_model=List[schemas.PostListItem])
+async def get_posts(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = None,
+    current_user: Optional[Principal] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить список опубликованных постов (новые сверху).
+
+    Элементы списка - без текста и HTML; полный пост отдает
+    GET /posts/{id}.
+
+    ?ids=3,1,2 - посты с этими id одним запросом, в порядке запроса;
+    отсутствующие id перечисляются в заголовке X-Missing-Ids.
+
+    Для аутентифицированного пользователя каждый пост помечается
+    флагом is_favorited - одним запросом на страницу или из кэша.
+    """
+    missing: List[int] = []
+    if ids is not None:
+        wanted = parse_ids(ids)
+        result = await db.execute(
+            select(models.Post).options(*_WITHOUT_BODY).where(models.Post.id.in_(wanted))
+        )
+        posts, missing = pick_by_ids(wanted, {p.id: p for p in result.scalars().all()})
+    else:
+        result = await db.execute(
+            published_posts_query().options(*_WITHOUT_BODY).offset(skip).limit(limit)
+        )
+        posts = result.scalars().all()
+
+    favorited = None
+    if current_user is not None:
+        favorited = await favorited_post_ids(db, current_user.id, [p.id for p in posts])
+
+    # skip/limit к ?ids= не применяются и в ETag не входят
+    page = (ids,) if ids is not None else (skip, limit)
+    # Ответ зависит от пользователя (is_favorited), поэтому он входит в ETag
+    etag = make_etag(
+        "posts", *page,
+        current_user.id if current_user else None,
+        *[(p.id, p.updated_at, p.render_version, favorited is not None and p.id in favorited) for p in posts],
+    )
+    if is_not_modified(request, etag):
+        return not_modified(etag, vary="Authorization")
+    set_validators(response, etag, vary="Authorization")
+    set_missing_ids(response, missing)
+
+    items = [schemas.PostListItem.model_validate(post) for post in posts]
+    if favorited is not None:
+        for item in items:
+            item.is_favorited = item.id in favorited
+
+    return items
+
+
+@router.get("/trending", response_model=List[schemas.TrendingPost])
+async def get_trending_posts(
+    window: str = DEFAULT_WINDOW,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить трендовые посты за окно (1h, 24h, 7d).
+
+    Рейтинг берется из памяти, посты загружаются одним запросом по id.
+    """
+    if window not in TRENDING_WINDOWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown window, expected one of: {', '.join(TRENDING_WINDOWS)}",
+        )
+
+    # Берем с запасом: часть постов могла быть снята с публикации
+    ranked = trending.top(window, limit * 2)
+    if not ranked:
+        return []
+
+    result = await db.execute(
+        select(models.Post).options(*_WITHOUT_BODY).where(
+            models.Post.id.in_([post_id for post_id, _ in ranked]),
+            models.Post.status == "published",
+        )
     )
-    
-    db.posts[new_post.id] = new_post
-    db.next_post_id += 1
-    db.save_data()
-    
-    return new_post
-
-@router.get("/", response_model=list[PostResponse])
-async def get_posts():
-    return list(db.posts.values())
-
-@router.get("/{post_id}", response_model=PostResponse)
-async def get_post(post_id: int):
-    if post_id not in db.posts:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return db.posts[post_id]
-
-@router.put("/{post_id}", response_model=PostResponse)
-async def update_post(post_id: int, post: PostCreate):
-    if post_id not in db.posts:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    if post.authorId not in db.users:
-        raise HTTPException(status_code=404, detail="Author not found")
-    
-    if not post.title.strip():
-        raise HTTPException(status_code=400, detail="Title cannot be empty")
-    
-    if not post.content.strip():
-        raise HTTPException(status_code=400, detail="Content cannot be empty")
-    
-    db.posts[post_id].authorId = post.authorId
-    db.posts[post_id].title = post.title
-    db.posts[post_id].content = post.content
-    db.posts[post_id].updatedAt = datetime.now()
-    db.save_data()
-    
-    return db.posts[post_id]
-
-@router.delete("/{post_id}")
-async def delete_post(post_id: int):
-    if post_id not in db.posts:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    del db.posts[post_id]
-    db.save_data()
-    
-    return {"message": "Post deleted successfully"}
-
-# HTML endpoints
+    posts = {post.id: post for post in result.scalars().all()}
+
+    items = []
+    for post_id, score in ranked:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        item = schemas.TrendingPost.model_validate(post)
+        item.score = score
+        items.append(item)
+        if len(items) == limit:
+            break
+
+    return items
+
+
 @router.get("/html/", response_class=HTMLResponse)
-async def get_posts_html(request: Request):
-    posts = list(db.posts.values())
-    # Добавляем информацию об авторе к каждому посту
-    posts_with_authors = []
-    for post in posts:
-        author = db.users.get(post.authorId)
-        author_name = author.login if author else "Unknown"
-        posts_with_authors.append({
-            "post": post,
-            "author_name": author_name
-        })
-    
+async def get_posts_html(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    HTML-лента опубликованных постов (новые сверху).
+    """
+    result = await db.execute(
+        published_posts_query()
+        .options(joinedload(models.Post.author), *_WITHOUT_BODY)
+        .offset(skip)
+        .limit(limit)
+    )
     return templates.TemplateResponse(
+        request,
         "index.html",
-        {"request": request, "posts": posts_with_authors}
+        {"posts": result.scalars().all()},
     )
 
+
 @router.get("/html/{post_id}", response_class=HTMLResponse)
-async def get_post_html(request: Request, post_id: int):
-    if post_id not in db.posts:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    post = db.posts[post_id]
-    author = db.users.get(post.authorId)
-    author_name = author.login if author else "Unknown"
-    
-    return templates.TemplateResponse(
-        "post.html",
-        {"request": request, "post": post, "author_name": author_name}
+async def get_post_html(
+    request: Request,
+    post_id: int,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    HTML-страница поста; тело - уже отрендеренный content_html.
+    """
+    result = await db.execute(
+        select(models.Post)
+        .options(joinedload(models.Post.author))
+        .where(models.Post.id == post_id)
     )
+    post = result.scalar_one_or_none()
 
-@router.get("/html/create/new", response_class=HTMLResponse)
-async def create_post_form(request: Request):
-    return templates.TemplateResponse(
-        "create_post.html",
-        {"request": request, "users": list(db.users.values())}
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+
+    await record_post_view(post.id)
+
+    return templates.TemplateResponse(request, "post.html", {"post": post})
+
+
+@router.get("/by-slug/{author}/{slug}", response_model=schemas.PostWithAuthor)
+async def get_post_by_slug(
+    author: str,
+    slug: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить пост по username автора и slug.
+
+    При попадании в кэш пост читается по первичному ключу, иначе -
+    одним запросом по уникальному индексу (user_id, slug).
+    """
+    post = None
+    post_id = slug_cache.get(author, slug)
+
+    if post_id is not None:
+        result = await db.execute(
+            _post_with_author_query().where(models.Post.id == post_id)
+        )
+        post = result.unique().scalar_one_or_none()
+        # Запись в кэше могла устареть (пост удален или переименован)
+        if post is None or post.slug != slug or post.author.username != author:
+            slug_cache.invalidate(author, slug)
+            post = None
+
+    if post is None:
+        result = await db.execute(
+            _post_with_author_query()
+            .join(models.Post.author)
+            .where(models.User.username == author, models.Post.slug == slug)
+        )
+        post = result.unique().scalar_one_or_none()
+
+        if not post:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Post not found",
+            )
+
+        slug_cache.set(author, slug, post.id)
+
+    await record_post_view(post.id)
+
+    etag, last_modified = _loaded_post_validators(post)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+
+    return post
+
+
+@router.get("/{post_id}", response_model=schemas.PostWithAuthor)
+async def get_post(
+    post_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить пост по ID.
+
+    Если клиент прислал валидатор, он сверяется по колонкам времени
+    изменения и категорий до загрузки поста с автором и категориями.
+    """
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        validators = await _stored_post_validators(db, post_id)
+        if validators is not None:
+            etag, last_modified = validators
+            if is_not_modified(request, etag, last_modified):
+                await record_post_view(post_id)
+                return not_modified(etag, last_modified)
+
+    result = await db.execute(
+        _post_with_author_query().where(models.Post.id == post_id)
     )
+    post = result.unique().scalar_one_or_none()
 
-@router.get("/html/edit/{post_id}", response_class=HTMLResponse)
-async def edit_post_form(request: Request, post_id: int):
-    if post_id not in db.posts:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    post = db.posts[post_id]
-    return templates.TemplateResponse(
-        "edit_post.html",
-        {"request": request, "post": post, "users": list(db.users.values())}
-    )
\ No newline at end of file
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+
+    await record_post_view(post.id)
+
+    etag, last_modified = _loaded_post_validators(post)
+    set_validators(response, etag, last_modified)
+
+    return post
+
+
+@router.post("/", response_model=schemas.PostInDB)
+async def create_post(
+    post: schemas.PostCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Создать новый пост от имени текущего пользователя.
+    """
+    user_id = current_user.id
+    rendered = await render_async(post.content)
+
+    db_post = models.Post(
+        user_id=user_id,
+        title=post.title,
+        slug=await generate_post_slug(db, user_id, post.title),
+        content=post.content,
+        featured_image=post.featured_image,
+    )
+    apply_render(db_post, rendered, post.excerpt)
+    _transition(db_post, post.status, post.published_at)
+    db_post.categories = await _load_categories(db, post.category_ids)
+    category_ids = [c.id for c in db_post.categories]
+
+    db.add(db_post)
+    await _flush_post(db, db_post)
+    await db.refresh(db_post)
+    await db.commit()
+
+    publish_post_event(db_post, category_ids)
+
+    return db_post
+
+
+@router.put("/{post_id}", response_model=schemas.PostInDB)
+async def update_post(
+    post_id: int,
+    post_update: schemas.PostUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Обновить пост.
+
+    При смене заголовка slug генерируется заново, старый адрес
+    удаляется из кэша.
+    """
+    result = await db.execute(
+        _post_with_author_query().where(models.Post.id == post_id)
+    )
+    db_post = result.unique().scalar_one_or_none()
+
+    if not db_post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+
+    _check_author(db_post, current_user)
+
+    author_name = db_post.author.username
+    old_slug = db_post.slug
+    was_published = db_post.status == "published"
+    data = post_update.model_dump(exclude_unset=True)
+    category_ids = data.pop("category_ids", None)
+    new_status = data.pop("status", None)
+
+    # Производные поля пересчитываются при смене текста или выдержки
+    if "excerpt" in data or data.get("content", db_post.content) != db_post.content:
+        if "excerpt" in data and data["excerpt"] is None:
+            # Автор сбросил свою выдержку - дальше она генерируется
+            db_post.excerpt_generated = True
+        rendered = await render_async(data.get("content", db_post.content))
+        apply_render(db_post, rendered, data.pop("excerpt", None))
+
+    if "title" in data and data["title"] != db_post.title:
+        db_post.slug = await generate_post_slug(
+            db, db_post.user_id, data["title"], exclude_post_id=db_post.id
+        )
+
+    # Обновляем поля
+    for field, value in data.items():
+        setattr(db_post, field, value)
+
+    if new_status is not None and new_status != db_post.status:
+        _transition(db_post, new_status)
+
+    if category_ids is not None:
+        db_post.categories = await _load_categories(db, category_ids)
+        # Смена категорий не меняет строку posts - обновляем updated_at явно,
+        # чтобы сменился ETag
+        db_post.updated_at = func.now()
+    category_ids = [c.id for c in db_post.categories]
+
+    await _flush_post(db, db_post)
+    await db.refresh(db_post)
+    await db.commit()
+
+    if db_post.slug != old_slug:
+        slug_cache.invalidate(author_name, old_slug)
+
+    publish_post_event(db_post, category_ids, was_published)
+
+    return db_post
+
+
+@router.patch("/{post_id}/status", response_model=schemas.PostInDB)
+async def update_post_status(
+    post_id: int,
+    status_update: schemas.PostStatusUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Сменить статус поста: опубликовать (сейчас или по расписанию),
+    снять с публикации или отправить в архив.
+    """
+    result = await db.execute(
+        select(models.Post)
+        .options(selectinload(models.Post.categories))
+        .where(models.Post.id == post_id)
+    )
+    db_post = result.scalar_one_or_none()
+
+    if not db_post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+
+    _check_author(db_post, current_user)
+
+    was_published = db_post.status == "published"
+    category_ids = [c.id for c in db_post.categories]
+    _transition(db_post, status_update.status, status_update.published_at)
+
+    await db.flush()
+    await db.refresh(db_post)
+    await db.commit()
+
+    publish_post_event(db_post, category_ids, was_published)
+
+    return db_post
+
+
+@router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_post(
+    post_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Удалить пост.
+    """
+    result = await db.execute(
+        _post_with_author_query().where(models.Post.id == post_id)
+    )
+    db_post = result.unique().scalar_one_or_none()
+
+    if not db_post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+
+    _check_author(db_post, current_user)
+
+    slug_cache.invalidate(db_post.author.username, db_post.slug)
+    was_published = db_post.status == "published"
+    category_ids = [c.id for c in db_post.categories]
+
+    await db.delete(db_post)
+    await db.commit()
+
+    trending.forget(post_id)
+    favorite_cache.discard_post(post_id)
+    publish_post_event(db_post, category_ids, was_published, deleted=True)
+
+    return None
@@ -0,0 +1,273 @@
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, update
+from app import schemas, models
+from app.auth import Principal, get_current_user
+from app.database import get_db, get_read_db
+from app.publishing import utcnow
+
+router = APIRouter(
+    prefix="/subscriptions",
+    tags=["subscriptions"],
+)
+
+# Максимальное число авторов в одном запросе проверки
+MAX_CHECK_IDS = 200
+
+
+def _encode_cursor(created_at: datetime, user_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, user_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+async def _follow_page(
+    db: AsyncSession,
+    owner_column,
+    other_column,
+    user_id: int,
+    cursor: Optional[str],
+    limit: int,
+) -> schemas.FollowPage:
+    """
+    Страница подписчиков или подписок: keyset-пагинация по
+    (owner_column, created_at), новые сверху.
+    """
+    created_at = models.Subscription.created_at
+    query = (
+        select(models.User, created_at)
+        .join(models.User, models.User.id == other_column)
+        .where(owner_column == user_id)
+        .order_by(created_at.desc(), other_column.desc())
+        .limit(limit + 1)
+    )
+
+    if cursor:
+        # Курсор - (created_at, id) последней строки предыдущей страницы:
+        # страница продолжается, даже если эта подписка уже удалена
+        after_created_at, after_id = _decode_cursor(cursor)
+        query = query.where(
+            or_(
+                created_at < after_created_at,
+                and_(created_at == after_created_at, other_column < after_id),
+            )
+        )
+
+    result = await db.execute(query)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_user, last_created_at = rows[-1]
+        next_cursor = _encode_cursor(last_created_at, last_user.id)
+
+    return schemas.FollowPage(
+        items=[
+            schemas.FollowEntry(user=user, followed_at=followed_at)
+            for user, followed_at in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/followers/{user_id}", response_model=schemas.FollowPage)
+async def get_followers(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить подписчиков пользователя.
+    """
+    return await _follow_page(
+        db,
+        models.Subscription.subscribed_to_id,
+        models.Subscription.subscriber_id,
+        user_id,
+        cursor,
+        limit,
+    )
+
+
+@router.get("/following/{user_id}", response_model=schemas.FollowPage)
+async def get_following(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить пользователей, на которых подписан пользователь.
+    """
+    return await _follow_page(
+        db,
+        models.Subscription.subscriber_id,
+        models.Subscription.subscribed_to_id,
+        user_id,
+        cursor,
+        limit,
+    )
+
+
+@router.get("/counts/{user_id}", response_model=schemas.FollowCounts)
+async def get_follow_counts(
+    user_id: int,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить число подписчиков и подписок из денормализованных счетчиков.
+    """
+    result = await db.execute(
+        select(models.User.followers_count, models.User.following_count)
+        .where(models.User.id == user_id)
+    )
+    counts = result.one_or_none()
+
+    if counts is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    return schemas.FollowCounts(
+        user_id=user_id,
+        followers_count=counts.followers_count,
+        following_count=counts.following_count,
+    )
+
+
+@router.get("/check", response_model=Dict[int, bool])
+async def check_following(
+    user_ids: List[int] = Query(..., max_length=MAX_CHECK_IDS),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Проверить одним запросом, на кого из перечисленных авторов
+    подписан текущий пользователь.
+    """
+    result = await db.execute(
+        select(models.Subscription.subscribed_to_id).where(
+            models.Subscription.subscriber_id == current_user.id,
+            models.Subscription.subscribed_to_id.in_(user_ids),
+        )
+    )
+    following = set(result.scalars().all())
+    return {user_id: user_id in following for user_id in user_ids}
+
+
+async def _shift_counters(
+    db: AsyncSession,
+    subscriber_id: int,
+    subscribed_to_id: int,
+    delta: int,
+) -> None:
+    # updated_at передается явно, иначе сработает onupdate: счетчики -
+    # не правка профиля, и ETag профиля и постов автора меняться не должен
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == subscribed_to_id)
+        .values(
+            followers_count=models.User.followers_count + delta,
+            updated_at=models.User.updated_at,
+        )
+    )
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == subscriber_id)
+        .values(
+            following_count=models.User.following_count + delta,
+            updated_at=models.User.updated_at,
+        )
+    )
+
+
+@router.post("/", response_model=schemas.SubscriptionInDB, status_code=status.HTTP_201_CREATED)
+async def follow(
+    subscription: schemas.SubscriptionCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Подписаться на пользователя.
+    """
+    if subscription.subscribed_to_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot subscribe to yourself",
+        )
+
+    target = await db.get(models.User, subscription.subscribed_to_id)
+
+    if not target:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    # created_at задается приложением: значение из курсора сравнивается
+    # с ним точно, в том же формате и с той же точностью
+    db_subscription = models.Subscription(
+        subscriber_id=current_user.id,
+        subscribed_to_id=subscription.subscribed_to_id,
+        created_at=utcnow(),
+    )
+
+    db.add(db_subscription)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Already subscribed",
+        )
+
+    # Счетчики обновляются в той же транзакции, что и подписка
+    await _shift_counters(db, current_user.id, subscription.subscribed_to_id, 1)
+    await db.flush()
+    await db.refresh(db_subscription)
+    await db.commit()
+
+    return db_subscription
+
+
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unfollow(
+    user_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Отписаться от пользователя.
+    """
+    db_subscription = await db.get(models.Subscription, (current_user.id, user_id))
+
+    if not db_subscription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Subscription not found",
+        )
+
+    await db.delete(db_subscription)
+    await _shift_counters(db, current_user.id, user_id, -1)
+    await db.commit()
+
+    return None
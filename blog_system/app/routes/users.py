@@ -1,74 +1,287 @@
-from fastapi import APIRouter, HTTPException
-from app.database import db
-from app.schemas import UserCreate, UserResponse
-from app.models import User
-
-router = APIRouter(prefix="/users", tags=["users"])
-
-@router.post("/", response_model=UserResponse)
-async def create_user(user: UserCreate):
-    # Проверяем, существует ли пользователь с таким email или логином
-    for existing_user in db.users.values():
-        if existing_user.email == user.email:
-            raise HTTPException(status_code=400, detail="Email already registered")
-        if existing_user.login == user.login:
-            raise HTTPException(status_code=400, detail="Login already taken")
-    
-    new_user = User(
-        id=db.next_user_id,
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, update
+from app import schemas, models
+from app.auth import (
+    ACCESS_TOKEN_TTL_SECONDS,
+    Principal,
+    create_access_token,
+    get_current_user,
+    principal_cache,
+)
+from app.batch import parse_ids, pick_by_ids, set_missing_ids
+from app.conditional import is_not_modified, make_etag, not_modified, set_validators, utc_timestamp
+from app.credentials import hash_password_async, verify_and_update
+from app.database import get_db, get_read_db
+from app.favorites import favorite_cache
+from app.feeds import feed_cache
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+)
+
+
+def _check_self(user_id: int, current_user: Principal) -> None:
+    if user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+
+
+@router.post("/", response_model=schemas.UserPublic)
+async def create_user(
+    user: schemas.UserCreate,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Зарегистрировать пользователя.
+    """
+    # Проверяем, существует ли пользователь с таким email или username
+    result = await db.execute(
+        select(models.User).where(
+            or_(models.User.email == user.email, models.User.username == user.username)
+        )
+    )
+    existing_user = result.scalars().first()
+
+    if existing_user:
+        detail = (
+            "Email already registered"
+            if existing_user.email == user.email
+            else "Username already taken"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail,
+        )
+
+    db_user = models.User(
+        username=user.username,
         email=user.email,
-        login=user.login,
-        password=user.password
+        full_name=user.full_name,
+        # Хэширование выполняется в пуле и не блокирует цикл событий
+        password_hash=await hash_password_async(user.password),
+    )
+
+    db.add(db_user)
+    await db.flush()
+    await db.refresh(db_user)
+    await db.commit()
+
+    return db_user
+
+
+@router.post("/login", response_model=schemas.Token)
+async def login_user(
+    credentials: schemas.UserLogin,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Проверить логин и пароль и выдать токен доступа.
+
+    Если хэш посчитан с устаревшими параметрами, он пересчитывается
+    и сохраняется.
+    """
+    result = await db.execute(
+        select(models.User).where(models.User.username == credentials.username)
+    )
+    db_user = result.scalar_one_or_none()
+
+    if not db_user or not db_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid username or password",
+        )
+
+    valid, new_hash = await verify_and_update(credentials.password, db_user.password_hash)
+
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid username or password",
+        )
+
+    if new_hash is not None:
+        db_user.password_hash = new_hash
+        await db.commit()
+
+    return schemas.Token(
+        access_token=create_access_token(db_user.id),
+        expires_in=ACCESS_TOKEN_TTL_SECONDS,
+    )
+
+
+@router.get("/me", response_model=schemas.UserPublic)
+async def get_me(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Получить профиль текущего пользователя.
+    """
+    db_user = await db.get(models.User, current_user.id)
+
+    # Пользователь удален в другом процессе, а его запись еще в кэше
+    if not db_user:
+        principal_cache.invalidate(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return db_user
+
+
+@router.get("/", response_model=List[schemas.UserPublic])
+async def get_users(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить список пользователей.
+
+    ?ids=3,1,2 - пользователи с этими id одним запросом, в порядке
+    запроса; отсутствующие id перечисляются в заголовке X-Missing-Ids.
+    """
+    missing: List[int] = []
+    if ids is not None:
+        wanted = parse_ids(ids)
+        result = await db.execute(select(models.User).where(models.User.id.in_(wanted)))
+        users, missing = pick_by_ids(wanted, {u.id: u for u in result.scalars().all()})
+    else:
+        result = await db.execute(
+            select(models.User).order_by(models.User.id).offset(skip).limit(limit)
+        )
+        users = result.scalars().all()
+
+    # skip/limit к ?ids= не применяются и в ETag не входят
+    page = (ids,) if ids is not None else (skip, limit)
+    etag = make_etag("users", *page, *[(u.id, u.updated_at) for u in users])
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_validators(response, etag)
+    set_missing_ids(response, missing)
+
+    return users
+
+
+@router.get("/{user_id}", response_model=schemas.UserPublic)
+async def get_user(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Получить пользователя по ID.
+    """
+    db_user = await db.get(models.User, user_id)
+
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    etag = make_etag("user", db_user.id, db_user.updated_at)
+    last_modified = utc_timestamp(db_user.updated_at)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+
+    return db_user
+
+
+@router.put("/{user_id}", response_model=schemas.UserPublic)
+async def update_user(
+    user_id: int,
+    user_update: schemas.UserUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Обновить профиль пользователя.
+    """
+    _check_self(user_id, current_user)
+
+    db_user = await db.get(models.User, user_id)
+
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    # Обновляем поля
+    for field, value in user_update.model_dump(exclude_unset=True).items():
+        setattr(db_user, field, value)
+
+    await db.flush()
+    await db.refresh(db_user)
+    await db.commit()
+
+    # Смена is_active и профиля должна сразу отражаться в аутентификации
+    principal_cache.invalidate(user_id)
+
+    return db_user
+
+
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_user(
+    user_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Удалить пользователя вместе с его постами и комментариями.
+    """
+    _check_self(user_id, current_user)
+
+    db_user = await db.get(models.User, user_id)
+
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    # Подписки удаляются каскадом - корректируем счетчики других пользователей
+    await db.execute(
+        update(models.User)
+        .where(
+            models.User.id.in_(
+                select(models.Subscription.subscribed_to_id)
+                .where(models.Subscription.subscriber_id == user_id)
+            )
+        )
+        .values(followers_count=models.User.followers_count - 1)
+    )
+    await db.execute(
+        update(models.User)
+        .where(
+            models.User.id.in_(
+                select(models.Subscription.subscriber_id)
+                .where(models.Subscription.subscribed_to_id == user_id)
+            )
+        )
+        .values(following_count=models.User.following_count - 1)
     )
-    
-    db.users[new_user.id] = new_user
-    db.next_user_id += 1
-    db.save_data()
-    
-    return new_user
-
-@router.get("/", response_model=list[UserResponse])
-async def get_users():
-    return list(db.users.values())
-
-@router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int):
-    if user_id not in db.users:
-        raise HTTPException(status_code=404, detail="User not found")
-    return db.users[user_id]
-
-@router.put("/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user: UserCreate):
-    if user_id not in db.users:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Проверяем уникальность email и логина
-    for existing_user in db.users.values():
-        if existing_user.id != user_id:
-            if existing_user.email == user.email:
-                raise HTTPException(status_code=400, detail="Email already registered")
-            if existing_user.login == user.login:
-                raise HTTPException(status_code=400, detail="Login already taken")
-    
-    db.users[user_id].email = user.email
-    db.users[user_id].login = user.login
-    db.users[user_id].password = user.password
-    db.users[user_id].updatedAt = datetime.now()
-    db.save_data()
-    
-    return db.users[user_id]
-
-@router.delete("/{user_id}")
-async def delete_user(user_id: int):
-    if user_id not in db.users:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Удаляем также все посты пользователя
-    posts_to_delete = [post_id for post_id, post in db.posts.items() if post.authorId == user_id]
-    for post_id in posts_to_delete:
-        del db.posts[post_id]
-    
-    del db.users[user_id]
-    db.save_data()
-    
-    return {"message": "User deleted successfully"}
\ No newline at end of file
+
+    await db.delete(db_user)
+    await db.commit()
+
+    principal_cache.invalidate(user_id)
+    # Вместе с постами пользователя удалено и чужое избранное на них
+    favorite_cache.clear()
+    # Посты удалены каскадом, без событий по каждому - ленты собираются заново
+    feed_cache.clear()
+
+    return None
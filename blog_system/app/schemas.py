@@ -27,10 +27,22 @@ class UserCreate(UserBase):
         return v
 
 
+class UserLogin(BaseSchema):
+    username: str
+    password: str
+
+
 class UserUpdate(BaseSchema):
     full_name: Optional[str] = None
     bio: Optional[str] = None
     profile_picture: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class Token(BaseSchema):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
 
 
 class UserInDB(UserBase):
@@ -40,6 +52,8 @@ class UserInDB(UserBase):
     created_at: datetime
     updated_at: datetime
     is_active: bool
+    followers_count: int = 0
+    following_count: int = 0
 
 
 class UserPublic(UserInDB):
@@ -73,6 +87,7 @@ class PostBase(BaseSchema):
 
 class PostCreate(PostBase):
     category_ids: List[int] = []
+    published_at: Optional[datetime] = None
 
 
 class PostUpdate(BaseSchema):
@@ -83,17 +98,60 @@ class PostUpdate(BaseSchema):
     featured_image: Optional[str] = None
     category_ids: Optional[List[int]] = None
 
+    @validator('title', 'content')
+    def not_null(cls, v):
+        # Поля можно не передавать, но не обнулять: в БД они NOT NULL
+        if v is None:
+            raise ValueError('Field cannot be null')
+        return v
+
+
+class PostStatusUpdate(BaseSchema):
+    status: str
+    published_at: Optional[datetime] = None
+
 
 class PostInDB(PostBase):
     id: int
     user_id: int
     slug: str
+    content_html: Optional[str] = None
+    word_count: int = 0
+    reading_time: int = 0
+    created_at: datetime
+    updated_at: datetime
+    published_at: Optional[datetime] = None
+    view_count: int = 0
+
+
+class PostSummary(BaseSchema):
+    # Пост без текста и HTML - для списков и событий потока изменений;
+    # полное тело отдают только маршруты одного поста
+    id: int
+    user_id: int
+    title: str
+    slug: str
+    excerpt: Optional[str] = None
+    status: str = "draft"
+    featured_image: Optional[str] = None
+    word_count: int = 0
+    reading_time: int = 0
     created_at: datetime
     updated_at: datetime
     published_at: Optional[datetime] = None
     view_count: int = 0
 
 
+class PostListItem(PostSummary):
+    # Заполняется только для аутентифицированного запроса
+    is_favorited: Optional[bool] = None
+
+
+class TrendingPost(PostSummary):
+    # Затухающий счет поста в выбранном окне
+    score: float = 0.0
+
+
 class PostWithAuthor(PostInDB):
     author: UserPublic
     categories: List[CategoryInDB] = []
@@ -157,5 +215,38 @@ class SubscriptionWithUser(SubscriptionInDB):
     subscribed_to: UserPublic
 
 
+class FollowEntry(BaseSchema):
+    user: UserPublic
+    followed_at: datetime
+
+
+class FollowPage(BaseSchema):
+    items: List[FollowEntry]
+    next_cursor: Optional[str] = None
+
+
+class FollowCounts(BaseSchema):
+    user_id: int
+    followers_count: int
+    following_count: int
+
+
 # Обновляем рекурсивные типы
-CommentWithAuthor.model_rebuild()
\ No newline at end of file
+CommentWithAuthor.model_rebuild()
+
+
+# Схемы для изображений
+class ImageVariant(BaseSchema):
+    width: int
+    height: int
+    url: str
+
+
+class ImageInDB(BaseSchema):
+    # URL содержат хэш содержимого; srcset - готовое значение атрибута <img srcset>
+    hash: str
+    url: str
+    width: int
+    height: int
+    variants: List[ImageVariant] = []
+    srcset: str
@@ -0,0 +1,98 @@
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+SLUG_MAX_LENGTH = 200
+SLUG_CACHE_SIZE = int(os.getenv("SLUG_CACHE_SIZE", "10000"))
+
+_NON_WORD_RE = re.compile(r"[^\w]+|_+")
+_SUFFIX_RE = re.compile(r"^(?P<base>.+)-(?P<n>\d+)$")
+
+
+def slugify(value: str, max_length: int = SLUG_MAX_LENGTH) -> str:
+    """
+    Построить slug из произвольной строки.
+
+    Кириллица и другие буквы сохраняются, все остальное схлопывается в дефисы.
+    """
+    value = unicodedata.normalize("NFKC", value).lower()
+    slug = _NON_WORD_RE.sub("-", value).strip("-")
+    slug = slug[:max_length].rstrip("-")
+    return slug or "post"
+
+
+def unique_slug(base: str, taken: Iterable[str], max_length: int = SLUG_MAX_LENGTH) -> str:
+    """
+    Подобрать свободный slug: base, base-2, base-3, ...
+
+    `taken` - уже занятые slug'и с тем же префиксом (у того же автора).
+    """
+    taken = set(taken)
+    if base not in taken:
+        return base
+
+    used_suffixes = set()
+    for slug in taken:
+        match = _SUFFIX_RE.match(slug)
+        if match and match.group("base") == base:
+            used_suffixes.add(int(match.group("n")))
+
+    n = 2
+    while n in used_suffixes:
+        n += 1
+
+    suffix = f"-{n}"
+    return base[: max_length - len(suffix)].rstrip("-") + suffix
+
+
+class SlugCache:
+    """
+    LRU-кэш соответствия (username автора, slug) -> id поста.
+
+    Живет в памяти процесса; при переименовании поста или автора
+    соответствующие записи нужно инвалидировать.
+    """
+
+    def __init__(self, maxsize: int = SLUG_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, author: str, slug: str) -> Optional[int]:
+        key = (author, slug)
+        post_id = self._data.get(key)
+        if post_id is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return post_id
+
+    def set(self, author: str, slug: str, post_id: int) -> None:
+        if self.maxsize <= 0:
+            return
+        key = (author, slug)
+        self._data[key] = post_id
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, author: str, slug: str) -> None:
+        self._data.pop((author, slug), None)
+
+    def invalidate_author(self, author: str) -> None:
+        for key in [key for key in self._data if key[0] == author]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Глобальный кэш slug'ов
+slug_cache = SlugCache()
@@ -0,0 +1,54 @@
+from collections import Counter
+from sqlalchemy import update
+from app import models
+from app.database import AsyncSessionLocal
+from app.jobs import job_queue, JobQueueFull
+from app.trending import trending
+
+# Просмотры, еще не записанные в БД: post_id -> количество
+_pending_views: Counter = Counter()
+
+
+@job_queue.job("flush_post_views")
+async def flush_post_views() -> None:
+    """
+    Записать накопленные просмотры постов одним проходом.
+    """
+    if not _pending_views:
+        return
+
+    views = dict(_pending_views)
+    _pending_views.clear()
+
+    try:
+        async with AsyncSessionLocal() as session:
+            for post_id, count in views.items():
+                await session.execute(
+                    update(models.Post)
+                    .where(models.Post.id == post_id)
+                    # Просмотры не должны сбрасывать ETag поста - updated_at сохраняем
+                    .values(
+                        view_count=models.Post.view_count + count,
+                        updated_at=models.Post.updated_at,
+                    )
+                )
+            await session.commit()
+    except Exception:
+        # Возвращаем счетчики, чтобы повторная попытка их не потеряла
+        _pending_views.update(views)
+        raise
+
+
+async def record_post_view(post_id: int) -> None:
+    """
+    Учесть просмотр поста, не задерживая ответ.
+
+    Если очередь переполнена, просмотр остается в буфере и будет
+    записан при следующем сбросе.
+    """
+    _pending_views[post_id] += 1
+    trending.record(post_id, "view")
+    try:
+        await job_queue.enqueue("flush_post_views", key="flush_post_views")
+    except JobQueueFull:
+        pass
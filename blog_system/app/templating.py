@@ -0,0 +1,62 @@
+import os
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app.profiling import span
+
+TEMPLATES_DIR = os.getenv("TEMPLATES_DIR", "templates")
+# Каталог байткод-кэша Jinja2; переживает перезапуски и общий для воркеров
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", ".jinja_cache")
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+
+
+def create_environment(
+    directory: str = TEMPLATES_DIR,
+    cache_dir: str = TEMPLATE_CACHE_DIR,
+) -> Environment:
+    """
+    Создать окружение Jinja2 с байткод-кэшем на диске.
+    """
+    bytecode_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=TEMPLATES_AUTO_RELOAD,
+        cache_size=-1,
+    )
+
+
+def precompile_templates(environment: Environment) -> int:
+    """
+    Загрузить все шаблоны: скомпилированный код попадает в кэш окружения
+    и в байткод-кэш на диске. Возвращает число шаблонов.
+    """
+    names = environment.list_templates()
+    for name in names:
+        environment.get_template(name)
+    return len(names)
+
+
+class TracedTemplates(Jinja2Templates):
+    """
+    Шаблоны с замером времени рендеринга (фаза "template" в профиле запроса).
+    """
+
+    def TemplateResponse(self, *args, **kwargs):
+        with span("template"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+# Общие для всех роутеров шаблоны
+environment = create_environment()
+templates = TracedTemplates(env=environment)
+
+
+if __name__ == "__main__":
+    # python -m app.templating - заполнить байткод-кэш до запуска сервера
+    count = precompile_templates(environment)
+    print(f"Precompiled {count} templates into {TEMPLATE_CACHE_DIR}")
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from app import models
+from app.publishing import published_posts_query
+
+logger = logging.getLogger(__name__)
+
+# Сколько соединений пула открыть заранее
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "5"))
+# Сколько последних постов прочитать при прогреве
+WARMUP_LATEST_POSTS = int(os.getenv("WARMUP_LATEST_POSTS", "20"))
+# Пути для прогревочных запросов к самому приложению
+WARMUP_PATHS = [
+    path for path in os.getenv("WARMUP_PATHS", "/,/categories/,/posts/").split(",") if path
+]
+
+
+class StartupProfile:
+    """
+    Замер времени фаз запуска приложения.
+    """
+
+    def __init__(self) -> None:
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    @property
+    def total(self) -> float:
+        return sum(duration for _, duration in self.phases)
+
+    def log(self) -> None:
+        breakdown = ", ".join(
+            f"{name}={duration * 1000:.1f}ms" for name, duration in self.phases
+        )
+        logger.info("Startup finished in %.1fms: %s", self.total * 1000, breakdown)
+
+
+async def warm_pool(engine: AsyncEngine, connections: int = WARMUP_POOL_CONNECTIONS) -> None:
+    """
+    Открыть заранее несколько соединений пула: они возвращаются в пул и
+    переиспользуются первыми запросами.
+    """
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(max(connections, 0))))
+
+
+async def preload_hot_data(
+    session_factory: async_sessionmaker,
+    latest_posts: int = WARMUP_LATEST_POSTS,
+) -> None:
+    """
+    Выполнить горячие запросы (категории, последние посты), чтобы
+    прогреть кэш компиляции SQLAlchemy и буферный кэш СУБД.
+    """
+    async with session_factory() as session:
+        await session.execute(select(models.Category).limit(100))
+        await session.execute(published_posts_query().limit(latest_posts))
+
+
+async def warmup_requests(app, paths: List[str] = WARMUP_PATHS) -> None:
+    """
+    Выполнить GET-запросы к приложению напрямую через ASGI, без сети:
+    собирается стек middleware, прогреваются валидация и сериализация.
+    """
+    for path in paths:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"warmup"), (b"user-agent", b"warmup")],
+            "client": ("127.0.0.1", 0),
+            "server": ("warmup", 80),
+        }
+        status = {}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        try:
+            await app(scope, receive, send)
+        except Exception:
+            logger.warning("Warmup request to %s failed", path, exc_info=True)
+            continue
+
+        if status.get("code", 500) >= 500:
+            logger.warning("Warmup request to %s returned %s", path, status.get("code"))
@@ -6,13 +6,20 @@ CREATE TABLE IF NOT EXISTS posts (
     slug VARCHAR(200) NOT NULL,
     content TEXT NOT NULL,
     excerpt TEXT,
+    -- Производные поля конвейера рендеринга
+    excerpt_generated BOOLEAN NOT NULL DEFAULT FALSE,
+    content_html TEXT,
+    word_count INTEGER DEFAULT 0,
+    reading_time INTEGER DEFAULT 0,
+    content_hash VARCHAR(64),
+    render_version VARCHAR(16),
     status VARCHAR(20) DEFAULT 'draft' CHECK (status IN ('draft', 'published', 'archived')),
     featured_image VARCHAR(255),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     published_at TIMESTAMP WITH TIME ZONE,
     view_count INTEGER DEFAULT 0,
-    UNIQUE(user_id, slug)
+    CONSTRAINT uq_posts_user_slug UNIQUE(user_id, slug)
 );
 
 -- Связующая таблица постов и категорий
@@ -24,6 +31,8 @@ CREATE TABLE IF NOT EXISTS post_categories (
 
 CREATE INDEX idx_posts_user_id ON posts(user_id);
 CREATE INDEX idx_posts_slug ON posts(slug);
-CREATE INDEX idx_posts_status ON posts(status);
-CREATE INDEX idx_posts_published_at ON posts(published_at);
+-- Публичная лента: только опубликованные посты, новые сверху
+CREATE INDEX idx_posts_published_feed ON posts(published_at DESC, id DESC) WHERE status = 'published';
+-- Очередь отложенной публикации
+CREATE INDEX idx_posts_scheduled ON posts(published_at) WHERE status = 'draft' AND published_at IS NOT NULL;
 CREATE INDEX idx_post_categories_category_id ON post_categories(category_id);
\ No newline at end of file
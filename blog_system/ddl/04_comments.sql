@@ -7,9 +7,14 @@ CREATE TABLE IF NOT EXISTS comments (
     content TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    is_deleted BOOLEAN DEFAULT FALSE
+    is_deleted BOOLEAN DEFAULT FALSE,
+    deleted_at TIMESTAMP WITH TIME ZONE
 );
 
 CREATE INDEX idx_comments_post_id ON comments(post_id);
 CREATE INDEX idx_comments_user_id ON comments(user_id);
-CREATE INDEX idx_comments_parent_id ON comments(parent_id);
\ No newline at end of file
+CREATE INDEX idx_comments_parent_id ON comments(parent_id);
+-- Чтение веток: только не удаленные комментарии
+CREATE INDEX idx_comments_post_live ON comments(post_id, created_at, id) WHERE is_deleted = FALSE;
+-- Очередь фоновой очистки удаленных комментариев
+CREATE INDEX idx_comments_tombstones ON comments(deleted_at) WHERE is_deleted = TRUE;
\ No newline at end of file
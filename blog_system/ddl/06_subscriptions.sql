@@ -7,5 +7,5 @@ CREATE TABLE IF NOT EXISTS subscriptions (
     CHECK (subscriber_id != subscribed_to_id)
 );
 
-CREATE INDEX idx_subscriptions_subscriber ON subscriptions(subscriber_id);
-CREATE INDEX idx_subscriptions_subscribed_to ON subscriptions(subscribed_to_id);
\ No newline at end of file
+CREATE INDEX idx_subscriptions_subscriber_created ON subscriptions(subscriber_id, created_at);
+CREATE INDEX idx_subscriptions_subscribed_to_created ON subscriptions(subscribed_to_id, created_at);
\ No newline at end of file
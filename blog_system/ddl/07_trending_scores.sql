@@ -0,0 +1,8 @@
+-- Снимок трендовых постов по окнам
+CREATE TABLE IF NOT EXISTS trending_scores (
+    "window" VARCHAR(10) NOT NULL,
+    post_id INTEGER NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+    score DOUBLE PRECISION NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY ("window", post_id)
+);
\ No newline at end of file
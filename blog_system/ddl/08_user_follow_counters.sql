@@ -0,0 +1,10 @@
+-- Счетчики подписок для уже существующей таблицы users
+-- (в новых БД колонки создает 01_users.sql, здесь они не меняются)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS followers_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS following_count INTEGER NOT NULL DEFAULT 0;
+
+-- Заполняем счетчики по существующим подпискам; updated_at не трогаем:
+-- от него зависят ETag профилей и постов
+UPDATE users u SET
+    followers_count = (SELECT COUNT(*) FROM subscriptions s WHERE s.subscribed_to_id = u.id),
+    following_count = (SELECT COUNT(*) FROM subscriptions s WHERE s.subscriber_id = u.id);
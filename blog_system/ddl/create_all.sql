@@ -5,6 +5,8 @@
 \i 04_comments.sql
 \i 05_favorites.sql
 \i 06_subscriptions.sql
+\i 07_trending_scores.sql
+\i 08_user_follow_counters.sql
 
 -- Комментарий для проверки
 SELECT 'Все таблицы успешно созданы' AS message;
\ No newline at end of file
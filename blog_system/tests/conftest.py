@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# Настройки окружения - до импорта приложения: модули читают их при импорте
+_TMP_DIR = tempfile.mkdtemp(prefix="blog-tests-")
+TEST_DB_PATH = os.path.join(_TMP_DIR, "test.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP_DIR, "jinja")
+os.environ["MEDIA_DIR"] = os.path.join(_TMP_DIR, "media")
+os.environ["WARMUP_PATHS"] = ""
+os.environ["PASSWORD_HASH_ALGORITHM"] = "pbkdf2_sha256"
+os.environ["PBKDF2_ITERATIONS"] = "1000"
+for _name in ("AUTH", "SIGNUP", "COMMENT", "WRITE", "READ"):
+    os.environ[f"RATE_LIMIT_{_name}"] = "100000/1"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.auth import principal_cache
+from app.favorites import favorite_cache
+from app.feeds import feed_cache
+from app.main import app
+from app.slugs import slug_cache
+
+
+def _reset_state() -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(TEST_DB_PATH + suffix):
+            os.remove(TEST_DB_PATH + suffix)
+    principal_cache.clear()
+    favorite_cache.clear()
+    feed_cache.clear()
+    slug_cache.clear()
+
+
+@pytest.fixture
+def client():
+    """Клиент приложения с пустой БД и пустыми кэшами процесса"""
+    _reset_state()
+    with TestClient(app) as test_client:
+        yield test_client
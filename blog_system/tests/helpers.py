@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from app.database import AsyncSessionLocal
+
+
+def run_db(client: TestClient, func, *args):
+    """
+    Выполнить async func(session, *args) в цикле событий приложения -
+    например, изменить БД в обход API, как это сделал бы другой воркер.
+    """
+    async def call():
+        async with AsyncSessionLocal() as session:
+            result = await func(session, *args)
+            await session.commit()
+            return result
+
+    return client.portal.call(call)
+
+
+def register(client: TestClient, username: str, password: str = "secret123"):
+    """Зарегистрировать пользователя и войти; возвращает (id, заголовки)"""
+    response = client.post(
+        "/users/",
+        json={"username": username, "email": f"{username}@example.com", "password": password},
+    )
+    assert response.status_code == 200, response.text
+    token = client.post("/users/login", json={"username": username, "password": password}).json()
+    return response.json()["id"], {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def create_post(client: TestClient, headers: dict, title: str, **fields):
+    payload = {"title": title, "content": f"Text of {title}", "status": "published", **fields}
+    response = client.post("/posts/", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
@@ -0,0 +1,88 @@
+from sqlalchemy import delete, update
+import time
+from app import models
+from app.auth import principal_cache
+from app.instrumentation import assert_max_queries
+from tests.helpers import register, run_db
+
+
+SHORT_TTL = 0.2
+
+
+async def _deactivate(session, user_id):
+    await session.execute(update(models.User).where(models.User.id == user_id).values(is_active=False))
+
+
+async def _delete(session, user_id):
+    await session.execute(delete(models.User).where(models.User.id == user_id))
+
+
+def test_cached_principal_needs_no_queries(client):
+    _, headers = register(client, "alice")
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    # Пользователь в кэше: остается только запрос профиля в самом обработчике
+    with assert_max_queries(1):
+        assert client.get("/users/me", headers=headers).status_code == 200
+
+
+def test_deactivation_revokes_access_immediately(client):
+    user_id, headers = register(client, "alice")
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    response = client.put(f"/users/{user_id}", json={"is_active": False}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_deletion_revokes_access_immediately(client):
+    user_id, headers = register(client, "alice")
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    assert client.delete(f"/users/{user_id}", headers=headers).status_code == 204
+
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_deactivation_elsewhere_revoked_within_ttl(client, monkeypatch):
+    monkeypatch.setattr(principal_cache, "ttl", SHORT_TTL)
+    user_id, headers = register(client, "alice")
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    # Другой воркер деактивировал пользователя - наш кэш об этом не знает
+    run_db(client, _deactivate, user_id)
+    assert client.get("/favorites/", headers=headers).status_code == 200
+
+    time.sleep(SHORT_TTL)
+    assert client.get("/favorites/", headers=headers).status_code == 401
+
+
+def test_deletion_elsewhere_revoked_within_ttl(client, monkeypatch):
+    monkeypatch.setattr(principal_cache, "ttl", SHORT_TTL)
+    user_id, headers = register(client, "alice")
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    run_db(client, _delete, user_id)
+    assert client.get("/favorites/", headers=headers).status_code == 200
+
+    time.sleep(SHORT_TTL)
+    assert client.get("/favorites/", headers=headers).status_code == 401
+
+
+def test_me_for_user_deleted_elsewhere_is_unauthorized(client):
+    user_id, headers = register(client, "alice")
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    run_db(client, _delete, user_id)
+
+    assert client.get("/users/me", headers=headers).status_code == 401
+    # Запись выброшена из кэша - следующий запрос тоже отклоняется
+    assert principal_cache.get(user_id) is None
+    assert client.get("/favorites/", headers=headers).status_code == 401
+
+
+def test_tampered_token_is_rejected(client):
+    _, headers = register(client, "alice")
+    headers = {"Authorization": headers["Authorization"][:-2] + "xx"}
+    assert client.get("/users/me", headers=headers).status_code == 401
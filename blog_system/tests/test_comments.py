@@ -0,0 +1,32 @@
+from app.events import hub
+from tests.helpers import create_post, register
+
+
+def _comment(client, headers, post_id):
+    response = client.post(
+        "/comments/",
+        params={"post_id": post_id},
+        json={"content": "Hi"},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_comment_events_only_for_published_posts(client, monkeypatch):
+    _, headers = register(client, "alice")
+    draft = create_post(client, headers, "Draft", status="draft")
+    published = create_post(client, headers, "Published")
+
+    events = []
+    monkeypatch.setattr(hub, "publish", lambda type, data, **kwargs: events.append((type, data)))
+
+    for post in (draft, published):
+        comment_id = _comment(client, headers, post["id"])
+        response = client.put(f"/comments/{comment_id}", json={"content": "Edited"}, headers=headers)
+        assert response.status_code == 200, response.text
+        response = client.delete(f"/comments/{comment_id}", headers=headers)
+        assert response.status_code == 204, response.text
+
+    assert [type for type, _ in events] == ["comment.created", "comment.updated", "comment.deleted"]
+    assert all(data["post_id"] == published["id"] for _, data in events)
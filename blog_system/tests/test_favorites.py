@@ -0,0 +1,46 @@
+import time
+from sqlalchemy import insert
+from app import models
+from app.favorites import favorite_cache
+from tests.helpers import create_post, register, run_db
+
+
+SHORT_TTL = 0.2
+
+
+def _check(client, headers, post_id):
+    response = client.get("/favorites/check", params={"post_ids": [post_id]}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()[str(post_id)]
+
+
+async def _favorite(session, user_id, post_id):
+    await session.execute(insert(models.Favorite).values(user_id=user_id, post_id=post_id))
+
+
+def test_deleted_post_id_is_not_favorited_after_reuse(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+    assert client.post("/favorites/", json={"post_id": post["id"]}, headers=headers).status_code == 201
+    assert _check(client, headers, post["id"]) is True
+
+    assert client.delete(f"/posts/{post['id']}", headers=headers).status_code == 204
+
+    # SQLite может выдать новому посту тот же id
+    reused = create_post(client, headers, "Second")
+    assert reused["id"] == post["id"]
+    assert _check(client, headers, reused["id"]) is False
+
+
+def test_favorites_changed_elsewhere_are_seen_after_ttl(client, monkeypatch):
+    monkeypatch.setattr(favorite_cache, "ttl", SHORT_TTL)
+    user_id, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+    assert _check(client, headers, post["id"]) is False
+
+    # Избранное добавлено другим воркером: до истечения TTL виден кэш
+    run_db(client, _favorite, user_id, post["id"])
+    assert _check(client, headers, post["id"]) is False
+
+    time.sleep(SHORT_TTL * 1.5)
+    assert _check(client, headers, post["id"]) is True
@@ -0,0 +1,39 @@
+from app.feeds import FeedCache, feed_cache
+from tests.helpers import create_post, register
+
+
+def test_sitemap_shards_outside_index_are_not_found(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+
+    assert "/sitemap-0.xml" in client.get("/sitemap.xml").text
+    response = client.get("/sitemap-0.xml")
+    assert response.status_code == 200
+    assert post["slug"] in response.text
+
+    for shard in (1, 10**9, -1):
+        assert client.get(f"/sitemap-{shard}.xml").status_code == 404
+    assert feed_cache.metrics()["documents"] == 2
+
+
+def test_empty_sitemap_shard_is_not_cached(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+    assert client.get("/sitemap.xml").status_code == 200
+
+    response = client.patch(f"/posts/{post['id']}/status", json={"status": "draft"}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = client.get("/sitemap-0.xml")
+    assert response.status_code == 200
+    assert "<url>" not in response.text
+    assert feed_cache.get(("sitemap", 0)) is None
+
+
+def test_feed_entries_are_bounded():
+    cache = FeedCache(max_entries=2)
+    for post_id in range(1, 4):
+        cache.set_entry(post_id, "xml", (post_id,), f"<item>{post_id}</item>")
+    assert cache.metrics()["entries"] == 2
+    assert cache.entry(1, "xml", (1,)) is None
+    assert cache.entry(3, "xml", (3,)) == "<item>3</item>"
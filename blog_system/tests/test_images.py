@@ -0,0 +1,71 @@
+import io
+import json
+import os
+from PIL import Image
+from app.images import describe, process_image
+
+
+def _jpeg_with_gps() -> bytes:
+    image = Image.new("RGB", (800, 400), (200, 40, 40))
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    exif[0x0112] = 6  # повернуть на 90 градусов
+    exif.get_ifd(0x8825)[2] = (55.0, 45.0, 0.0)  # GPSLatitude
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif, comment=b"secret")
+    return buffer.getvalue()
+
+
+def _process(tmp_path, data, extension):
+    return process_image(data, str(tmp_path), "abc123", extension, [320], "webp", 80)
+
+
+def test_published_original_has_no_metadata(tmp_path):
+    manifest = _process(tmp_path, _jpeg_with_gps(), "jpg")
+
+    with Image.open(os.path.join(tmp_path, manifest["original"])) as original:
+        assert not original.getexif()
+        assert "exif" not in original.info
+        assert "comment" not in original.info
+        # Ориентация применена к пикселям
+        assert original.size == (400, 800)
+
+    for variant in manifest["variants"]:
+        with Image.open(os.path.join(tmp_path, variant["file"])) as image:
+            assert not image.getexif()
+
+
+def test_srcset_lists_only_reencoded_files(tmp_path):
+    data = _jpeg_with_gps()
+    manifest = _process(tmp_path, data, "jpg")
+    with open(os.path.join(tmp_path, "manifest.json")) as f:
+        assert json.load(f) == manifest
+
+    files = {name: open(os.path.join(tmp_path, name), "rb").read() for name in os.listdir(tmp_path)}
+    assert data not in files.values()
+    assert describe(manifest)["srcset"].count(",") == len(manifest["variants"])
+
+
+def test_animated_gif_keeps_frames(tmp_path):
+    frames = [Image.new("RGB", (64, 64), color) for color in ((255, 0, 0), (0, 255, 0), (0, 0, 255))]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=50, loop=0, comment=b"x")
+    manifest = _process(tmp_path, buffer.getvalue(), "gif")
+
+    with Image.open(os.path.join(tmp_path, manifest["original"])) as original:
+        assert original.n_frames == 3
+        assert "comment" not in original.info
+
+
+def test_files_from_older_version_are_reprocessed(tmp_path, monkeypatch):
+    from app import images
+
+    monkeypatch.setattr(images, "MEDIA_DIR", str(tmp_path))
+    directory = images._directory("abc123")
+    os.makedirs(directory)
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump({"hash": "abc123", "original": "original.jpg", "variants": []}, f)
+    assert images._load_manifest("abc123") is None
+
+    _process(directory, _jpeg_with_gps(), "jpg")
+    assert images._load_manifest("abc123")["hash"] == "abc123"
@@ -0,0 +1,107 @@
+import time
+from tests.helpers import create_post, register
+
+
+def _category(client, name):
+    response = client.post("/categories/", json={"name": name})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _revalidate(client, post_id, etag):
+    return client.get(f"/posts/{post_id}", headers={"If-None-Match": etag})
+
+
+def test_post_etag_matches_on_validator_fast_path(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First", category_ids=[_category(client, "News")])
+
+    etag = client.get(f"/posts/{post['id']}").headers["etag"]
+    assert _revalidate(client, post["id"], etag).status_code == 304
+
+
+def test_post_etag_changes_when_category_is_edited(client):
+    _, headers = register(client, "alice")
+    category_id = _category(client, "News")
+    post = create_post(client, headers, "First", category_ids=[category_id])
+    etag = client.get(f"/posts/{post['id']}").headers["etag"]
+
+    response = client.put(f"/categories/{category_id}", json={"name": "World news"})
+    assert response.status_code == 200, response.text
+
+    response = _revalidate(client, post["id"], etag)
+    assert response.status_code == 200
+    assert response.json()["categories"][0]["name"] == "World news"
+
+
+def test_post_etag_changes_when_author_is_edited(client):
+    user_id, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+    etag = client.get(f"/posts/{post['id']}").headers["etag"]
+
+    # updated_at в SQLite хранится с точностью до секунды
+    time.sleep(1.1)
+    response = client.put(f"/users/{user_id}", json={"bio": "Hello"}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = _revalidate(client, post["id"], etag)
+    assert response.status_code == 200
+    assert response.json()["author"]["bio"] == "Hello"
+
+
+def test_update_rejects_null_title_and_content(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+
+    for field in ("title", "content"):
+        response = client.put(f"/posts/{post['id']}", json={field: None}, headers=headers)
+        assert response.status_code == 422, response.text
+
+    # Явный null допустим для необязательных полей
+    response = client.put(f"/posts/{post['id']}", json={"excerpt": None}, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_html_pages_render_published_posts(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First", content="Some *bold* text")
+    create_post(client, headers, "Hidden draft", status="draft")
+
+    response = client.get("/posts/html/")
+    assert response.status_code == 200
+    assert "First" in response.text
+    assert "Hidden draft" not in response.text
+
+    response = client.get(f"/posts/html/{post['id']}")
+    assert response.status_code == 200
+    assert "alice" in response.text
+    assert "<em>bold</em>" in response.text or "<strong>bold</strong>" in response.text
+
+    assert client.get("/posts/html/999999").status_code == 404
+
+
+def test_list_returns_summaries_and_single_post_full_body(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+
+    for url in ("/posts/", f"/posts/?ids={post['id']}"):
+        item = client.get(url).json()[0]
+        assert item["title"] == "First"
+        assert "content" not in item and "content_html" not in item
+
+    full = client.get(f"/posts/{post['id']}").json()
+    assert full["content"] == "Text of First"
+    assert full["content_html"]
+
+
+def test_batch_etag_ignores_skip_and_limit(client):
+    _, headers = register(client, "alice")
+    post = create_post(client, headers, "First")
+
+    etag = client.get("/posts/", params={"ids": post["id"]}).headers["etag"]
+    response = client.get(
+        "/posts/",
+        params={"ids": post["id"], "skip": 5, "limit": 1},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
@@ -0,0 +1,47 @@
+from datetime import timedelta
+from sqlalchemy import select, update
+from app import models
+from app.publishing import utcnow
+from app.purging import purge_comment_tombstones
+from tests.helpers import create_post, register, run_db
+
+
+def _comment(client, headers, post_id, parent_id=None):
+    response = client.post(
+        "/comments/",
+        params={"post_id": post_id},
+        json={"content": "Hi", "parent_id": parent_id},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+async def _mark_legacy_deleted(session, comment_id):
+    # Строка, удаленная до появления deleted_at
+    await session.execute(
+        update(models.Comment)
+        .where(models.Comment.id == comment_id)
+        .values(is_deleted=True, deleted_at=None)
+    )
+
+
+async def _comment_ids(session):
+    return set((await session.execute(select(models.Comment.id))).scalars().all())
+
+
+def test_legacy_tombstones_are_purged_after_retention(client):
+    _, headers = register(client, "alice")
+    post_id = create_post(client, headers, "First")["id"]
+    root = _comment(client, headers, post_id)
+    reply = _comment(client, headers, post_id, parent_id=root)
+    other = _comment(client, headers, post_id)
+    run_db(client, _mark_legacy_deleted, root)
+
+    now = utcnow()
+    assert run_db(client, purge_comment_tombstones, 500, 20, 3600, now) == 0
+    assert run_db(client, _comment_ids) == {root, reply, other}
+
+    later = now + timedelta(seconds=3601)
+    assert run_db(client, purge_comment_tombstones, 500, 20, 3600, later) == 2
+    assert run_db(client, _comment_ids) == {other}
@@ -0,0 +1,83 @@
+import pytest
+from app.instrumentation import assert_max_queries
+from tests.helpers import create_post, register
+
+
+async def _no_view(post_id):
+    pass
+
+
+@pytest.fixture
+def blog(client, monkeypatch):
+    # Просмотры записываются фоновой задачей, а не запросом - не считаем их
+    monkeypatch.setattr("app.routes.posts.record_post_view", _no_view)
+    authors = [register(client, f"author{i}") for i in range(3)]
+    categories = [client.post("/categories/", json={"name": f"Category {i}"}).json()["id"] for i in range(4)]
+    posts = [
+        create_post(client, headers, f"Post {i}", category_ids=categories[: i % 4 + 1])
+        for i, (_, headers) in enumerate(authors * 4)
+    ]
+    # Ветка комментариев от разных авторов с ответами
+    post_id = posts[0]["id"]
+    for _, headers in authors * 3:
+        root = client.post("/comments/", params={"post_id": post_id}, json={"content": "Root"}, headers=headers)
+        assert root.status_code == 200, root.text
+        reply = {"content": "Reply", "parent_id": root.json()["id"]}
+        assert client.post("/comments/", params={"post_id": post_id}, json=reply, headers=headers).status_code == 200
+    return {"authors": authors, "categories": categories, "posts": posts}
+
+
+def test_comment_thread_query_budget(client, blog):
+    post_id = blog["posts"][0]["id"]
+    # Состояние ветки + вся ветка с авторами, независимо от ее размера
+    with assert_max_queries(2):
+        response = client.get(f"/comments/post/{post_id}")
+    assert response.status_code == 200
+    assert len(response.json()) == 9
+
+    with assert_max_queries(1):
+        response = client.get(f"/comments/post/{post_id}", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+
+def test_post_list_query_budget(client, blog):
+    with assert_max_queries(1):
+        response = client.get("/posts/")
+    assert len(response.json()) == len(blog["posts"])
+
+    # Отметки избранного - один запрос на страницу, дальше из кэша
+    _, headers = blog["authors"][0]
+    with assert_max_queries(2):
+        assert client.get("/posts/", headers=headers).status_code == 200
+    with assert_max_queries(1):
+        assert client.get("/posts/", headers=headers).status_code == 200
+
+    ids = ",".join(str(post["id"]) for post in blog["posts"])
+    with assert_max_queries(1):
+        response = client.get("/posts/", params={"ids": ids})
+    assert len(response.json()) == len(blog["posts"])
+
+
+def test_post_detail_query_budget(client, blog):
+    post_id = blog["posts"][-1]["id"]
+    # Пост с автором + категории
+    with assert_max_queries(2):
+        response = client.get(f"/posts/{post_id}")
+    assert len(response.json()["categories"]) == 4
+
+    with assert_max_queries(1):
+        response = client.get(f"/posts/{post_id}", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+
+def test_category_query_budget(client, blog):
+    with assert_max_queries(1):
+        response = client.get("/categories/")
+    assert len(response.json()) == len(blog["categories"])
+
+    ids = ",".join(str(category_id) for category_id in blog["categories"])
+    with assert_max_queries(1):
+        assert len(client.get("/categories/", params={"ids": ids}).json()) == len(blog["categories"])
+
+    with assert_max_queries(1):
+        assert client.get(f"/categories/{blog['categories'][0]}").status_code == 200
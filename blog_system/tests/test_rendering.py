@@ -0,0 +1,22 @@
+from app.rendering import _builtin_html
+
+
+def test_emphasis_does_not_leak_into_link_href():
+    assert _builtin_html("[x](http://a.com/*b*)") == '<p><a href="http://a.com/*b*" rel="nofollow">x</a></p>'
+    assert _builtin_html("**[a](http://x/**y)") == '<p>**<a href="http://x/**y" rel="nofollow">a</a></p>'
+
+
+def test_emphasis_applies_inside_and_around_links():
+    assert _builtin_html("**see [the *docs*](http://x/_a_)**") == (
+        '<p><strong>see <a href="http://x/_a_" rel="nofollow">the <em>docs</em></a></strong></p>'
+    )
+
+
+def test_code_spans_inside_link_labels_are_kept():
+    assert _builtin_html("[`a*b`](http://x) *c*") == (
+        '<p><a href="http://x" rel="nofollow"><code>a*b</code></a> <em>c</em></p>'
+    )
+
+
+def test_unsafe_link_is_rendered_as_text():
+    assert _builtin_html("[click](javascript:alert)") == "<p>click</p>"
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import pytest
+from sqlalchemy import text
+from app import database
+from app.database import READ_YOUR_WRITES_COOKIE, Base, ReplicaSet
+
+
+def _replica_urls(tmp_path, names):
+    return [f"sqlite+aiosqlite:///{tmp_path / f'{name}.db'}" for name in names]
+
+
+async def _label_replicas(replicas, names):
+    # Каждая "реплика" - отдельный файл SQLite со своей меткой
+    for replica_engine, name in zip(replicas.engines, names):
+        async with replica_engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE replica (name TEXT)"))
+            await conn.execute(text("INSERT INTO replica VALUES (:name)"), {"name": name})
+
+
+async def _read_label(replicas):
+    async with replicas.session() as session:
+        return await session.scalar(text("SELECT name FROM replica"))
+
+
+def test_round_robin_alternates_replicas(tmp_path):
+    names = ["a", "b", "c"]
+
+    async def scenario():
+        replicas = ReplicaSet(_replica_urls(tmp_path, names), "round_robin")
+        try:
+            await _label_replicas(replicas, names)
+            return [await _read_label(replicas) for _ in range(6)]
+        finally:
+            await replicas.dispose()
+
+    assert asyncio.run(scenario()) == ["a", "b", "c", "a", "b", "c"]
+
+
+def test_least_connections_avoids_busy_replica(tmp_path):
+    names = ["a", "b"]
+
+    async def scenario():
+        replicas = ReplicaSet(_replica_urls(tmp_path, names), "least_connections")
+        try:
+            await _label_replicas(replicas, names)
+            labels = []
+            async with replicas.session() as held:
+                # Пока сессия на "a" открыта, все чтения идут на "b"
+                labels.append(await held.scalar(text("SELECT name FROM replica")))
+                labels += [await _read_label(replicas) for _ in range(2)]
+                assert replicas.in_use == [1, 0]
+            labels.append(await _read_label(replicas))
+            return labels
+        finally:
+            await replicas.dispose()
+
+    assert asyncio.run(scenario()) == ["a", "b", "b", "a"]
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ReplicaSet([], "random")
+
+
+@pytest.fixture
+def lagging_replica(client, tmp_path, monkeypatch):
+    """
+    Реплика, которая не получает записи основного сервера: пустая БД
+    с той же схемой.
+    """
+    replicas = ReplicaSet(_replica_urls(tmp_path, ["replica"]))
+
+    async def create_schema():
+        async with replicas.engines[0].begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    client.portal.call(create_schema)
+    monkeypatch.setattr(database, "replicas", replicas)
+    yield replicas
+    client.portal.call(replicas.dispose)
+
+
+def _category_names(client):
+    response = client.get("/categories/")
+    assert response.status_code == 200
+    return [category["name"] for category in response.json()]
+
+
+def test_writer_reads_own_writes_from_primary(client, lagging_replica):
+    response = client.post("/categories/", json={"name": "News"})
+    assert response.status_code == 200, response.text
+    assert float(response.cookies[READ_YOUR_WRITES_COOKIE]) > time.time()
+
+    # Клиент с cookie читает с основного сервера
+    assert _category_names(client) == ["News"]
+
+    # Без cookie - с реплики, которая запись еще не получила
+    client.cookies.clear()
+    assert _category_names(client) == []
+
+
+def test_expired_read_your_writes_cookie_reads_replica(client, lagging_replica):
+    assert client.post("/categories/", json={"name": "News"}).status_code == 200
+
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, str(time.time() - 1))
+    assert _category_names(client) == []
+
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, "not-a-number")
+    assert _category_names(client) == []
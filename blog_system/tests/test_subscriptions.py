@@ -0,0 +1,60 @@
+import time
+from tests.helpers import register
+
+
+def _followers(client, user_id, **params):
+    response = client.get(f"/subscriptions/followers/{user_id}", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_followers_cursor_survives_unfollow(client):
+    author_id, _ = register(client, "author")
+    followers = []
+    for i in range(5):
+        follower_id, headers = register(client, f"reader{i}")
+        response = client.post("/subscriptions/", json={"subscribed_to_id": author_id}, headers=headers)
+        assert response.status_code == 201, response.text
+        followers.append((follower_id, headers))
+
+    first = _followers(client, author_id, limit=2)
+    assert len(first["items"]) == 2
+
+    # Последний на странице отписался - курсор не зависит от его строки
+    last_id = first["items"][-1]["user"]["id"]
+    headers = dict(followers)[last_id]
+    assert client.delete(f"/subscriptions/{author_id}", headers=headers).status_code == 204
+
+    seen = [item["user"]["id"] for item in first["items"]]
+    cursor = first["next_cursor"]
+    for _ in range(len(followers)):
+        if not cursor:
+            break
+        page = _followers(client, author_id, limit=2, cursor=cursor)
+        seen += [item["user"]["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+
+    assert sorted(seen) == sorted(follower_id for follower_id, _ in followers)
+
+
+def test_invalid_cursor_is_rejected(client):
+    author_id, _ = register(client, "author")
+    response = client.get(f"/subscriptions/followers/{author_id}", params={"cursor": "bm90LWEtY3Vyc29y"})
+    assert response.status_code == 400
+
+
+def test_follow_updates_counters_but_not_updated_at(client):
+    author_id, _ = register(client, "author")
+    reader_id, headers = register(client, "reader")
+    before = {user_id: client.get(f"/users/{user_id}").json() for user_id in (author_id, reader_id)}
+
+    # updated_at в SQLite хранится с точностью до секунды
+    time.sleep(1.1)
+    response = client.post("/subscriptions/", json={"subscribed_to_id": author_id}, headers=headers)
+    assert response.status_code == 201, response.text
+
+    author = client.get(f"/users/{author_id}").json()
+    reader = client.get(f"/users/{reader_id}").json()
+    assert (author["followers_count"], reader["following_count"]) == (1, 1)
+    assert author["updated_at"] == before[author_id]["updated_at"]
+    assert reader["updated_at"] == before[reader_id]["updated_at"]
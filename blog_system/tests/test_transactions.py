@@ -0,0 +1,82 @@
+import pytest
+from app.instrumentation import assert_max_transactions
+from tests.helpers import create_post, register
+
+
+async def _no_view(post_id):
+    pass
+
+
+@pytest.fixture
+def blog(client, monkeypatch):
+    # Просмотры записываются фоновой задачей в своей транзакции - не считаем их
+    monkeypatch.setattr("app.routes.posts.record_post_view", _no_view)
+    author_id, author = register(client, "alice")
+    _, reader = register(client, "bob")
+    category_id = client.post("/categories/", json={"name": "News"}).json()["id"]
+    post = create_post(client, author, "First", category_ids=[category_id])
+    comment = client.post("/comments/", params={"post_id": post["id"]}, json={"content": "Hi"}, headers=author)
+    assert client.post("/favorites/", json={"post_id": post["id"]}, headers=reader).status_code == 201
+    assert client.post("/subscriptions/", json={"subscribed_to_id": author_id}, headers=reader).status_code == 201
+    return {
+        "author_id": author_id,
+        "author": author,
+        "reader": reader,
+        "category_id": category_id,
+        "post": post,
+        "comment_id": comment.json()["id"],
+    }
+
+
+def _get_routes(blog):
+    post = blog["post"]
+    return [
+        ("/posts/", None),
+        (f"/posts/{post['id']}", None),
+        (f"/posts/by-slug/alice/{post['slug']}", None),
+        ("/posts/trending", None),
+        (f"/comments/post/{post['id']}", None),
+        ("/categories/", None),
+        (f"/categories/{blog['category_id']}", None),
+        ("/users/me", blog["author"]),
+        (f"/users/{blog['author_id']}", None),
+        ("/favorites/", blog["reader"]),
+        (f"/subscriptions/followers/{blog['author_id']}", None),
+        ("/feed.xml", None),
+        ("/sitemap.xml", None),
+    ]
+
+
+def test_get_routes_open_no_transactions(client, blog):
+    for path, headers in _get_routes(blog):
+        with assert_max_transactions(0):
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200, (path, response.text)
+
+
+def _write_routes(client, blog):
+    post_id = blog["post"]["id"]
+    author, reader = blog["author"], blog["reader"]
+    return [
+        lambda: client.post("/categories/", json={"name": "World"}),
+        lambda: client.put(f"/categories/{blog['category_id']}", json={"name": "Local"}),
+        lambda: client.post("/posts/", json={"title": "Second", "content": "Text"}, headers=author),
+        lambda: client.put(f"/posts/{post_id}", json={"title": "Renamed"}, headers=author),
+        lambda: client.patch(f"/posts/{post_id}/status", json={"status": "archived"}, headers=author),
+        lambda: client.post("/comments/", params={"post_id": post_id}, json={"content": "More"}, headers=author),
+        lambda: client.put(f"/comments/{blog['comment_id']}", json={"content": "Edited"}, headers=author),
+        lambda: client.delete(f"/comments/{blog['comment_id']}", headers=author),
+        lambda: client.delete(f"/favorites/{post_id}", headers=reader),
+        lambda: client.post("/favorites/", json={"post_id": post_id}, headers=reader),
+        lambda: client.delete(f"/subscriptions/{blog['author_id']}", headers=reader),
+        lambda: client.post("/subscriptions/", json={"subscribed_to_id": blog["author_id"]}, headers=reader),
+        lambda: client.put(f"/users/{blog['author_id']}", json={"bio": "Hello"}, headers=author),
+    ]
+
+
+def test_write_routes_commit_once(client, blog):
+    for call in _write_routes(client, blog):
+        with assert_max_transactions(1) as stats:
+            response = call()
+        assert response.status_code < 300, response.text
+        assert stats.transactions == 1, response.request.url
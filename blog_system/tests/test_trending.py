@@ -0,0 +1,36 @@
+from sqlalchemy import delete, select
+from app import models
+from app.trending import TrendingEngine, save_snapshot
+from tests.helpers import create_post, register, run_db
+
+
+async def _scores(session):
+    result = await session.execute(select(models.TrendingScore.window, models.TrendingScore.post_id))
+    return {tuple(row) for row in result.all()}
+
+
+async def _delete_post(session, post_id):
+    await session.execute(delete(models.Post).where(models.Post.id == post_id))
+
+
+def test_snapshot_upserts_and_skips_deleted_posts(client):
+    _, headers = register(client, "alice")
+    first = create_post(client, headers, "First")["id"]
+    second = create_post(client, headers, "Second")["id"]
+
+    engine = TrendingEngine(windows={"1h": 3600}, k=10)
+    engine.record(first, "view")
+    run_db(client, save_snapshot, engine)
+    assert run_db(client, _scores) == {("1h", first)}
+
+    # Второй пост удален другим воркером, этот процесс о нем не знает
+    engine.record(first, "view")
+    engine.record(second, "favorite")
+    engine.record(999, "view")
+    run_db(client, _delete_post, second)
+    run_db(client, save_snapshot, engine)
+    assert run_db(client, _scores) == {("1h", first)}
+
+    engine.forget(first)
+    run_db(client, save_snapshot, engine)
+    assert run_db(client, _scores) == set()